@@ -1,11 +1,15 @@
-from flask import Flask, request, render_template, flash, make_response, jsonify, redirect
+from flask import Flask, Response, g, has_request_context, request, render_template, flash, jsonify, redirect, send_from_directory, stream_with_context
+from flask import session as user_session
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import generate_csrf
 from wtforms import SelectField, SubmitField
 from wtforms.validators import DataRequired
 from kiteconnect import KiteConnect
+import click
+import redis
 import requests
 import json
 import os
@@ -14,7 +18,33 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from uuid import uuid4
 import base64
+import email.utils
+import tempfile
+import threading
+import time
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from contextlib import contextmanager
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from coalescing import SingleFlight, StreamFanOut
+from instrument_store import InstrumentStore
+from jobs import DONE, PENDING, JobQueue
+from log_pipeline import configure_logging
+from market_feed import LIVE_QUOTE_MAX_AGE, LiveQuoteFetcher, LiveQuoteTable, MarketFeed
+from market_hours import trading_date
+from metrics import Registry, server_timing
+from momentum import MomentumEngine, within_risk
+from ohlc_store import OHLCStore
+from postbacks import FULL, MemoryEventQueue, PostbackIngestor, RedisEventQueue, verify_postback
+from prewarm import DailyScheduler, RunLock, parse_times
+from prompt_compiler import PromptCompiler, answer_tokens, estimate_tokens
+from quotes import QUOTE_REQUESTS_PER_SECOND, QuoteFetcher, RateLimiter, SectorQuotePlan, batch_instruments
+from recommendation_cache import FRESH, StaleWhileRevalidateCache, market_soft_ttl
+from sector_universe import SectorUniverse
+from static_responses import PageShell, StaticFiles, StaticResponse
+from stream_parser import StreamingStocksParser
+from token_store import FileTokenStore, RedisTokenStore, SharedKiteSession
 
 # Load environment variables from .env file
 load_dotenv()
@@ -26,18 +56,144 @@ app.secret_key = os.environ.get('FLASK_SECRET_KEY', os.urandom(32))
 KITE_API_KEY = os.environ.get('KITE_API_KEY')
 KITE_API_SECRET = os.environ.get('KITE_API_SECRET')
 GROK_API_KEY = os.environ.get('GROK_API_KEY')
+GROK_API_URL = os.environ.get('GROK_API_URL', 'https://api.x.ai/v1/chat/completions')
+# Seconds to wait for Grok to connect and for each read
+GROK_TIMEOUT = float(os.environ.get('GROK_TIMEOUT', 30))
 
 if not all([KITE_API_KEY, KITE_API_SECRET, GROK_API_KEY]):
     raise ValueError("Missing API keys. Set KITE_API_KEY, KITE_API_SECRET, and GROK_API_KEY.")
 
+# Background threads running submit/poll recommendation jobs (and as many again for SSE
+# streams), and how long a finished job can be polled
+RECOMMENDATION_JOB_WORKERS = int(os.environ.get('RECOMMENDATION_JOB_WORKERS', 16))
+RECOMMENDATION_JOB_TTL = int(os.environ.get('RECOMMENDATION_JOB_TTL', 600))
+# Connections the shared HTTP session keeps per upstream host. Every job and stream
+# thread can be in a Grok call at once; a smaller pool discards the extra connections
+# ("Connection pool is full") and reconnects on the next call.
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 2 * RECOMMENDATION_JOB_WORKERS))
+
 # Initialize Kite Connect with custom HTTP session
 session = requests.Session()
-retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET", "POST"])
-session.mount('https://', HTTPAdapter(max_retries=retries))
+# Short transport-level retries only: 429s are handled by the adaptive rate limiters and
+# sustained outages by the circuit breakers, so neither burns request time on backoff here.
+# A read timeout is never retried: the request already waited the full timeout, and the
+# error must surface as a Timeout for the breaker and the metrics.
+retries = Retry(
+    total=2,
+    read=False,
+    backoff_factor=0.5,
+    status_forcelist=[502, 503, 504],
+    allowed_methods=["GET", "POST"],
+    respect_retry_after_header=False,
+    raise_on_status=False,
+)
+http_adapter = HTTPAdapter(max_retries=retries, pool_maxsize=HTTP_POOL_MAXSIZE)
+session.mount('https://', http_adapter)
+session.mount('http://', http_adapter)
 kite = KiteConnect(api_key=KITE_API_KEY, timeout=15)
 kite.session = session
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Where workers share the Kite access token when REDIS_URL is not set, and how
+# often each worker re-checks the shared token, in seconds
+KITE_TOKEN_FILE = os.environ.get('KITE_TOKEN_FILE', os.path.join(tempfile.gettempdir(), 'profitpoke-kite-token.json'))
+KITE_TOKEN_CHECK_INTERVAL = float(os.environ.get('KITE_TOKEN_CHECK_INTERVAL', 5))
+
+# gunicorn workers (see the Dockerfile). Job state is per process unless it lives in
+# Redis, and the Kite and Grok rate budgets below are for the whole host: each worker
+# enforces an equal 1/WEB_CONCURRENCY share of them
+WEB_CONCURRENCY = max(int(os.environ.get('WEB_CONCURRENCY', 1)), 1)
+
+# Concurrency and rate budget for kite.quote batch fan-out
+KITE_QUOTE_WORKERS = int(os.environ.get('KITE_QUOTE_WORKERS', 4))
+KITE_QUOTE_RPS = float(os.environ.get('KITE_QUOTE_RPS', QUOTE_REQUESTS_PER_SECOND)) / WEB_CONCURRENCY
+
+# Per-upstream circuit breakers: consecutive Kite or Grok failures before calls fail
+# fast, and seconds before a probe call is let through again. Each worker keeps its
+# own breakers, so every worker makes its own failing calls before opening.
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_RESET_TIMEOUT', 30))
+# Grok request budget; halved on every 429 and restored gradually on success
+GROK_REQUESTS_PER_SECOND = float(os.environ.get('GROK_REQUESTS_PER_SECOND', 5)) / WEB_CONCURRENCY
+
+# Optional KiteTicker feed that serves quotes for the sector universe from memory. Kite
+# allows 3 WebSocket connections per API key, so only one worker runs the ticker (see
+# ticker_lock); the others get their quotes over REST.
+KITE_TICKER_ENABLED = os.environ.get('KITE_TICKER_ENABLED', 'false').lower() == 'true'
+KITE_TICKER_MAX_AGE = float(os.environ.get('KITE_TICKER_MAX_AGE', LIVE_QUOTE_MAX_AGE))
+
+# Optional sector/industry classification CSV (symbol and sector or industry columns,
+# e.g. NSE's index constituent lists) replacing the built-in sample mapping; workers
+# re-read it within SECTOR_UNIVERSE_CHECK_INTERVAL seconds of a change
+SECTOR_UNIVERSE_FILE = os.environ.get('SECTOR_UNIVERSE_FILE')
+SECTOR_UNIVERSE_CHECK_INTERVAL = float(os.environ.get('SECTOR_UNIVERSE_CHECK_INTERVAL', 30))
+
+# Daily instrument master snapshots shared read-only by every worker on the host
+INSTRUMENT_STORE_DIR = os.environ.get('INSTRUMENT_STORE_DIR', os.path.join(tempfile.gettempdir(), 'profitpoke-instruments'))
+
+# Optional sector ranking and beta from daily candles (needs Kite's historical data
+# add-on), synced once a day at MOMENTUM_SYNC_TIMES (IST) into a local append-only store
+MOMENTUM_ENABLED = os.environ.get('MOMENTUM_ENABLED', 'false').lower() == 'true'
+MOMENTUM_STORE_DIR = os.environ.get('MOMENTUM_STORE_DIR', os.path.join(tempfile.gettempdir(), 'profitpoke-ohlc'))
+MOMENTUM_SYNC_TIMES = os.environ.get('MOMENTUM_SYNC_TIMES', '08:45')
+MOMENTUM_RANK_WINDOW = int(os.environ.get('MOMENTUM_RANK_WINDOW', 20))
+# Older candles than this many trading days (failing syncs) fall back to live-quote ranking
+MOMENTUM_MAX_AGE_DAYS = int(os.environ.get('MOMENTUM_MAX_AGE_DAYS', 3))
+KITE_HISTORY_RPS = float(os.environ.get('KITE_HISTORY_RPS', 3)) / WEB_CONCURRENCY
+
+# Recommendations are fresh for the soft TTL (short while NSE is open, up to the
+# next session otherwise) and served stale for RECOMMENDATION_STALE_TTL after that
+RECOMMENDATION_SOFT_TTL_OPEN = int(os.environ.get('RECOMMENDATION_SOFT_TTL_OPEN', 300))
+RECOMMENDATION_SOFT_TTL_CLOSED = int(os.environ.get('RECOMMENDATION_SOFT_TTL_CLOSED', 43200))
+RECOMMENDATION_STALE_TTL = int(os.environ.get('RECOMMENDATION_STALE_TTL', 3600))
+# A streamed answer cut off mid-object is cached this long (never served stale) so it is retried soon
+RECOMMENDATION_TRUNCATED_TTL = int(os.environ.get('RECOMMENDATION_TRUNCATED_TTL', 60))
+
+# Scheduled pre-warming of every form combination, as comma-separated IST times (e.g. "09:20,12:30,15:35")
+PREWARM_TIMES = os.environ.get('PREWARM_TIMES', '')
+PREWARM_CONCURRENCY = int(os.environ.get('PREWARM_CONCURRENCY', 4))
+
+# Prompt token budget for the stock table, and completion room for grok-3-mini's
+# reasoning on top of the tokens the 5-stock JSON answer needs (by default max_tokens
+# is 1500 + 320 = 1820 for one profile and 1500 + 4 * 320 = 2780 for a 4-profile batch)
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 1500))
+GROK_REASONING_TOKENS = int(os.environ.get('GROK_REASONING_TOKENS', 1500))
+# Investor profiles sharing one price range and risk level that are answered by a single Grok call
+RECOMMENDATION_BATCH_SIZE = int(os.environ.get('RECOMMENDATION_BATCH_SIZE', 4))
+# Most distinct profiles one /api/recommendations/batch request may ask for (answered on the request thread)
+RECOMMENDATION_BATCH_MAX_PROFILES = int(os.environ.get('RECOMMENDATION_BATCH_MAX_PROFILES', 8))
+
+# Browser cache lifetime for static assets and robots.txt/sitemap.xml; asset URLs
+# carry a content hash (?v=) and are served as immutable for a year
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+SEO_MAX_AGE = int(os.environ.get('SEO_MAX_AGE', 86400))
+
+# Kite order postbacks are checksum-verified and queued (in Redis when REDIS_URL is set),
+# then applied in batches by background consumers; redeliveries are dropped for POSTBACK_DEDUP_TTL
+POSTBACK_QUEUE_SIZE = int(os.environ.get('POSTBACK_QUEUE_SIZE', 10000))
+POSTBACK_BATCH_SIZE = int(os.environ.get('POSTBACK_BATCH_SIZE', 100))
+POSTBACK_CONSUMERS = int(os.environ.get('POSTBACK_CONSUMERS', 1))
+POSTBACK_DEDUP_TTL = int(os.environ.get('POSTBACK_DEDUP_TTL', 86400))
+
+# Logging: 'text' or one-JSON-object-per-line output, written by a background thread
+# from a bounded queue (records are dropped rather than blocking when it is full).
+# Messages and payloads are cut to LOG_MAX_CHARS; INFO payloads such as raw
+# completions are only serialised for a LOG_PAYLOAD_SAMPLE_RATE fraction of records.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() == 'true'
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_MAX_CHARS = int(os.environ.get('LOG_MAX_CHARS', 2000))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0.1))
+
+log_pipeline = configure_logging(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    asynchronous=LOG_ASYNC,
+    queue_size=LOG_QUEUE_SIZE,
+    max_chars=LOG_MAX_CHARS,
+    sample_rate=LOG_PAYLOAD_SAMPLE_RATE,
+    request_id=lambda: g.get('request_id') if has_request_context() else None,
+)
 logger = logging.getLogger(__name__)
 
 limiter = Limiter(
@@ -51,8 +207,91 @@ cache = Cache(app, config={
     'CACHE_REDIS_URL': os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 })
 
+# Cross-worker coordination uses the same Redis as the cache when configured
+redis_client = redis.Redis.from_url(os.environ['REDIS_URL']) if os.environ.get('REDIS_URL') else None
+coalescer = SingleFlight(redis_client)
+prompt_compiler = PromptCompiler(PROMPT_TOKEN_BUDGET)
+recommendation_cache = StaleWhileRevalidateCache(
+    cache,
+    market_soft_ttl(RECOMMENDATION_SOFT_TTL_OPEN, RECOMMENDATION_SOFT_TTL_CLOSED),
+    stale_ttl=RECOMMENDATION_STALE_TTL,
+)
+recommendation_jobs = JobQueue(cache, max_workers=RECOMMENDATION_JOB_WORKERS, ttl=RECOMMENDATION_JOB_TTL)
+# SSE misses run in the background, one computation per profile shared by every open stream
+stream_fanout = StreamFanOut(max_workers=RECOMMENDATION_JOB_WORKERS)
+# A poll can land on any worker, so with several workers jobs must live in the shared Redis cache
+JOB_API_UNAVAILABLE = (
+    None if os.environ.get('REDIS_URL') or WEB_CONCURRENCY <= 1
+    else "The recommendation job API needs REDIS_URL when WEB_CONCURRENCY > 1; use / or /recommendations/stream instead"
+)
+if JOB_API_UNAVAILABLE:
+    logger.warning(JOB_API_UNAVAILABLE)
+if WEB_CONCURRENCY > 1 and redis_client is None:
+    logger.warning(
+        f"WEB_CONCURRENCY={WEB_CONCURRENCY} without REDIS_URL: every worker keeps its own recommendation "
+        "cache and coalesces only its own requests, so each one computes (and pays Grok for) the same "
+        "profiles; set REDIS_URL to share them"
+    )
+kite_breaker = CircuitBreaker('Kite API', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+grok_breaker = CircuitBreaker('Grok API', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+grok_limiter = RateLimiter(GROK_REQUESTS_PER_SECOND, burst=max(int(GROK_REQUESTS_PER_SECOND), 1))
+
+# Hot-path latency per stage plus upstream error and token counters, scraped from /metrics
+metrics_registry = Registry('profitpoke')
+stage_seconds = metrics_registry.histogram('stage_duration_seconds', 'Latency of each recommendation pipeline stage', labels=('stage',))
+request_seconds = metrics_registry.histogram('request_duration_seconds', 'Request latency by endpoint', labels=('endpoint',))
+upstream_errors = metrics_registry.counter('upstream_errors_total', 'Kite and Grok errors by type', labels=('service', 'type'))
+grok_tokens = metrics_registry.counter('grok_tokens_total', 'Grok tokens used by kind', labels=('kind',))
+metrics_registry.register_collector('coalescing', coalescer.stats)
+metrics_registry.register_collector('recommendation_cache', recommendation_cache.stats)
+metrics_registry.register_collector('prompts', prompt_compiler.stats)
+metrics_registry.register_collector('jobs', recommendation_jobs.stats)
+metrics_registry.register_collector('streams', stream_fanout.stats)
+metrics_registry.register_collector('kite_circuit', kite_breaker.stats)
+metrics_registry.register_collector('grok_circuit', grok_breaker.stats)
+metrics_registry.register_collector('logging', log_pipeline.stats)
+metrics_registry.register_collector('grok_rate_limiter', grok_limiter.stats)
+
+def record_stage(name, seconds):
+    stage_seconds.observe(seconds, stage=name)
+    if has_request_context():
+        g.setdefault('stage_timings', []).append((name, seconds))
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into the stage histogram and the request's Server-Timing header"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def record_grok_usage(usage):
+    grok_tokens.inc(usage.get('prompt_tokens', 0), kind='prompt')
+    grok_tokens.inc(usage.get('completion_tokens', 0), kind='completion')
+    reasoning = (usage.get('completion_tokens_details') or {}).get('reasoning_tokens')
+    if reasoning:
+        grok_tokens.inc(reasoning, kind='reasoning')
+
 app.static_folder = 'static'
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Tags every log line written while handling this request
+    g.request_id = str(uuid4())
+
+@app.after_request
+def add_timing_headers(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        total = time.perf_counter() - started
+        request_seconds.observe(total, endpoint=request.endpoint or 'unmatched')
+        response.headers['Server-Timing'] = server_timing(g.pop('stage_timings', []) + [('total', total)])
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
 @app.after_request
 def add_security_headers(response):
     response.headers['Content-Security-Policy'] = (
@@ -64,33 +303,68 @@ def add_security_headers(response):
     )
     return response
 
-@app.route('/static/manifest.json')
-def serve_manifest():
-    manifest = {
-        "name": "ProfitPoke AI - Smart Stock Insights",
-        "short_name": "ProfitPoke AI",
-        "description": "AI-powered stock recommendations for the Indian market",
-        "start_url": "/",
-        "display": "standalone",
-        "background_color": "#667eea",
-        "theme_color": "#667eea",
-        "orientation": "portrait",
-        "scope": "/",
-        "lang": "en",
-        "icons": [
-            {
-                "src": "data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMTkyIiBoZWlnaHQ9IjE5MiIgdmlld0JveD0iMCAwIDE5MiAxOTIiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+CjxyZWN0IHdpZHRoPSIxOTIiIGhlaWdodD0iMTkyIiByeD0iMzIiIGZpbGw9InVybCgjZ3JhZGllbnQwX2xpbmVhcl8xXzEpIi8+CjxwYXRoIGQ9Ik05NiA0OEM3NC41IDQ4IDU2IDY2LjUgNTYgODhWMTQ0QzU2IDE2NS41IDc0LjUgMTg0IDk2IDE4NCMxMTcuNSAxODQgMTM2IDE2NS41IDEzNiAxNDRWODhDMTM2IDY2LjUgMTE3LjUgNDggOTYgNDhaIiBmaWxsPSJ3aGl0ZSIvPgo8cGF0aCBkPSJNOTYgNzJDODcuMiA3MiA4MCA3N9YyIDgwIDg4Vjk2SDExMlY4OEMxMTIgNzkuMiAxMDQuOCA3MiA5NiA3MloiIGZpbGw9IiM2NjdlZWEiLz4KPGF0aCBkPSJNODAgMTA0VjE0NEM4MCA1Mi44IDg3LjIgMTYwIDk2IDE2MEMxMDQuOCAxNjAgMTEyIDE1Mi44IDExMiAxNDRWMTA0SDgwWiIgZmlsbD0iIzc2NGJhMiIvPgo8ZGVmcz4KPGxpbmVhckdyYWRpZW50IGlkPSJncmFkaWVudDBfbGluZWFyXzFfMSIgeDE9IjAiIHkxPSIwIiB4Mj0iMTkyIiB5Mj0iMTkyIiBncmFkaWVudFVuaXRzPSJ1c2VyU3BhY2VPblVzZSI+CjxzdG9wIHN0b3AtY29sb3I9IiM2NjdlZWEiLz4KPHN0b3Agb2Zmc2V0PSIxIiBzdG9wLWNvbG9yPSIjNzY0YmEyIi8+CjwvbGluZWFyR3JhZGllbnQ+CjwvZGVmcz4KPC9zdmc+",
-                "sizes": "192x192",
-                "type": "image/svg+xml"
-            },
-            {
-                "src": "data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTEyIiBoZWlnaHQ9IjUxMiIgdmlld0JveD0iMCAwIDUxMiA1MTIiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+CjxyZWN0IHdpZHRoPSI1MTIiIGhlaWdodD0iNTEyIiByeD0iODQiIGZpbGw9InVybCgjZ3JhZGllbnQwX2xpbmVhcl8xXzEpIi8+CjxwYXRoIGQ9Ik0yNTYgMTI4QzE5OC41IDEyOCAxNTIgMTc0LjUgMTUyIDIzMlYzODRDMTUyIDQ0MS41IDE5OC41IDQ4OCAyNTYgNDg4QzMxMy41IDQ4OCAzNjAgNDQxLjUgMzYwIDM4NFYyMzJDMzYwIDE3NC41IDMxMy41IDEyOCAyNTYgMTI4WiIgZmlsbD0id2hpdGUiLz4KPGF0aCBkPSJNMjU2IDE5MkMyMzMuMiAxOTIgMjE0IDIxMS4yIDIxNCAyMzRWMjU2SDI5OFYyMzRDMjk4IDIxMS4yIDI3OC44IDE5MiAyNTYgMTkyWiIgZmlsbD0iIzY2N2VlYSIvPgo8cGF0aCBkPSJNMjE0IDI3OFYzODRDMjE0IDQwNi44IDIzMy4yIDQyNiAyNTYgNDI2QzI3OC44IDQyNiAyOTggNDA2LjggMjk4IDM4NFYyNzhIMjE0WiIgZmlsbD0iIzc2NGJhMiIvPgo8ZGVmcz4KPGxpbmVhckdyYWRpZW50IGlkPSJncmFkaWVudDBfbGluZWFyXzFfMSIgeDE9IjAiIHkxPSIwIiB4Mj0iNTEyIiB5Mj0iNTEyIiBncmFkaWVudFVuaXRzPSJ1c2VyU3BhY2VPblVzZSI+CjxzdG9wIHN0b3AtY29sb3I9IiM2NjdlZWEiLz4KPHN0b3Agb2Zmc2V0PSIxIiBzdG9wLWNvbG9yPSIjNzY0YmEyIi8+CjwvbGluZWFyR3JhZGllbnQ+CjwvZGVmcz4KPC9zdmc+",
-                "sizes": "512x512",
-                "type": "image/svg+xml"
-            }
-        ]
-    }
-    return json.dumps(manifest), 200, {'Content-Type': 'application/json'}
+MANIFEST = {
+    "name": "ProfitPoke AI - Smart Stock Insights",
+    "short_name": "ProfitPoke AI",
+    "description": "AI-powered stock recommendations for the Indian market",
+    "start_url": "/",
+    "display": "standalone",
+    "background_color": "#667eea",
+    "theme_color": "#667eea",
+    "orientation": "portrait",
+    "scope": "/",
+    "lang": "en",
+    "icons": [
+        {
+            "src": "data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iMTkyIiBoZWlnaHQ9IjE5MiIgdmlld0JveD0iMCAwIDE5MiAxOTIiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+CjxyZWN0IHdpZHRoPSIxOTIiIGhlaWdodD0iMTkyIiByeD0iMzIiIGZpbGw9InVybCgjZ3JhZGllbnQwX2xpbmVhcl8xXzEpIi8+CjxwYXRoIGQ9Ik05NiA0OEM3NC41IDQ4IDU2IDY2LjUgNTYgODhWMTQ0QzU2IDE2NS41IDc0LjUgMTg0IDk2IDE4NCMxMTcuNSAxODQgMTM2IDE2NS41IDEzNiAxNDRWODhDMTM2IDY2LjUgMTE3LjUgNDggOTYgNDhaIiBmaWxsPSJ3aGl0ZSIvPgo8cGF0aCBkPSJNOTYgNzJDODcuMiA3MiA4MCA3N9YyIDgwIDg4Vjk2SDExMlY4OEMxMTIgNzkuMiAxMDQuOCA3MiA5NiA3MloiIGZpbGw9IiM2NjdlZWEiLz4KPGF0aCBkPSJNODAgMTA0VjE0NEM4MCA1Mi44IDg3LjIgMTYwIDk2IDE2MEMxMDQuOCAxNjAgMTEyIDE1Mi44IDExMiAxNDRWMTA0SDgwWiIgZmlsbD0iIzc2NGJhMiIvPgo8ZGVmcz4KPGxpbmVhckdyYWRpZW50IGlkPSJncmFkaWVudDBfbGluZWFyXzFfMSIgeDE9IjAiIHkxPSIwIiB4Mj0iMTkyIiB5Mj0iMTkyIiBncmFkaWVudFVuaXRzPSJ1c2VyU3BhY2VPblVzZSI+CjxzdG9wIHN0b3AtY29sb3I9IiM2NjdlZWEiLz4KPHN0b3Agb2Zmc2V0PSIxIiBzdG9wLWNvbG9yPSIjNzY0YmEyIi8+CjwvbGluZWFyR3JhZGllbnQ+CjwvZGVmcz4KPC9zdmc+",
+            "sizes": "192x192",
+            "type": "image/svg+xml"
+        },
+        {
+            "src": "data:image/svg+xml;base64,PHN2ZyB3aWR0aD0iNTEyIiBoZWlnaHQ9IjUxMiIgdmlld0JveD0iMCAwIDUxMiA1MTIiIGZpbGw9Im5vbmUiIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwL3N2ZyI+CjxyZWN0IHdpZHRoPSI1MTIiIGhlaWdodD0iNTEyIiByeD0iODQiIGZpbGw9InVybCgjZ3JhZGllbnQwX2xpbmVhcl8xXzEpIi8+CjxwYXRoIGQ9Ik0yNTYgMTI4QzE5OC41IDEyOCAxNTIgMTc0LjUgMTUyIDIzMlYzODRDMTUyIDQ0MS41IDE5OC41IDQ4OCAyNTYgNDg4QzMxMy41IDQ4OCAzNjAgNDQxLjUgMzYwIDM4NFYyMzJDMzYwIDE3NC41IDMxMy41IDEyOCAyNTYgMTI4WiIgZmlsbD0id2hpdGUiLz4KPGF0aCBkPSJNMjU2IDE5MkMyMzMuMiAxOTIgMjE0IDIxMS4yIDIxNCAyMzRWMjU2SDI5OFYyMzRDMjk4IDIxMS4yIDI3OC44IDE5MiAyNTYgMTkyWiIgZmlsbD0iIzY2N2VlYSIvPgo8cGF0aCBkPSJNMjE0IDI3OFYzODRDMjE0IDQwNi44IDIzMy4yIDQyNiAyNTYgNDI2QzI3OC44IDQyNiAyOTggNDA2LjggMjk4IDM4NFYyNzhIMjE0WiIgZmlsbD0iIzc2NGJhMiIvPgo8ZGVmcz4KPGxpbmVhckdyYWRpZW50IGlkPSJncmFkaWVudDBfbGluZWFyXzFfMSIgeDE9IjAiIHkxPSIwIiB4Mj0iNTEyIiB5Mj0iNTEyIiBncmFkaWVudFVuaXRzPSJ1c2VyU3BhY2VPblVzZSI+CjxzdG9wIHN0b3AtY29sb3I9IiM2NjdlZWEiLz4KPHN0b3Agb2Zmc2V0PSIxIiBzdG9wLWNvbG9yPSIjNzY0YmEyIi8+CjwvbGluZWFyR3JhZGllbnQ+CjwvZGVmcz4KPC9zdmc+",
+            "sizes": "512x512",
+            "type": "image/svg+xml"
+        }
+    ]
+}
+
+# Static assets, the manifest and the SEO files are read, hashed and compressed once at
+# startup and answered from memory with strong ETags (304 on If-None-Match)
+static_files = StaticFiles(app.static_folder, cache_control=f'public, max-age={STATIC_MAX_AGE}')
+static_files.add('manifest.json', json.dumps(MANIFEST), 'application/json')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+def load_public_file(filename, fallback, content_type):
+    path = os.path.join(app.root_path, 'public', filename)
+    try:
+        return StaticResponse.from_file(path, content_type, cache_control=f'public, max-age={SEO_MAX_AGE}')
+    except FileNotFoundError:
+        return StaticResponse(fallback, content_type, cache_control=f'public, max-age={SEO_MAX_AGE}')
+
+robots_response = load_public_file('robots.txt', "User-agent: *\nAllow: /", 'text/plain; charset=utf-8')
+sitemap_response = load_public_file(
+    'sitemap.xml',
+    "<?xml version='1.0' encoding='UTF-8'?><urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'></urlset>",
+    'application/xml',
+)
+
+def serve_static(filename):
+    """Precomputed static files; a URL carrying the file's current version is cached for good"""
+    static = static_files.get(filename)
+    if static is None:
+        return send_from_directory(app.static_folder, filename, max_age=STATIC_MAX_AGE)
+    if request.args.get('v') == static.version:
+        return static.response(request, IMMUTABLE_CACHE_CONTROL)
+    return static.response(request)
+
+app.view_functions['static'] = serve_static
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    if endpoint == 'static' and 'v' not in values:
+        version = static_files.version(values.get('filename'))
+        if version:
+            values['v'] = version
 
 @app.route('/health')
 def health_check():
@@ -101,6 +375,26 @@ def health_check():
         'version': '1.0.0'
     }), 200
 
+@app.route('/metrics')
+@limiter.exempt
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats')
+def stats():
+    """Runtime counters for the recommendation pipeline"""
+    return jsonify({
+        'coalescing': coalescer.stats(),
+        'recommendation_cache': recommendation_cache.stats(),
+        'prompts': prompt_compiler.stats(),
+        'jobs': recommendation_jobs.stats(),
+        'circuits': {'kite': kite_breaker.stats(), 'grok': grok_breaker.stats()},
+        'logging': log_pipeline.stats(),
+        'postbacks': postback_ingestor.stats(),
+        'static_files': static_files.stats()
+    }), 200
+
 class RecommendationForm(FlaskForm):
     price_range = SelectField('Price Range (INR)', choices=[
         ('None', 'None'),
@@ -124,104 +418,156 @@ class RecommendationForm(FlaskForm):
     ], validators=[DataRequired()])
     submit = SubmitField('Get Recommendations')
 
+def quote_error_message(error):
+    if isinstance(error, CircuitOpenError):
+        return str(error)
+    if isinstance(error, requests.exceptions.Timeout):
+        logger.error("Kite API request timed out after 15 seconds")
+        return "Kite API request timed out. Please try again later."
+    if isinstance(error, requests.exceptions.ConnectionError):
+        logger.error(f"Kite API network error: {str(error)}")
+        return "Network error connecting to Kite API. Please check your connection."
+    return f"Failed to fetch stock data: {str(error)}"
+
+# Sample sector mapping used when SECTOR_UNIVERSE_FILE is not set
+DEFAULT_SECTOR_MAPPING = {
+    'Technology': ['TRIGYN', 'SAKSOFT', 'MPSLTD', 'XCHANGING', 'KERNEX', 'MOSCHIP', 'RSYSTEMS', 'SUBEX'],
+    'Financial Services': ['HDFCBANK', 'ICICIBANK', 'SBIN', 'KOTAKBANK'],
+    'Healthcare': ['SUNPHARMA', 'DRREDDY', 'CIPLA', 'DIVISLAB'],
+    'Consumer Goods': ['HINDUNILVR', 'ITC', 'NESTLEIND', 'BRITANNIA'],
+    'Energy': ['RELIANCE', 'ONGC', 'BPCL', 'GAIL'],
+    'Automobiles': ['MARUTI', 'TATAMOTORS', 'M&M', 'BAJAJ-AUTO'],
+    'Metals & Mining': ['TATASTEEL', 'JSWSTEEL', 'HINDALCO', 'VEDL'],
+    'Real Estate': ['DLF', 'GODREJPROP', 'OBEROIRLTY', 'PRESTIGE'],
+    'Telecommunications': ['BHARTIARTL', 'IDEA', 'RELIANCE'],
+    'Infrastructure': ['LT', 'ADANIPORTS', 'GRASIM', 'ULTRACEMCO']
+}
+
 class StockRecommendationService:
-    def __init__(self, kite):
+    def __init__(self, kite, quote_fetcher=None, instrument_store=None, momentum_store=None, sector_universe=None):
         self.kite = kite
-        # Static sector mapping (replace with external source in production)
-        self.sector_mapping = {
-            'Technology': ['TRIGYN', 'SAKSOFT', 'MPSLTD', 'XCHANGING', 'KERNEX', 'MOSCHIP', 'RSYSTEMS', 'SUBEX'],
-            'Financial Services': ['HDFCBANK', 'ICICIBANK', 'SBIN', 'KOTAKBANK'],
-            'Healthcare': ['SUNPHARMA', 'DRREDDY', 'CIPLA', 'DIVISLAB'],
-            'Consumer Goods': ['HINDUNILVR', 'ITC', 'NESTLEIND', 'BRITANNIA'],
-            'Energy': ['RELIANCE', 'ONGC', 'BPCL', 'GAIL'],
-            'Automobiles': ['MARUTI', 'TATAMOTORS', 'M&M', 'BAJAJ-AUTO'],
-            'Metals & Mining': ['TATASTEEL', 'JSWSTEEL', 'HINDALCO', 'VEDL'],
-            'Real Estate': ['DLF', 'GODREJPROP', 'OBEROIRLTY', 'PRESTIGE'],
-            'Telecommunications': ['BHARTIARTL', 'IDEA', 'RELIANCE'],
-            'Infrastructure': ['LT', 'ADANIPORTS', 'GRASIM', 'ULTRACEMCO']
-        }
+        self.instrument_store = instrument_store or InstrumentStore(INSTRUMENT_STORE_DIR, kite.instruments)
+        self.quote_fetcher = quote_fetcher or QuoteFetcher(
+            kite, max_workers=KITE_QUOTE_WORKERS, requests_per_second=KITE_QUOTE_RPS, breaker=kite_breaker
+        )
+        self.sector_universe = sector_universe or SectorUniverse(
+            DEFAULT_SECTOR_MAPPING, SECTOR_UNIVERSE_FILE, check_interval=SECTOR_UNIVERSE_CHECK_INTERVAL,
+            on_change=lambda index: resubscribe_market_feed(),
+        )
+        self.momentum = None
+        if momentum_store is not None:
+            self.momentum = MomentumEngine(
+                momentum_store, self.sector_index, rank_window=MOMENTUM_RANK_WINDOW, max_age_days=MOMENTUM_MAX_AGE_DAYS
+            )
+
+    @property
+    def sector_index(self):
+        """Compiled index of the current sector universe (replaced when the file changes)"""
+        return self.sector_universe.index()
+
+    @property
+    def sector_mapping(self):
+        return self.sector_universe.mapping
+
+    def get_sector_index(self):
+        """Current sector index bound to today's instrument master"""
+        return self.sector_universe.validate(self.get_nse_instruments())
 
-    @cache.memoize(timeout=86400)  # Cache for 24 hours
     def get_nse_instruments(self):
-        try:
-            instruments = self.kite.instruments('NSE')
-            logger.info("Successfully fetched NSE instruments")
-            return instruments
-        except Exception as e:
-            logger.error(f"Error fetching NSE instruments: {str(e)}")
-            return []
+        """Today's NSE instrument master, loaded lazily from the on-disk snapshot"""
+        with stage('instrument_load'):
+            return self.instrument_store.get()
+
+    def fetch_quotes(self, batches):
+        result = self.quote_fetcher.fetch(batches)
+        for seconds in result.batch_seconds:
+            record_stage('quote_batch', seconds)
+        for _, error in result.errors:
+            upstream_errors.inc(service='kite', type=type(error).__name__)
+        return result
+
+    def get_instrument_keys_by_token(self):
+        """Map instrument_token to `NSE:SYMBOL` for every sector-mapped symbol"""
+        return self.get_sector_index().keys_by_token()
+
+    def sync_momentum(self, fetch, until):
+        """Append daily candles up to `until` and recompute the momentum metrics"""
+        self.momentum.sync(fetch, until, self.get_sector_index())
 
     def get_top_gaining_sectors(self):
+        return self.rank_sectors()[0]
+
+    def rank_sectors(self):
+        """Top two sectors and the sector-universe quotes they were ranked on ({} when ranked by momentum)"""
         try:
             instruments = self.get_nse_instruments()
-            symbols = [inst['tradingsymbol'] for inst in instruments if inst['segment'] == 'NSE']
-            if not symbols:
+            sector_index = self.sector_universe.validate(instruments)
+            if self.momentum is not None:
+                self.momentum.follow(sector_index)
+                if self.momentum.ready:
+                    # Precomputed from daily candles; no quote round trip needed
+                    with stage('sector_ranking'):
+                        top_sectors = self.momentum.rank_sectors(top=2)
+                    logger.info(f"Top sectors by {self.momentum.rank_window}-day momentum: {top_sectors}")
+                    return top_sectors, {}
+
+            universe_size = instruments.segment_size()
+            if not universe_size:
                 logger.error("No NSE instruments available")
-                return []
+                return [], {}
 
-            # Batch symbols to avoid 414 Request-URI Too Large
-            batch_size = 500
-            market_data = {}
-            for i in range(0, len(symbols), batch_size):
-                batch = [f'NSE:{symbol}' for symbol in symbols[i:i + batch_size]]
-                try:
-                    market_data.update(self.kite.quote(batch))
-                except Exception as e:
-                    logger.warning(f"Error fetching quotes for batch {i//batch_size + 1}: {str(e)}")
-                    continue
+            # Only sector-mapped symbols contribute to the ranking, so quote just those
+            tradable = sector_index.listed()
+            plan = SectorQuotePlan(self.sector_mapping, tradable, universe_size=universe_size)
+            logger.info(
+                f"Quoting {len(plan.symbols)} sector symbols in {len(plan.batches)} batch(es); "
+                f"saved {plan.saved_calls} quote call(s) and {plan.saved_symbols} symbol lookups"
+            )
+            result = self.fetch_quotes(plan.batches)
+            for batch_number, error in result.errors:
+                logger.warning(f"Error fetching quotes for batch {batch_number}: {str(error)}")
+            market_data = result.data
 
-            # Calculate sector performance
-            sector_gains = {}
-            for symbol in symbols:
-                quote = market_data.get(f'NSE:{symbol}', {})
-                if not quote or 'last_price' not in quote or 'price_change' not in quote:
-                    continue
-                percent_change = (quote['price_change'] / (quote['last_price'] - quote['price_change'])) * 100 if quote['last_price'] != quote['price_change'] else 0
-                # Find sector for the symbol
-                sector = None
-                for sec, syms in self.sector_mapping.items():
-                    if symbol in syms:
-                        sector = sec
-                        break
-                if not sector:
-                    continue
-                if sector not in sector_gains:
-                    sector_gains[sector] = []
-                sector_gains[sector].append(percent_change)
-
-            # Calculate average gain per sector
-            sector_avg_gains = {sector: sum(gains) / len(gains) for sector, gains in sector_gains.items() if gains}
-            top_sectors = sorted(sector_avg_gains, key=sector_avg_gains.get, reverse=True)[:2]
+            # Average percent change per sector, computed over the compiled index
+            with stage('sector_ranking'):
+                top_sectors = sector_index.rank_sectors(market_data, top=2)
             logger.info(f"Top gaining sectors: {top_sectors}")
-            return top_sectors
+            return top_sectors, market_data
         except Exception as e:
             logger.error(f"Error calculating top gaining sectors: {str(e)}")
-            return []
-
-    def get_stock_list(self):
-        top_sectors = self.get_top_gaining_sectors()
-        if not top_sectors:
-            return []
-        # Get symbols from top two sectors
-        symbols = []
-        for sector in top_sectors:
-            symbols.extend(self.sector_mapping.get(sector, []))
-        return symbols
-
-    def get_stock_data(self, price_range):
-        try:
-            symbols = self.get_stock_list()
-            if not symbols:
-                logger.error("No stocks available from top gaining sectors")
-                return {"error": "No stocks available from top gaining sectors. Please try again later."}
+            return [], {}
+
+    def get_quote_snapshot(self):
+        """Top-sector symbols and their quotes; one snapshot serves every price range"""
+        top_sectors, sector_quotes = self.rank_sectors()
+        symbols = self.sector_index.symbols_for(top_sectors) if top_sectors else []
+        if not symbols:
+            logger.error("No stocks available from top gaining sectors")
+            return {"error": "No stocks available from top gaining sectors. Please try again later."}
+
+        # The ranking already quoted the whole sector universe; only fetch what it is missing
+        market_data = {key: sector_quotes[key] for key in (f'NSE:{symbol}' for symbol in symbols) if key in sector_quotes}
+        missing = [symbol for symbol in symbols if f'NSE:{symbol}' not in market_data]
+        if missing:
+            batches = batch_instruments(missing)
+            logger.info(f"Querying Kite API for {len(missing)} instruments in {len(batches)} batch(es)")
+            result = self.fetch_quotes(batches)
+            for batch_number, error in result.errors:
+                logger.error(f"Error fetching quotes for batch {batch_number}: {str(error)}")
+            if not result.data and not market_data and result.errors:
+                return {"error": quote_error_message(result.errors[0][1])}
+            market_data.update(result.data)
+        return {"symbols": symbols, "market_data": market_data}
 
+    def get_stock_data(self, price_range, snapshot=None, risk_level='None'):
+        try:
             if price_range == 'None':
                 price_min, price_max = 0, float('inf')
             elif price_range.endswith('+'):
                 price_min, price_max = int(price_range[:-1]), float('inf')
             else:
-                price_min, max_price = map(int, price_range.split('-'))
-                if price_min < 0 or max_price <= price_min:
+                price_min, price_max = map(int, price_range.split('-'))
+                if price_min < 0 or price_max <= price_min:
                     logger.error(f"Invalid price range: {price_range}")
                     return {"error": f"Invalid price range: {price_range}. Ensure minimum is non-negative and maximum is greater than minimum."}
 
@@ -229,23 +575,10 @@ class StockRecommendationService:
                 logger.warning("Kite API not authenticated; returning empty stock data")
                 return []
 
-            # Batch symbols to avoid 414 Request-URI Too Large
-            batch_size = 500
-            market_data = {}
-            for i in range(0, len(symbols), batch_size):
-                batch = [f'NSE:{symbol}' for symbol in symbols[i:i + batch_size]]
-                logger.info(f"Querying Kite API for {len(batch)} instruments in batch {i//batch_size + 1}")
-                try:
-                    market_data.update(self.kite.quote(batch))
-                except requests.exceptions.Timeout:
-                    logger.error("Kite API request timed out after 15 seconds")
-                    return {"error": "Kite API request timed out. Please try again later."}
-                except requests.exceptions.ConnectionError as conn_err:
-                    logger.error(f"Kite API network error: {str(conn_err)}")
-                    return {"error": "Network error connecting to Kite API. Please check your connection."}
-                except Exception as e:
-                    logger.error(f"Error fetching quotes for batch {i//batch_size + 1}: {str(e)}")
-                    return {"error": f"Failed to fetch stock data: {str(e)}"}
+            snapshot = snapshot or self.get_quote_snapshot()
+            if 'error' in snapshot:
+                return snapshot
+            symbols, market_data = snapshot['symbols'], snapshot['market_data']
 
             filtered_data = []
             all_prices = []
@@ -257,13 +590,21 @@ class StockRecommendationService:
                 price = quote.get('last_price', 0)
                 all_prices.append((symbol, price))
                 if price_range == 'None' or price_min <= price <= price_max:
-                    filtered_data.append({
+                    stock = {
                         'name': quote.get('name', symbol),
                         'symbol': f"{symbol}.NS",
                         'price': price,
                         'volume': quote.get('volume', 0),
                         'change': quote.get('price_change', 0)
-                    })
+                    }
+                    beta = self.momentum.beta_of(symbol) if self.momentum is not None else None
+                    if beta is not None:
+                        stock['beta'] = round(beta, 2)
+                    filtered_data.append(stock)
+            if risk_level != 'None':
+                # Keep stocks whose measured beta fits the risk level, unless none would be left
+                matching = [stock for stock in filtered_data if 'beta' in stock and within_risk(stock['beta'], risk_level)]
+                filtered_data = matching or filtered_data
             if not filtered_data:
                 available_ranges = sorted(set([f"{int(price // 100 * 100)}-{int((price // 100 + 1) * 100)}" for _, price in all_prices]))
                 min_price = min([price for _, price in all_prices], default=0)
@@ -274,13 +615,92 @@ class StockRecommendationService:
                 )
                 logger.warning(error_msg)
                 return {"error": error_msg}
-            logger.info(f"Retrieved stock data: {filtered_data}")
+            logger.info(f"Retrieved stock data for {len(filtered_data)} stocks", extra={'payload': filtered_data})
             return filtered_data
         except Exception as e:
             logger.error(f"Error fetching stock data: {str(e)}")
             return {"error": f"Failed to fetch stock data: {str(e)}"}
 
-service = StockRecommendationService(kite)
+momentum_store = OHLCStore(MOMENTUM_STORE_DIR) if MOMENTUM_ENABLED else None
+market_feed = None
+if KITE_TICKER_ENABLED:
+    live_quotes = LiveQuoteTable(max_age=KITE_TICKER_MAX_AGE)
+    market_feed = MarketFeed(KITE_API_KEY, live_quotes)
+    rest_quotes = QuoteFetcher(
+        kite, max_workers=KITE_QUOTE_WORKERS, requests_per_second=KITE_QUOTE_RPS, breaker=kite_breaker
+    )
+    service = StockRecommendationService(
+        kite, quote_fetcher=LiveQuoteFetcher(live_quotes, rest_quotes), momentum_store=momentum_store
+    )
+else:
+    service = StockRecommendationService(kite, momentum_store=momentum_store)
+
+metrics_registry.register_collector('instrument_store', service.instrument_store.stats)
+if isinstance(service.quote_fetcher, LiveQuoteFetcher):
+    metrics_registry.register_collector('live_quotes', service.quote_fetcher.stats)
+    metrics_registry.register_collector('kite_rate_limiter', service.quote_fetcher.fallback.limiter.stats)
+else:
+    metrics_registry.register_collector('kite_rate_limiter', service.quote_fetcher.limiter.stats)
+metrics_registry.register_collector('sector_universe', service.sector_universe.stats)
+if service.momentum is not None:
+    metrics_registry.register_collector('momentum', service.momentum.stats)
+
+history_limiter = RateLimiter(KITE_HISTORY_RPS)
+
+def fetch_daily_candles(instrument_token, from_date, to_date):
+    history_limiter.acquire()
+    return kite.historical_data(instrument_token, from_date, to_date, 'day')
+
+def sync_momentum():
+    """Bring the daily candle store up to yesterday's close and recompute rankings"""
+    if service.momentum is None:
+        return
+    if not kite_session.sync(force=True):
+        logger.warning("Skipping momentum sync: Kite API not authenticated")
+        return
+    started = time.perf_counter()
+    service.sync_momentum(fetch_daily_candles, trading_date() - timedelta(days=1))
+    logger.info(f"Momentum sync finished in {time.perf_counter() - started:.1f}s")
+
+# Held for the life of the worker that runs the market feed; the others retry on the next token change
+ticker_lock = RunLock('kite-ticker', redis_client, os.path.join(tempfile.gettempdir(), 'profitpoke-ticker.lock'), timeout=60)
+
+def start_market_feed(access_token):
+    if not market_feed:
+        return
+    if not ticker_lock.acquire():
+        logger.info("Market feed runs in another worker; serving quotes over REST")
+        return
+    market_feed.start(access_token, service.get_instrument_keys_by_token())
+
+def resubscribe_market_feed():
+    """Point the running feed at a reloaded sector universe (a no-op in workers not running it)"""
+    if market_feed:
+        market_feed.resubscribe(service.get_instrument_keys_by_token())
+
+# The Kite access token lives in Redis (or a host-local file) so every worker and
+# instance uses the session established by whichever one handled the login callback
+kite_session = SharedKiteSession(
+    kite,
+    RedisTokenStore(redis_client) if redis_client is not None else FileTokenStore(KITE_TOKEN_FILE),
+    check_interval=KITE_TOKEN_CHECK_INTERVAL,
+    on_change=start_market_feed,
+)
+
+@app.cli.command('momentum-sync')
+def momentum_sync_command():
+    """Append yesterday's daily candles and recompute sector momentum (run from cron)."""
+    sync_momentum()
+    click.echo(json.dumps(service.momentum.stats() if service.momentum is not None else {'error': 'MOMENTUM_ENABLED is not set'}))
+
+momentum_scheduler = DailyScheduler(
+    parse_times(MOMENTUM_SYNC_TIMES) if service.momentum is not None else [], sync_momentum, name='momentum-sync'
+)
+momentum_scheduler.start()
+
+@app.before_request
+def sync_kite_session():
+    kite_session.sync()
 
 @app.route('/', methods=['GET', 'POST'])
 @limiter.limit("5 per minute")
@@ -292,7 +712,7 @@ def home():
 
     form = RecommendationForm()
     stocks = None
-    request_id = str(uuid4())
+    request_id = g.request_id
     messages = []
 
     if form.validate_on_submit():
@@ -304,29 +724,26 @@ def home():
         time_str = parse_time_horizon(time_horizon)
         risk_str = parse_risk_level(risk_level)
 
-        cache_key = f"recommendations_{price_range.lower()}_{time_horizon.lower()}_{risk_level.lower()}"
-        cached_result = cache.get(cache_key)
+        cache_key = recommendation_cache_key(price_range, time_horizon, risk_level)
+        cached_result, state = recommendation_cache.get(cache_key)
         if cached_result:
             stocks = cached_result
-            logger.info(f"Using cached recommendations for {cache_key}")
+            logger.info(f"Using {state} cached recommendations for {cache_key}")
+            if state != FRESH:
+                recommendation_cache.refresh(
+                    cache_key,
+                    lambda: refresh_recommendations(price_range, range_str, time_str, risk_str, cache_key, risk_level),
+                )
         else:
-            stock_data = service.get_stock_data(price_range)
-            if isinstance(stock_data, dict) and 'error' in stock_data:
-                flash(stock_data['error'], 'error')
-                messages.append(stock_data['error'])
-                stocks = []
-            else:
-                prompt = build_prompt(range_str, time_str, risk_str, stock_data)
-                try:
-                    stocks = get_recommendations_from_api(prompt, cache_key)
-                except Exception as e:
-                    logger.error(f"Error: {str(e)}")
-                    flash(f"Error: {str(e)}", 'error')
-                    messages.append(f"Error: {str(e)}")
-                    stocks = cache.get(cache_key) or []
-                    if not stocks:
-                        flash("No recommendations available due to API failure. Try again later.", 'error')
-                        messages.append("No recommendations available due to API failure. Try again later.")
+            # Identical concurrent requests share one Kite + Grok computation
+            stocks, errors = coalescer.do(
+                cache_key,
+                lambda: generate_recommendations(price_range, range_str, time_str, risk_str, cache_key, risk_level),
+                lambda: cached_recommendations(cache_key),
+            )
+            for error in errors:
+                flash(error, 'error')
+                messages.append(error)
 
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({
@@ -341,42 +758,74 @@ def home():
                 flash(error_msg, 'error')
                 messages.append(error_msg)
 
-    return render_template('index.html', form=form, stocks=stocks, request_id=request_id)
+    with stage('template_render'):
+        # The empty form page only differs per request in its CSRF token and request id
+        if request.method == 'GET' and not app.debug and '_flashes' not in user_session:
+            return get_index_shell().response(request, generate_csrf(), request_id)
+        return render_template('index.html', form=form, stocks=stocks, request_id=request_id)
+
+CSRF_MARK = '\x00csrf-token\x00'
+REQUEST_ID_MARK = '\x00request-id\x00'
+index_shell = None
+
+def get_index_shell():
+    """index.html rendered once for a GET with markers in place of the CSRF token and request id"""
+    global index_shell
+    if index_shell is None:
+        with app.test_request_context('/'):
+            token = generate_csrf()
+            html = render_template('index.html', form=RecommendationForm(), stocks=None, request_id=REQUEST_ID_MARK)
+        index_shell = PageShell(html.replace(token, CSRF_MARK), (CSRF_MARK, REQUEST_ID_MARK))
+    return index_shell
 
 @app.route('/robots.txt')
 def robots_txt():
     """Serve robots.txt for SEO"""
-    try:
-        with open('public/robots.txt', 'r') as f:
-            response = make_response(f.read())
-            response.headers['Content-Type'] = 'text/plain'
-            return response
-    except FileNotFoundError:
-        return "User-agent: *\nAllow: /", 200, {'Content-Type': 'text/plain'}
+    return robots_response.response(request)
 
 @app.route('/sitemap.xml')
 def sitemap_xml():
     """Serve sitemap.xml for SEO"""
-    try:
-        with open('public/sitemap.xml', 'r') as f:
-            response = make_response(f.read())
-            response.headers['Content-Type'] = 'application/xml'
-            return response
-    except FileNotFoundError:
-        return "<?xml version='1.0' encoding='UTF-8'?><urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'></urlset>", 200, {'Content-Type': 'application/xml'}
+    return sitemap_response.response(request)
+
+def process_order_updates(events):
+    """Apply a batch of order postbacks: the latest update per order is kept in the cache"""
+    latest = {}
+    for event in events:
+        latest[f"order:{event['order_id']}"] = {key: value for key, value in event.items() if key != 'checksum'}
+    cache.set_many(latest, timeout=POSTBACK_DEDUP_TTL)
+    logger.info(f"Processed {len(events)} postback(s) for {len(latest)} order(s)", extra={'payload': events})
+
+postback_ingestor = PostbackIngestor(
+    RedisEventQueue(redis_client, maxsize=POSTBACK_QUEUE_SIZE) if redis_client is not None else MemoryEventQueue(POSTBACK_QUEUE_SIZE),
+    process_order_updates,
+    cache,
+    batch_size=POSTBACK_BATCH_SIZE,
+    consumers=POSTBACK_CONSUMERS,
+    dedup_ttl=POSTBACK_DEDUP_TTL,
+)
+postback_ingestor.start()
+metrics_registry.register_collector('postbacks', postback_ingestor.stats)
 
 @app.route('/postback', methods=['POST'])
+@limiter.exempt
 def postback():
-    """Handle Kite Connect postback webhooks"""
+    """Kite Connect order postbacks: verify the checksum and queue for batch processing"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Invalid postback data'}), 400
+    if not verify_postback(data, KITE_API_SECRET):
+        logger.warning(f"Rejected postback with an invalid checksum for order {data.get('order_id')}")
+        return jsonify({'error': 'Invalid postback checksum'}), 403
     try:
-        data = request.get_json()
-        logger.info(f"Received postback: {data}")
-        # Process the postback data here
-        # This could include order updates, position changes, etc.
-        return jsonify({'status': 'success'}), 200
+        outcome = postback_ingestor.submit(data)
     except Exception as e:
         logger.error(f"Postback error: {str(e)}")
-        return jsonify({'error': 'Invalid postback data'}), 400
+        return jsonify({'error': 'Postback could not be queued'}), 503
+    if outcome == FULL:
+        # Backpressure: ask the sender to retry once consumers have caught up
+        return jsonify({'error': 'Postback queue is full'}), 503, {'Retry-After': '1'}
+    return jsonify({'status': outcome}), 200
 
 @app.route('/callback')
 def callback():
@@ -385,8 +834,11 @@ def callback():
     if request_token:
         try:
             data = kite.generate_session(request_token, api_secret=KITE_API_SECRET)
-            kite.set_access_token(data['access_token'])
+            kite_session.login(data['access_token'])
             logger.info("Successfully authenticated with Zerodha")
+            if service.momentum is not None and not service.momentum.ready:
+                # First login on an empty store: backfill now instead of at the next scheduled sync
+                threading.Thread(target=sync_momentum, name='momentum-backfill', daemon=True).start()
             flash('Successfully authenticated with Zerodha.', 'success')
             return redirect('/')
         except Exception as e:
@@ -397,6 +849,107 @@ def callback():
         flash('Authentication failed: No request token provided.', 'error')
     return redirect('/')
 
+@app.route('/api/recommendations/batch', methods=['POST'])
+@limiter.limit("5 per minute")
+def batch_recommendations():
+    """Recommendations for several investor profiles in one request"""
+    if not kite.access_token:
+        return jsonify({'error': 'Kite API not authenticated'}), 503
+    payload = request.get_json(silent=True) or {}
+    profiles = payload.get('profiles')
+    if not isinstance(profiles, list) or not profiles:
+        return jsonify({'error': "Request body must contain a non-empty 'profiles' list"}), 400
+    fields = ('price_range', 'time_horizon', 'risk_level')
+    requested = []
+    for profile in profiles:
+        if not isinstance(profile, dict) or any(profile.get(field) not in form_choices(field) for field in fields):
+            return jsonify({'error': f"Invalid profile: {profile}"}), 400
+        requested.append(tuple(profile[field] for field in fields))
+    requested = list(dict.fromkeys(requested))
+    if len(requested) > RECOMMENDATION_BATCH_MAX_PROFILES:
+        return jsonify({
+            'error': f"At most {RECOMMENDATION_BATCH_MAX_PROFILES} distinct profiles per request; got {len(requested)}"
+        }), 400
+
+    results, usage = recommend_profiles(requested)
+    return jsonify({
+        'profiles': [
+            dict(zip(fields, profile), **results[recommendation_cache_key(*profile)])
+            for profile in requested
+        ],
+        'usage': usage
+    })
+
+@app.route('/api/recommendations/jobs', methods=['POST'])
+@limiter.limit("5 per minute")
+def submit_recommendation_job():
+    """Start a recommendation job and return its id without waiting for Kite or Grok"""
+    if JOB_API_UNAVAILABLE:
+        return jsonify({'error': JOB_API_UNAVAILABLE}), 503
+    if not kite.access_token:
+        return jsonify({'error': 'Kite API not authenticated'}), 503
+    payload = request.get_json(silent=True) or {}
+    fields = ('price_range', 'time_horizon', 'risk_level')
+    for field in fields:
+        if payload.get(field) not in form_choices(field):
+            return jsonify({'error': f"Invalid {field}: {payload.get(field)}"}), 400
+    price_range, time_horizon, risk_level = (payload[field] for field in fields)
+
+    cache_key = recommendation_cache_key(price_range, time_horizon, risk_level)
+    cached_result, state = recommendation_cache.get(cache_key)
+    if cached_result:
+        if state != FRESH:
+            recommendation_cache.refresh(
+                cache_key,
+                lambda: refresh_recommendations(
+                    price_range, parse_price_range(price_range), parse_time_horizon(time_horizon),
+                    parse_risk_level(risk_level), cache_key, risk_level
+                ),
+            )
+        return jsonify({'status': DONE, 'result': {'stocks': cached_result, 'messages': []}}), 200
+
+    job_id = recommendation_jobs.submit(
+        cache_key,
+        lambda: run_recommendation_job(price_range, time_horizon, risk_level, cache_key),
+    )
+    poll_url = f'/api/recommendations/jobs/{job_id}'
+    return jsonify({'job_id': job_id, 'status': PENDING, 'poll_url': poll_url}), 202, {'Location': poll_url}
+
+@app.route('/api/recommendations/jobs/<job_id>')
+@limiter.exempt
+def recommendation_job_status(job_id):
+    """Poll a recommendation job; `result` holds stocks and messages once it is done"""
+    if JOB_API_UNAVAILABLE:
+        return jsonify({'error': JOB_API_UNAVAILABLE}), 503
+    job = recommendation_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(dict(job, job_id=job_id)), 200
+
+@app.route('/recommendations/stream')
+@limiter.limit("5 per minute")
+def stream_recommendations():
+    """Server-sent events: one `stock` event per recommendation as soon as it parses.
+
+    The open stream holds a request thread until its last event; the Kite
+    and Grok work runs on `stream_fanout`, so the thread only waits for
+    events and a client that leaves does not cancel the work other
+    streams share. Only the job API keeps request threads off upstream I/O.
+    """
+    if not kite.access_token:
+        return jsonify({'error': 'Kite API not authenticated'}), 503
+    fields = ('price_range', 'time_horizon', 'risk_level')
+    profile = tuple(request.args.get(field, 'None') for field in fields)
+    for field, value in zip(fields, profile):
+        if value not in form_choices(field):
+            return jsonify({'error': f"Invalid {field}: {value}"}), 400
+    return Response(
+        stream_with_context(recommendation_events(*profile)),
+        mimetype='text/event-stream',
+        # Proxies such as nginx must not buffer the stream
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 def parse_price_range(price_range):
     if price_range == 'None':
         return "any price"
@@ -417,25 +970,383 @@ def parse_risk_level(risk_level):
         return "any risk level"
     return f"{risk_level} risk level"
 
-def build_prompt(range_str, time_str, risk_str, stock_data):
-    optimized_stock_data = [
-        {'symbol': stock['symbol'], 'price': stock['price']}
-        for stock in stock_data
+def recommendation_cache_key(price_range, time_horizon, risk_level):
+    return f"recommendations_{price_range.lower()}_{time_horizon.lower()}_{risk_level.lower()}"
+
+def generate_recommendations(price_range, range_str, time_str, risk_str, cache_key, risk_level='None'):
+    """Fetch stock data and ask the API for recommendations; returns (stocks, error messages)"""
+    stock_data = service.get_stock_data(price_range, risk_level=risk_level)
+    if isinstance(stock_data, dict) and 'error' in stock_data:
+        # e.g. Kite's circuit is open: keep serving whatever is still cached
+        return recommendation_cache.lookup(cache_key)[0] or [], [stock_data['error']]
+    prompt = build_prompt(range_str, time_str, risk_str, stock_data)
+    try:
+        return get_recommendations_from_api(prompt, cache_key), []
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        errors = [f"Error: {str(e)}"]
+        stocks = recommendation_cache.lookup(cache_key)[0] or []
+        if not stocks:
+            errors.append("No recommendations available due to API failure. Try again later.")
+        return stocks, errors
+
+def run_recommendation_job(price_range, time_horizon, risk_level, cache_key):
+    """Job body for the submit/poll API, run on a recommendation_jobs thread"""
+    with app.app_context():
+        stocks, errors = coalescer.do(
+            cache_key,
+            lambda: generate_recommendations(
+                price_range, parse_price_range(price_range), parse_time_horizon(time_horizon),
+                parse_risk_level(risk_level), cache_key, risk_level
+            ),
+            lambda: cached_recommendations(cache_key),
+        )
+    return {'stocks': stocks, 'messages': errors}
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def recommendation_events(price_range, time_horizon, risk_level):
+    """Yield SSE messages for one profile: `stock` per recommendation, then `done` or `failure`.
+
+    Cached recommendations are replayed at once. Otherwise the Grok answer is
+    streamed and each stock is sent as soon as its JSON object closes; a
+    completion cut off mid-object ends with `truncated` set and the partial
+    object dropped. Concurrent misses for the same profile share one
+    computation (see `stream_profile`).
+    """
+    request_id = g.get('request_id') or str(uuid4())
+    cache_key = recommendation_cache_key(price_range, time_horizon, risk_level)
+    range_str = parse_price_range(price_range)
+    time_str = parse_time_horizon(time_horizon)
+    risk_str = parse_risk_level(risk_level)
+
+    cached_result, state = recommendation_cache.get(cache_key)
+    if cached_result:
+        logger.info(f"Streaming {state} cached recommendations for {cache_key}")
+        if state != FRESH:
+            recommendation_cache.refresh(
+                cache_key,
+                lambda: refresh_recommendations(price_range, range_str, time_str, risk_str, cache_key, risk_level),
+            )
+        for stock in cached_result:
+            yield sse_event('stock', stock)
+        yield sse_event('done', {'count': len(cached_result), 'truncated': False, 'request_id': request_id})
+        return
+
+    broadcast = stream_fanout.subscribe(
+        cache_key,
+        lambda emit: stream_profile(emit, price_range, range_str, time_str, risk_str, cache_key, risk_level),
+    )
+    for stock in broadcast:
+        yield sse_event('stock', stock)
+    if broadcast.error is not None:
+        yield sse_event('failure', {'message': f"Error: {str(broadcast.error)}", 'request_id': request_id})
+        return
+    stocks, errors, truncated = broadcast.result
+    if errors:
+        yield sse_event('failure', {'message': errors[0], 'request_id': request_id})
+        return
+    yield sse_event('done', {'count': len(stocks), 'truncated': truncated, 'request_id': request_id})
+
+def stream_profile(emit, price_range, range_str, time_str, risk_str, cache_key, risk_level):
+    """Background computation shared by every SSE subscriber of one profile; returns (stocks, errors, truncated).
+
+    It goes through the coalescer like `generate_recommendations`, so a
+    matching / request in flight (or, with Redis, a worker holding the
+    profile's lock) answers it instead of a second Grok call; that answer
+    has no per-stock progress and is emitted all at once.
+    """
+    truncated = []
+
+    def compute():
+        stocks, errors, was_truncated = stream_grok_recommendations(
+            emit, price_range, range_str, time_str, risk_str, cache_key, risk_level
+        )
+        truncated.append(was_truncated)
+        return stocks, errors
+
+    with app.app_context():
+        stocks, errors = coalescer.do(cache_key, compute, lambda: cached_recommendations(cache_key, fresh_only=True))
+    if not truncated:
+        for stock in stocks:
+            emit(stock)
+    return stocks, errors, bool(truncated and truncated[0])
+
+def stream_grok_recommendations(emit, price_range, range_str, time_str, risk_str, cache_key, risk_level):
+    """Stream one profile's Grok answer, emitting each stock as it parses; returns (stocks, errors, truncated)"""
+    stock_data = service.get_stock_data(price_range, risk_level=risk_level)
+    if isinstance(stock_data, dict) and 'error' in stock_data:
+        return [], [stock_data['error']], False
+    prices = {stock['symbol']: stock['price'] for stock in stock_data}
+    prompt = build_prompt(range_str, time_str, risk_str, stock_data)
+
+    parser = StreamingStocksParser()
+    stocks = []
+    try:
+        for content in stream_completion(prompt):
+            for stock in parser.feed(content):
+                if not is_valid_stock(stock):
+                    continue
+                if stock['symbol'] in prices:
+                    stock['price'] = prices[stock['symbol']]
+                stocks.append(stock)
+                emit(stock)
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        return stocks, [f"Error: {str(e)}"], parser.truncated
+
+    if not stocks:
+        return [], ["Error: No valid stock recommendations found in API response"], parser.truncated
+    if parser.truncated:
+        # A cut-off answer is better than nothing now, but should not stand in for a full one for long
+        logger.warning(f"Streamed API response was truncated; dropped partial stock {parser.partial!r}")
+        recommendation_cache.set(cache_key, stocks, soft_ttl=RECOMMENDATION_TRUNCATED_TTL, stale_ttl=0)
+    else:
+        recommendation_cache.set(cache_key, stocks)
+    return stocks, [], parser.truncated
+
+def cached_recommendations(cache_key, fresh_only=False):
+    stocks, state = recommendation_cache.lookup(cache_key)
+    if not stocks or (fresh_only and state != FRESH):
+        return None
+    return stocks, []
+
+def refresh_recommendations(price_range, range_str, time_str, risk_str, cache_key, risk_level='None'):
+    """Background revalidation of a stale cache entry"""
+    with app.app_context():
+        _, errors = coalescer.do(
+            cache_key,
+            lambda: generate_recommendations(price_range, range_str, time_str, risk_str, cache_key, risk_level),
+            lambda: cached_recommendations(cache_key, fresh_only=True),
+        )
+    if errors:
+        raise RuntimeError('; '.join(errors))
+
+def form_choices(field):
+    return [value for value, _ in getattr(RecommendationForm, field).kwargs['choices']]
+
+def recommend_profiles(profiles, snapshot=None, force=False):
+    """Recommendations for many (price_range, time_horizon, risk_level) profiles.
+
+    Fresh cache entries are reused unless `force` is set. The remaining
+    profiles are grouped by price range and risk level, since those share
+    stock data (the risk level sets the beta filter), and
+    answered RECOMMENDATION_BATCH_SIZE profiles per Grok call with up to
+    PREWARM_CONCURRENCY calls in flight. Each batch goes through the
+    single-flight coalescer, so a profile another request (or worker) is
+    already computing is shared instead of asked for twice. Returns
+    (result by cache key, token usage report).
+    """
+    results = {}
+    pending = {}
+    for profile in profiles:
+        cache_key = recommendation_cache_key(*profile)
+        stocks, state = recommendation_cache.lookup(cache_key)
+        if stocks and state == FRESH and not force:
+            results[cache_key] = {'stocks': stocks, 'source': 'cache'}
+        else:
+            pending.setdefault((profile[0], profile[2]), {})[cache_key] = profile
+
+    batches = []
+    for (price_range, risk_level), entries in pending.items():
+        if snapshot is None:
+            snapshot = service.get_quote_snapshot()
+        stock_data = service.get_stock_data(price_range, risk_level=risk_level, snapshot=snapshot)
+        if isinstance(stock_data, dict) and 'error' in stock_data:
+            results.update({cache_key: {'stocks': [], 'error': stock_data['error']} for cache_key in entries})
+            continue
+        entries = list(entries.items())
+        for i in range(0, len(entries), RECOMMENDATION_BATCH_SIZE):
+            batches.append((entries[i:i + RECOMMENDATION_BATCH_SIZE], stock_data))
+
+    def run(batch):
+        entries, stock_data = batch
+        profiles = dict(entries)
+        calls = []
+
+        def compute(cache_keys):
+            ids = {f'p{number}': cache_key for number, cache_key in enumerate(cache_keys, start=1)}
+            texts = {}
+            for profile_id, cache_key in ids.items():
+                price_range, time_horizon, risk_level = profiles[cache_key]
+                texts[profile_id] = (parse_price_range(price_range), parse_time_horizon(time_horizon), parse_risk_level(risk_level))
+            prompt = build_batch_prompt(texts, stock_data)
+            single_call_tokens = sum(estimate_tokens(build_prompt(*text, stock_data, record=False)) for text in texts.values())
+            with app.app_context():
+                try:
+                    stocks, errors, usage = get_batch_recommendations_from_api(prompt, ids)
+                except Exception as e:
+                    logger.warning(f"Batch recommendations failed for {list(ids.values())}: {str(e)}")
+                    stocks, errors, usage = {}, {profile_id: str(e) for profile_id in ids}, {}
+            calls.append((len(ids), usage, estimate_tokens(prompt), single_call_tokens))
+            # Same (stocks, errors) shape as generate_recommendations, so single requests can share it
+            return {
+                cache_key: (stocks[profile_id], []) if profile_id in stocks
+                else ([], [errors.get(profile_id, 'No recommendations returned')])
+                for profile_id, cache_key in ids.items()
+            }
+
+        try:
+            shared = coalescer.do_many(
+                list(profiles), compute, lambda cache_key: cached_recommendations(cache_key, fresh_only=True)
+            )
+        except Exception as e:
+            # A request this batch coalesced onto failed
+            logger.warning(f"Coalesced recommendations failed for {list(profiles)}: {str(e)}")
+            shared = {cache_key: ([], [str(e)]) for cache_key in profiles}
+        return shared, calls
+
+    report = {
+        'batch_calls': 0,
+        'profiles': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'estimated_prompt_tokens': 0,
+        'estimated_single_call_prompt_tokens': 0,
+    }
+    with ThreadPoolExecutor(max_workers=PREWARM_CONCURRENCY, thread_name_prefix='recommend-batch') as pool:
+        for shared, calls in pool.map(run, batches):
+            for cache_key, (stocks, errors) in shared.items():
+                if stocks:
+                    results[cache_key] = {'stocks': stocks, 'source': 'api'}
+                else:
+                    results[cache_key] = {'stocks': [], 'error': '; '.join(errors) or 'No recommendations returned'}
+            for profiles, usage, prompt_tokens, single_call_tokens in calls:
+                report['batch_calls'] += 1
+                report['profiles'] += profiles
+                report['prompt_tokens'] += usage.get('prompt_tokens', 0)
+                report['completion_tokens'] += usage.get('completion_tokens', 0)
+                report['estimated_prompt_tokens'] += prompt_tokens
+                report['estimated_single_call_prompt_tokens'] += single_call_tokens
+    if report['profiles']:
+        for name in ('prompt_tokens', 'completion_tokens', 'estimated_prompt_tokens', 'estimated_single_call_prompt_tokens'):
+            report[f'{name}_per_profile'] = round(report[name] / report['profiles'], 1)
+        logger.info(f"Batch token usage: {report}")
+    return results, report
+
+def prewarm_recommendations(force=False):
+    """Precompute recommendations for every form combination from one quote snapshot.
+
+    Combinations whose cached entry is still fresh are skipped unless
+    `force` is set; the rest go through recommend_profiles in batches.
+    With Redis the cache is shared, so only one worker and instance
+    pre-warms at a time and a run that finds another in progress is
+    skipped. Without it every worker fills its own cache.
+    """
+    if prewarm_lock is None:
+        return run_prewarm(force)
+    with prewarm_lock.hold() as acquired:
+        if not acquired:
+            logger.info("Skipping pre-warm: another worker is already running it")
+            return {'combinations': 0, 'warmed': 0, 'skipped': 0, 'failed': 0, 'error': 'Pre-warm already running'}
+        return run_prewarm(force)
+
+def run_prewarm(force):
+    started = time.perf_counter()
+    summary = {'combinations': 0, 'warmed': 0, 'skipped': 0, 'failed': 0}
+    if not kite_session.sync(force=True):
+        logger.warning("Skipping pre-warm: Kite API not authenticated")
+        return dict(summary, error="Kite API not authenticated")
+    snapshot = service.get_quote_snapshot()
+    if 'error' in snapshot:
+        logger.error(f"Skipping pre-warm: {snapshot['error']}")
+        return dict(summary, error=snapshot['error'])
+
+    profiles = [
+        (price_range, time_horizon, risk_level)
+        for price_range in form_choices('price_range')
+        for time_horizon in form_choices('time_horizon')
+        for risk_level in form_choices('risk_level')
     ]
-    base = (
-        "Recommend up to 5 stocks from the Indian stock market (NSE) "
-        f"from top-performing sectors trading {range_str} "
-        f"with high potential for {time_str} growth (short-term: 3-6 months, medium-term: 1-2 years, long-term: 3-5 years) "
-        f"and {risk_str} (low: beta < 0.8, medium: beta 0.8-1.2, high: beta > 1.2). "
-        f"Stock Data: {json.dumps(optimized_stock_data, indent=2)}. "
-        "Ensure symbols end with .NS. Provide brief reasons (max 100 characters). "
-        "Return valid JSON: {'stocks': [{'name': 'Full Name', 'symbol': 'SYMBOL.NS', 'reason': 'brief reason'}]}."
+    results, summary['tokens'] = recommend_profiles(profiles, snapshot=snapshot, force=force)
+    summary['combinations'] = len(profiles)
+    for result in results.values():
+        if 'error' in result:
+            summary['failed'] += 1
+        else:
+            summary['skipped' if result['source'] == 'cache' else 'warmed'] += 1
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(f"Pre-warm finished: {summary}")
+    return summary
+
+@app.cli.command('prewarm')
+@click.option('--force', is_flag=True, help='Recompute combinations that are still fresh.')
+def prewarm_command(force):
+    """Precompute recommendations for all form combinations (run from cron)."""
+    if redis_client is None:
+        logger.warning("Pre-warming without REDIS_URL only fills this process's cache; use PREWARM_TIMES instead")
+    click.echo(json.dumps(prewarm_recommendations(force=force)))
+
+# A single runner only helps when the warmed cache is shared; otherwise each worker warms its own
+prewarm_lock = RunLock('prewarm', redis_client) if redis_client is not None else None
+if prewarm_lock is None and PREWARM_TIMES and WEB_CONCURRENCY > 1:
+    logger.warning(f"Without REDIS_URL each of the {WEB_CONCURRENCY} workers pre-warms its own cache, repeating the Grok calls")
+prewarm_scheduler = DailyScheduler(parse_times(PREWARM_TIMES), prewarm_recommendations, name='prewarm')
+prewarm_scheduler.start()
+
+def build_prompt(range_str, time_str, risk_str, stock_data, record=True):
+    with stage('prompt_build'):
+        compiled = prompt_compiler.compile(
+            "Recommend up to 5 stocks from the Indian stock market (NSE) "
+            f"from top-performing sectors trading {range_str} "
+            f"with high potential for {time_str} growth (short-term: 3-6 months, medium-term: 1-2 years, long-term: 3-5 years) "
+            f"and {risk_str} (low: beta < 0.8, medium: beta 0.8-1.2, high: beta > 1.2).\n"
+            "Stock Data (CSV, NSE symbols):\n",
+            "Append .NS to every symbol. Provide brief reasons (max 100 characters). "
+            "Return valid JSON: {'stocks': [{'name': 'Full Name', 'symbol': 'SYMBOL.NS', 'reason': 'brief reason'}]}.",
+            stock_data,
+            record=record,
+        )
+    if record:
+        logger.info(
+            f"Prompt size: {len(compiled.text)} characters, ~{compiled.tokens} tokens, "
+            f"{compiled.included}/{compiled.candidates} stocks"
+        )
+    return compiled.text
+
+def build_batch_prompt(profiles, stock_data):
+    """Prompt covering several investor profiles over the same stock data.
+
+    `profiles` maps a short profile id to its (range_str, time_str, risk_str).
+    """
+    profile_lines = "\n".join(
+        f'- "{profile_id}": stocks trading {range_str} with high potential for {time_str} growth and {risk_str}'
+        for profile_id, (range_str, time_str, risk_str) in profiles.items()
     )
-    logger.info(f"Prompt size: {len(base)} characters")
-    return base
+    with stage('prompt_build'):
+        compiled = prompt_compiler.compile(
+            "For each investor profile below, recommend up to 5 stocks from the Indian stock market (NSE) "
+            "from top-performing sectors (short-term: 3-6 months, medium-term: 1-2 years, long-term: 3-5 years; "
+            "low: beta < 0.8, medium: beta 0.8-1.2, high: beta > 1.2).\n"
+            f"Profiles:\n{profile_lines}\n"
+            "Stock Data (CSV, NSE symbols):\n",
+            "Append .NS to every symbol. Provide brief reasons (max 100 characters). "
+            "Return valid JSON keyed by profile id: "
+            "{'profiles': {'<profile id>': {'stocks': [{'name': 'Full Name', 'symbol': 'SYMBOL.NS', 'reason': 'brief reason'}]}}}.",
+            stock_data,
+        )
+    logger.info(
+        f"Batch prompt size: {len(compiled.text)} characters, ~{compiled.tokens} tokens, "
+        f"{compiled.included}/{compiled.candidates} stocks for {len(profiles)} profiles"
+    )
+    return compiled.text
 
-def get_recommendations_from_api(prompt, cache_key):
-    api_url = 'https://api.x.ai/v1/chat/completions'
+def retry_after_seconds(value):
+    """Seconds from a Retry-After header (delta-seconds or HTTP-date); None if absent or invalid"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+def post_completion(prompt, max_tokens, stream=False):
+    """POST a chat completion to Grok, mapping transport and HTTP failures to RuntimeError"""
     headers = {
         'Authorization': f'Bearer {GROK_API_KEY}',
         'Content-Type': 'application/json'
@@ -443,27 +1354,44 @@ def get_recommendations_from_api(prompt, cache_key):
     payload = {
         'model': 'grok-3-mini',
         'messages': [{'role': 'user', 'content': prompt}],
-        'max_tokens': 5000,
+        'max_tokens': max_tokens,
         'temperature': 0.7,
         'response_format': {'type': 'json_object'}
     }
+    if stream:
+        payload['stream'] = True
     try:
-        response = session.post(api_url, headers=headers, json=payload, timeout=30)
+        grok_breaker.before_call()
+    except CircuitOpenError as circuit_err:
+        upstream_errors.inc(service='grok', type='circuit_open')
+        logger.warning(str(circuit_err))
+        raise
+    grok_limiter.acquire()
+    try:
+        response = session.post(GROK_API_URL, headers=headers, json=payload, timeout=GROK_TIMEOUT, stream=stream)
         response.raise_for_status()
-        api_data = response.json()
-        content = api_data['choices'][0]['message']['content']
-        logger.debug(f"API response: {response.text}")
-        logger.info(f"Raw API content: {content}")
-        stocks = parse_api_response(content)
-        cache.set(cache_key, stocks, timeout=1800)
-        return stocks
+        grok_limiter.recover()
+        grok_breaker.record_success()
+        return response
     except requests.exceptions.Timeout:
-        logger.error("API request timed out after 30 seconds")
+        grok_breaker.record_failure()
+        upstream_errors.inc(service='grok', type='timeout')
+        logger.error(f"API request timed out after {GROK_TIMEOUT:g} seconds")
         raise RuntimeError("API request timed out. Please try again later.")
     except requests.exceptions.ConnectionError as conn_err:
+        grok_breaker.record_failure()
+        upstream_errors.inc(service='grok', type='connection')
         logger.error(f"API network error: {str(conn_err)}")
         raise RuntimeError("Network error connecting to API. Please check your connection.")
     except requests.exceptions.HTTPError as http_err:
+        status = http_err.response.status_code
+        if status == 429:
+            grok_limiter.throttle(retry_after_seconds(http_err.response.headers.get('Retry-After')))
+        if status >= 500:
+            grok_breaker.record_failure()
+        else:
+            grok_breaker.release()
+        upstream_errors.inc(service='grok', type=f'http_{status}')
         logger.error(f"API HTTP Error: {str(http_err)}")
         if http_err.response.status_code == 429:
             raise RuntimeError("API rate limit exceeded. Please try again later.")
@@ -473,9 +1401,95 @@ def get_recommendations_from_api(prompt, cache_key):
             raise RuntimeError("API key is invalid or expired. Please verify your GROK_API_KEY.")
         else:
             raise RuntimeError(f"API Error ({http_err.response.status_code}): {str(http_err)}")
+    except requests.exceptions.RequestException as req_err:
+        # e.g. ChunkedEncodingError or ContentDecodingError: the upstream misbehaved
+        grok_breaker.record_failure()
+        upstream_errors.inc(service='grok', type='request')
+        logger.error(f"API request failed: {str(req_err)}")
+        raise RuntimeError("Error communicating with API. Please try again later.")
+    except BaseException:
+        # Never leave a half-open probe outstanding, or the circuit would stay shut
+        grok_breaker.release()
+        raise
+
+def request_completion(prompt, max_tokens=GROK_REASONING_TOKENS + answer_tokens()):
+    """POST a chat completion to Grok and return the decoded response body"""
+    with stage('grok_call'):
+        response = post_completion(prompt, max_tokens)
+    if logger.isEnabledFor(logging.DEBUG):
+        # Decoding the whole body is only worth it when it will be logged
+        logger.debug(f"API response ({len(response.content)} bytes)", extra={'payload': response.text})
+    api_data = response.json()
+    record_grok_usage(api_data.get('usage') or {})
+    return api_data
+
+def stream_completion(prompt, max_tokens=GROK_REASONING_TOKENS + answer_tokens()):
+    """Stream a Grok chat completion, yielding answer content deltas as they arrive"""
+    started = time.perf_counter()
+    response = post_completion(prompt, max_tokens, stream=True)
+    # SSE bodies are UTF-8 but are often sent without a charset
+    response.encoding = 'utf-8'
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            chunk = json.loads(data)
+            if chunk.get('usage'):
+                record_grok_usage(chunk['usage'])
+            choices = chunk.get('choices') or []
+            content = (choices[0].get('delta') or {}).get('content') if choices else None
+            if content:
+                yield content
+    except requests.exceptions.RequestException as stream_err:
+        grok_breaker.record_failure()
+        upstream_errors.inc(service='grok', type='stream_interrupted')
+        logger.error(f"API stream interrupted: {str(stream_err)}")
+        raise RuntimeError("API response stream was interrupted. Please try again later.")
+    finally:
+        response.close()
+        record_stage('grok_stream', time.perf_counter() - started)
+
+def get_recommendations_from_api(prompt, cache_key):
+    try:
+        api_data = request_completion(prompt)
+        content = api_data['choices'][0]['message']['content']
+        logger.info(f"Raw API content ({len(content)} chars)", extra={'payload': content})
+        with stage('json_parse'):
+            stocks = parse_api_response(content)
+        recommendation_cache.set(cache_key, stocks)
+        return stocks
+    except RuntimeError:
+        raise
+    except Exception as e:
+        upstream_errors.inc(service='grok', type='invalid_response')
+        logger.error(f"API Error: {str(e)}")
+        raise ValueError(f"Error fetching recommendations: {str(e)}")
+
+def get_batch_recommendations_from_api(prompt, cache_keys):
+    """One completion for several profiles; `cache_keys` maps profile id to cache key.
+
+    Returns (stocks by profile id, errors by profile id, token usage).
+    Every profile that parses is cached on its own key.
+    """
+    max_tokens = GROK_REASONING_TOKENS + answer_tokens(profiles=len(cache_keys))
+    try:
+        api_data = request_completion(prompt, max_tokens=max_tokens)
+        content = api_data['choices'][0]['message']['content']
+    except RuntimeError:
+        raise
     except Exception as e:
+        upstream_errors.inc(service='grok', type='invalid_response')
         logger.error(f"API Error: {str(e)}")
         raise ValueError(f"Error fetching recommendations: {str(e)}")
+    logger.info(f"Raw batch API content ({len(content)} chars)", extra={'payload': content})
+    with stage('json_parse'):
+        results, errors = parse_batch_api_response(content, list(cache_keys))
+    for profile_id, stocks in results.items():
+        recommendation_cache.set(cache_keys[profile_id], stocks)
+    return results, errors, api_data.get('usage', {})
 
 def parse_api_response(content):
     try:
@@ -493,30 +1507,62 @@ def parse_api_response(content):
         json_result = json.loads(content)
         if 'stocks' not in json_result or not isinstance(json_result['stocks'], list):
             raise ValueError("Invalid JSON structure: 'stocks' key missing or not a list")
-        stocks = json_result.get('stocks', [])
-        
-        valid_stocks = []
-        for stock in stocks:
-            if all(key in stock for key in ['name', 'symbol', 'reason']):
-                if stock['name'] and stock['symbol'] and stock['reason']:
-                    valid_stocks.append(stock)
-                else:
-                    logger.warning(f"Skipping incomplete stock entry: {stock}")
-            else:
-                logger.warning(f"Skipping invalid stock entry: {stock}")
-        
-        if not valid_stocks:
-            raise ValueError("No valid stock recommendations found in API response")
-        
-        return valid_stocks
+        return validate_stocks(json_result.get('stocks', []))
     except json.JSONDecodeError as json_err:
         logger.error(f"JSON Parse Error: {str(json_err)}")
-        logger.error(f"Problematic content: {content}")
+        logger.error("Problematic content", extra={'payload': content})
         raise ValueError(f"Error parsing recommendations: Invalid JSON format - {str(json_err)}")
     except Exception as e:
         logger.error(f"JSON Parse Error: {str(e)}")
         raise ValueError(f"Error parsing recommendations: {str(e)}")
 
+def is_valid_stock(stock):
+    if isinstance(stock, dict) and all(key in stock for key in ['name', 'symbol', 'reason']):
+        if stock['name'] and stock['symbol'] and stock['reason']:
+            return True
+        logger.warning(f"Skipping incomplete stock entry: {stock}")
+    else:
+        logger.warning(f"Skipping invalid stock entry: {stock}")
+    return False
+
+def validate_stocks(stocks):
+    valid_stocks = [stock for stock in stocks if is_valid_stock(stock)]
+
+    if not valid_stocks:
+        raise ValueError("No valid stock recommendations found in API response")
+
+    return valid_stocks
+
+def parse_batch_api_response(content, profile_ids):
+    """Split a multi-profile completion into validated stocks per profile id.
+
+    Returns (stocks by profile id, error message by profile id); a profile
+    that is missing or has no valid stocks fails on its own.
+    """
+    try:
+        json_result = json.loads(content)
+    except json.JSONDecodeError as json_err:
+        logger.error(f"JSON Parse Error: {str(json_err)}")
+        message = f"Error parsing recommendations: Invalid JSON format - {str(json_err)}"
+        return {}, {profile_id: message for profile_id in profile_ids}
+    profiles = json_result.get('profiles') if isinstance(json_result, dict) else None
+    if not isinstance(profiles, dict):
+        message = "Error parsing recommendations: Invalid JSON structure: 'profiles' key missing or not an object"
+        return {}, {profile_id: message for profile_id in profile_ids}
+
+    results, errors = {}, {}
+    for profile_id in profile_ids:
+        entry = profiles.get(profile_id)
+        stocks = entry.get('stocks') if isinstance(entry, dict) else entry
+        try:
+            if not isinstance(stocks, list):
+                raise ValueError(f"Invalid JSON structure: 'stocks' missing for profile {profile_id}")
+            results[profile_id] = validate_stocks(stocks)
+        except ValueError as e:
+            logger.warning(f"Batch profile {profile_id} failed: {str(e)}")
+            errors[profile_id] = f"Error parsing recommendations: {str(e)}"
+    return results, errors
+
 if __name__ == '__main__':
     # Get port from environment variable for deployment platforms
     port = int(os.environ.get('PORT', 5003))
@@ -0,0 +1,226 @@
+"""Concurrent-request capacity of the blocking `/` POST, the SSE stream and the submit/poll job API.
+
+The app is served by a WSGI server with a fixed pool of request threads
+(like `gunicorn --threads 8`); Kite quotes come from a FakeKite and Grok
+from a local stub, both with configurable latency. A /health probe runs
+throughout to show whether request threads are pinned by upstream I/O.
+The `stream` mode reads /recommendations/stream like an EventSource, to
+its `done` event; an open stream holds a request thread by design.
+
+Grok calls go through the app's rate limiter at --grok-rps (the
+production default is 5/s, which alone spaces 32 distinct profiles over
+about 6s).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_async_capacity --users 32 --threads 8 --grok-latency 2
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import requests
+
+from benchmarks.fakes import FakeKite, import_app, temp_instrument_store
+from benchmarks.stub_servers import GrokStubHandler, StubServer
+from benchmarks.timing import percentile
+
+STUB_STOCKS = [
+    {'name': f'Stub Company {i}', 'symbol': f'STUB{i}.NS', 'reason': 'Stub recommendation'}
+    for i in range(5)
+]
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server that handles connections on a fixed pool of threads, like gunicorn's gthread worker"""
+
+    request_queue_size = 256
+
+    def __init__(self, address, threads):
+        super().__init__(address, _QuietHandler)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        self._lock = threading.Lock()
+        self.busy = 0
+        self.peak_busy = 0
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        with self._lock:
+            self.busy += 1
+            self.peak_busy = max(self.peak_busy, self.busy)
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self.busy -= 1
+
+
+def blocking_request(base_url, profile):
+    response = requests.post(
+        f'{base_url}/',
+        json=dict(zip(('price_range', 'time_horizon', 'risk_level'), profile)),
+        headers={'X-Requested-With': 'XMLHttpRequest'},
+        timeout=300,
+    )
+    return bool(response.json().get('stocks'))
+
+
+def stream_request(base_url, profile):
+    response = requests.get(
+        f'{base_url}/recommendations/stream',
+        params=dict(zip(('price_range', 'time_horizon', 'risk_level'), profile)),
+        stream=True,
+        timeout=300,
+    )
+    stocks = 0
+    with response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line == 'event: stock':
+                stocks += 1
+            elif line in ('event: done', 'event: failure'):
+                break
+    return stocks > 0
+
+
+def job_request(base_url, profile, poll_interval):
+    response = requests.post(
+        f'{base_url}/api/recommendations/jobs',
+        json=dict(zip(('price_range', 'time_horizon', 'risk_level'), profile)),
+        timeout=300,
+    )
+    job = response.json()
+    while job['status'] == 'pending':
+        time.sleep(poll_interval)
+        job = requests.get(f"{base_url}/api/recommendations/jobs/{job['job_id']}", timeout=300).json()
+    return job['status'] == 'done' and bool(job['result']['stocks'])
+
+
+def run_mode(app, base_url, server, profiles, request_fn):
+    app.cache.clear()
+    server.peak_busy = 0
+    probes = []
+    stop = threading.Event()
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            requests.get(f'{base_url}/health', timeout=300)
+            probes.append(time.perf_counter() - started)
+            stop.wait(0.1)
+
+    def user(profile):
+        started = time.perf_counter()
+        ok = request_fn(profile)
+        return ok, time.perf_counter() - started
+
+    prober = threading.Thread(target=probe, daemon=True)
+    started = time.perf_counter()
+    prober.start()
+    with ThreadPoolExecutor(max_workers=len(profiles)) as clients:
+        outcomes = list(clients.map(user, profiles))
+    wall = time.perf_counter() - started
+    stop.set()
+    prober.join()
+
+    latencies = [seconds for _, seconds in outcomes]
+    return {
+        'wall_seconds': round(wall, 3),
+        'users_with_stocks': sum(ok for ok, _ in outcomes),
+        'latency_p50': round(statistics.median(latencies), 3),
+        'latency_p95': round(percentile(latencies, 0.95), 3),
+        'latency_max': round(max(latencies), 3),
+        'health_probe_p95': round(percentile(probes, 0.95), 4),
+        'health_probe_max': round(max(probes), 4),
+        'peak_busy_request_threads': server.peak_busy,
+        'completed_per_second': round(len(profiles) / wall, 2),
+    }
+
+
+def run(users, threads, kite_latency, kite_rps, grok_latency, grok_rps, job_workers, poll_interval):
+    with StubServer(GrokStubHandler, latency=grok_latency, stocks=STUB_STOCKS) as grok:
+        os.environ['GROK_API_URL'] = f'{grok.url}/v1/chat/completions'
+        app = import_app()
+        from coalescing import StreamFanOut
+        from jobs import JobQueue
+        from quotes import RateLimiter
+        from token_store import FileTokenStore
+
+        mapped = [symbol for symbols in app.service.sector_mapping.values() for symbol in symbols]
+        kite = FakeKite(mapped, instrument_count=2000, quote_latency=kite_latency)
+        app.kite_session.store = FileTokenStore(os.path.join(tempfile.mkdtemp(prefix='bench-token-'), 'token.json'))
+        app.kite_session.login('bench-access-token')
+        app.service = app.StockRecommendationService(
+            kite,
+            quote_fetcher=app.QuoteFetcher(kite, requests_per_second=kite_rps),
+            instrument_store=temp_instrument_store(kite),
+        )
+        app.recommendation_jobs = JobQueue(app.cache, max_workers=job_workers)
+        app.stream_fanout = StreamFanOut(max_workers=job_workers)
+        app.grok_limiter = RateLimiter(grok_rps, burst=max(int(grok_rps), 1))
+        app.app.config['WTF_CSRF_ENABLED'] = False
+        app.limiter.enabled = False
+
+        combos = list(product(('None', '1000+', '500-1000', '200-500'), app.form_choices('time_horizon'), app.form_choices('risk_level')))
+        profiles = [combos[i % len(combos)] for i in range(users)]
+
+        server = PooledWSGIServer(('127.0.0.1', 0), threads)
+        server.set_app(app.app)
+        serving = threading.Thread(target=server.serve_forever, daemon=True)
+        serving.start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        try:
+            return {
+                'config': {
+                    'users': users, 'request_threads': threads, 'job_workers': job_workers,
+                    'kite_latency': kite_latency, 'kite_rps': kite_rps,
+                    'grok_latency': grok_latency, 'grok_rps': grok_rps,
+                },
+                'blocking': run_mode(app, base_url, server, profiles, lambda p: blocking_request(base_url, p)),
+                'stream': run_mode(app, base_url, server, profiles, lambda p: stream_request(base_url, p)),
+                'jobs': run_mode(app, base_url, server, profiles, lambda p: job_request(base_url, p, poll_interval)),
+            }
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=32, help='concurrent users with distinct profiles')
+    parser.add_argument('--threads', type=int, default=8, help='request threads, as gunicorn --threads')
+    parser.add_argument('--kite-latency', type=float, default=0.2, help='seconds per kite.quote call')
+    parser.add_argument(
+        '--kite-rps', type=float, default=100.0,
+        help='quote request budget; the production default of 1/s would serialise both modes'
+    )
+    parser.add_argument('--grok-latency', type=float, default=2.0, help='seconds per Grok completion')
+    parser.add_argument('--grok-rps', type=float, default=5.0, help='Grok request budget (GROK_REQUESTS_PER_SECOND)')
+    parser.add_argument('--job-workers', type=int, default=32, help='threads running recommendation jobs')
+    parser.add_argument('--poll-interval', type=float, default=0.25)
+    args = parser.parse_args()
+    results = run(
+        args.users, args.threads, args.kite_latency, args.kite_rps, args.grok_latency, args.grok_rps,
+        args.job_workers, args.poll_interval,
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
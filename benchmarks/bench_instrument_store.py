@@ -0,0 +1,54 @@
+"""Worker warm start: downloading the instrument dump vs mapping today's snapshot.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_instrument_store --instruments 9000 --download-latency 1.5
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeKite
+from instrument_store import InstrumentStore
+
+
+def measure(load):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, {'seconds': seconds, 'retained_kib': retained / 1024, 'peak_kib': peak / 1024}
+
+
+def run(instrument_count, download_latency):
+    kite = FakeKite(instrument_count=instrument_count)
+
+    def download(exchange):
+        time.sleep(download_latency)
+        return kite.instruments(exchange)
+
+    root = tempfile.mkdtemp(prefix='bench-instruments-')
+    results = {}
+    instruments, results['download_dicts'] = measure(lambda: download('NSE'))
+    del instruments
+    _, results['first_worker_snapshot'] = measure(lambda: InstrumentStore(root, download).get().segment_size())
+    # A second worker on the same host finds the snapshot and only maps it
+    _, results['next_worker_mmap'] = measure(lambda: InstrumentStore(root, download).get().segment_size())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instruments', type=int, default=9000)
+    parser.add_argument('--download-latency', type=float, default=1.5, help='seconds the fake dump download takes')
+    args = parser.parse_args()
+    print(json.dumps(run(args.instruments, args.download_latency), indent=2))
+
+
+if __name__ == '__main__':
+    main()
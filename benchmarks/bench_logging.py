@@ -0,0 +1,76 @@
+"""Caller-side cost of logging a large payload: synchronous vs the queued pipeline.
+
+`legacy` formats the whole stock list into the message with an f-string
+and writes it on the calling thread, as get_stock_data used to.
+`pipeline` logs the same record through log_pipeline with the payload
+passed as `extra` and sampled. The sink can be slowed down with
+--write-latency to model a congested disk or log collector; only the
+synchronous handler makes the caller wait for it.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_logging --stocks 200 --write-latency 0.0005
+"""
+import argparse
+import io
+import json
+import logging
+import time
+
+from benchmarks.bench_suite import synthetic_stock_data
+from benchmarks.timing import measure
+from log_pipeline import TEXT_FORMAT, configure_logging
+
+
+class SlowStream(io.StringIO):
+    """In-memory log sink whose writes take `latency` seconds"""
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def write(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return super().write(text)
+
+
+def run(stocks, iterations, write_latency, sample_rate):
+    stock_data = synthetic_stock_data(stocks)
+    results = {}
+
+    legacy = logging.getLogger('bench.legacy')
+    legacy.propagate = False
+    handler = logging.StreamHandler(SlowStream(write_latency))
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    legacy.addHandler(handler)
+    legacy.setLevel(logging.INFO)
+    results['legacy'] = measure(lambda: legacy.info(f"Retrieved stock data: {stock_data}"), iterations)
+
+    for fmt in ('text', 'json'):
+        queued = logging.getLogger(f'bench.pipeline.{fmt}')
+        queued.propagate = False
+        pipeline = configure_logging(
+            fmt=fmt, stream=SlowStream(write_latency), sample_rate=sample_rate, queue_size=iterations * 2, logger=queued
+        )
+        results[f'pipeline_{fmt}'] = measure(
+            lambda: queued.info(f"Retrieved stock data for {len(stock_data)} stocks", extra={'payload': stock_data}),
+            iterations,
+        )
+        pipeline.stop()
+        results[f'pipeline_{fmt}']['logging'] = pipeline.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stocks', type=int, default=200, help='rows in the logged stock list')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--write-latency', type=float, default=0.0005, help='seconds per write to the log sink')
+    parser.add_argument('--sample-rate', type=float, default=0.1, help='fraction of INFO payloads serialised')
+    args = parser.parse_args()
+    print(json.dumps(run(args.stocks, args.iterations, args.write_latency, args.sample_rate), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Sector ranking and stock data latency with REST quotes vs the live tick table.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_market_feed --latency 0.1 --rounds 5
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fakes import FakeKite, FakeTicker, import_app, temp_instrument_store, ticks_from_kite
+from market_feed import LiveQuoteFetcher, LiveQuoteTable, MarketFeed
+from quotes import QuoteFetcher
+
+
+def run(latency, rounds):
+    app = import_app()
+    mapped = [symbol for symbols in app.service.sector_mapping.values() for symbol in symbols]
+    results = {}
+    for label in ('rest', 'live'):
+        kite = FakeKite(mapped, quote_latency=latency)
+        rest = QuoteFetcher(kite, requests_per_second=100)
+        service = app.StockRecommendationService(kite, quote_fetcher=rest, instrument_store=temp_instrument_store(kite))
+        if label == 'live':
+            table = LiveQuoteTable()
+            feed = MarketFeed('bench', table, ticker_factory=FakeTicker)
+            service.quote_fetcher = LiveQuoteFetcher(table, rest)
+            feed.start('bench', service.get_instrument_keys_by_token())
+            feed.ticker.emit(ticks_from_kite(kite, table.tokens))
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            service.get_stock_data('None')
+            timings.append(time.perf_counter() - started)
+        results[label] = {
+            'mean_seconds': sum(timings) / len(timings),
+            'rest_quote_calls': kite.quote_calls,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds per fake REST quote call')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.latency, args.rounds), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Burst of Kite order postbacks through /postback and the batched consumers.
+
+Every event carries a valid checksum; --duplicate-rate of them are
+redeliveries of an earlier event. The consumer's work is modelled as
+--batch-cost seconds per batch plus --event-cost per event. Reported:
+endpoint latency percentiles, how long the queue took to drain after the
+burst, and the ingestor counters (batches, duplicates, rejections).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_postbacks --events 2000 --duplicate-rate 0.2
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.fakes import import_app
+from benchmarks.timing import summarize
+
+
+def run(events, duplicate_rate, batch_cost, event_cost, seed=5):
+    app = import_app()
+    from postbacks import postback_checksum
+
+    def process(batch):
+        time.sleep(batch_cost + event_cost * len(batch))
+
+    app.postback_ingestor.process_batch = process
+    client = app.app.test_client()
+    secret = os.environ['KITE_API_SECRET']
+    rng = random.Random(seed)
+    sent = []
+    latencies = []
+    statuses = {}
+    for i in range(events):
+        if sent and rng.random() < duplicate_rate:
+            event = rng.choice(sent)
+        else:
+            timestamp = '2026-01-05 10:15:00'
+            event = {
+                'order_id': f'2601050000{i:05d}', 'order_timestamp': timestamp, 'status': 'COMPLETE',
+                'filled_quantity': 1, 'tradingsymbol': 'INFY',
+                'checksum': postback_checksum(f'2601050000{i:05d}', timestamp, secret),
+            }
+            sent.append(event)
+        started = time.perf_counter()
+        response = client.post('/postback', json=event)
+        latencies.append(time.perf_counter() - started)
+        key = (response.get_json() or {}).get('status', str(response.status_code))
+        statuses[key] = statuses.get(key, 0) + 1
+
+    burst_done = time.perf_counter()
+    while app.postback_ingestor.stats()['depth'] > 0:
+        time.sleep(0.01)
+    # Allow the batch in flight to finish
+    expected = statuses.get('queued', 0)
+    while app.postback_ingestor.stats()['processed'] < expected:
+        time.sleep(0.01)
+    return {
+        'endpoint': summarize(latencies, sum(latencies)),
+        'responses': statuses,
+        'drain_seconds_after_burst': round(time.perf_counter() - burst_done, 3),
+        'ingestor': app.postback_ingestor.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.2)
+    parser.add_argument('--batch-cost', type=float, default=0.005, help='seconds of consumer work per batch')
+    parser.add_argument('--event-cost', type=float, default=0.0002, help='seconds of consumer work per event')
+    args = parser.parse_args()
+    print(json.dumps(run(args.events, args.duplicate_rate, args.batch_cost, args.event_cost), indent=2))
+
+
+if __name__ == '__main__':
+    main()
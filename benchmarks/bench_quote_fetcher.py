@@ -0,0 +1,47 @@
+"""Latency of serial vs concurrent kite.quote batches against a local stub.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_quote_fetcher --batches 12 --latency 0.2 --rps 10
+"""
+import argparse
+import json
+import time
+
+from kiteconnect import KiteConnect
+
+from benchmarks.stub_servers import KiteStubHandler, StubServer
+from quotes import QuoteFetcher, batch_instruments
+
+
+def run(batch_count, batch_size, latency, workers, rps):
+    symbols = [f'SYM{i}' for i in range(batch_count * batch_size)]
+    batches = batch_instruments(symbols, batch_size=batch_size)
+    results = {}
+    with StubServer(KiteStubHandler, latency=latency) as server:
+        kite = KiteConnect(api_key='bench', access_token='bench', root=server.url)
+        for label, max_workers in (('serial', 1), ('concurrent', workers)):
+            fetcher = QuoteFetcher(kite, max_workers=max_workers, requests_per_second=rps)
+            started = time.perf_counter()
+            result = fetcher.fetch(batches)
+            results[label] = {
+                'seconds': time.perf_counter() - started,
+                'quotes': len(result.data),
+                'failed_batches': len(result.errors),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batches', type=int, default=12)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds the stub waits per request')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rps', type=float, default=10.0, help='quote requests per second budget')
+    args = parser.parse_args()
+    print(json.dumps(run(args.batches, args.batch_size, args.latency, args.workers, args.rps), indent=2))
+
+
+if __name__ == '__main__':
+    main()
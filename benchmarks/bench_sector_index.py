@@ -0,0 +1,69 @@
+"""Micro-benchmark: per-symbol sector scan vs the compiled SectorIndex.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sector_index --symbols 40 2000 8000 --sectors 20
+"""
+import argparse
+import json
+import random
+import timeit
+
+from sector_index import SectorIndex
+
+
+def legacy_rank(sector_mapping, symbols, market_data):
+    """Sector ranking as it worked before the inverted index"""
+    sector_gains = {}
+    for symbol in symbols:
+        quote = market_data.get(f'NSE:{symbol}', {})
+        if not quote or 'last_price' not in quote or 'price_change' not in quote:
+            continue
+        percent_change = (quote['price_change'] / (quote['last_price'] - quote['price_change'])) * 100 if quote['last_price'] != quote['price_change'] else 0
+        sector = None
+        for sec, syms in sector_mapping.items():
+            if symbol in syms:
+                sector = sec
+                break
+        if not sector:
+            continue
+        sector_gains.setdefault(sector, []).append(percent_change)
+    averages = {sector: sum(gains) / len(gains) for sector, gains in sector_gains.items() if gains}
+    return sorted(averages, key=averages.get, reverse=True)[:2]
+
+
+def universe(symbol_count, sector_count, seed=11):
+    rng = random.Random(seed)
+    sector_mapping = {f'Sector {i}': [] for i in range(sector_count)}
+    market_data = {}
+    for i in range(symbol_count):
+        symbol = f'SYM{i}'
+        sector_mapping[f'Sector {i % sector_count}'].append(symbol)
+        last_price = rng.uniform(20, 3000)
+        market_data[f'NSE:{symbol}'] = {'last_price': last_price, 'price_change': last_price * rng.uniform(-0.05, 0.05)}
+    return sector_mapping, market_data
+
+
+def run(symbol_counts, sector_count, repeat):
+    results = {}
+    for symbol_count in symbol_counts:
+        sector_mapping, market_data = universe(symbol_count, sector_count)
+        index = SectorIndex(sector_mapping)
+        assert index.rank_sectors(market_data) == legacy_rank(sector_mapping, index.symbols, market_data)
+        legacy = min(timeit.repeat(lambda: legacy_rank(sector_mapping, index.symbols, market_data), number=1, repeat=repeat))
+        indexed = min(timeit.repeat(lambda: index.rank_sectors(market_data), number=1, repeat=repeat))
+        results[symbol_count] = {'legacy_ms': legacy * 1000, 'indexed_ms': indexed * 1000, 'speedup': legacy / indexed}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[40, 2000, 8000])
+    parser.add_argument('--sectors', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.symbols, args.sectors, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
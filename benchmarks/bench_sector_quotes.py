@@ -0,0 +1,79 @@
+"""Compare full-universe and sector-scoped quoting for sector ranking.
+
+Both paths send their kite.quote calls through the same kind of
+RateLimiter at --rps (the production KITE_QUOTE_RPS default is 1/s), so
+the timings include the rate-limit waits each path's request count
+costs. Pass a high --rps to compare raw fan-out instead.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sector_quotes --instruments 2500 --latency 0.05
+"""
+import argparse
+import json
+import time
+
+from benchmarks.fakes import FakeKite, import_app, temp_instrument_store
+from quotes import QUOTE_REQUESTS_PER_SECOND
+
+
+def legacy_top_gaining_sectors(service):
+    """Sector ranking as it worked before quotes were scoped to sector symbols"""
+    instruments = service.kite.instruments('NSE')
+    symbols = [inst['tradingsymbol'] for inst in instruments if inst['segment'] == 'NSE']
+    market_data = {}
+    for i in range(0, len(symbols), 500):
+        service.quote_fetcher.limiter.acquire()
+        market_data.update(service.kite.quote([f'NSE:{symbol}' for symbol in symbols[i:i + 500]]))
+    sector_gains = {}
+    for symbol in symbols:
+        quote = market_data.get(f'NSE:{symbol}', {})
+        if not quote or 'last_price' not in quote or 'price_change' not in quote:
+            continue
+        percent_change = (quote['price_change'] / (quote['last_price'] - quote['price_change'])) * 100 if quote['last_price'] != quote['price_change'] else 0
+        for sector, sector_symbols in service.sector_mapping.items():
+            if symbol in sector_symbols:
+                sector_gains.setdefault(sector, []).append(percent_change)
+                break
+    averages = {sector: sum(gains) / len(gains) for sector, gains in sector_gains.items() if gains}
+    return sorted(averages, key=averages.get, reverse=True)[:2]
+
+
+def run(instrument_count, latency, rounds, rps):
+    app = import_app()
+    mapped = [symbol for symbols in app.service.sector_mapping.values() for symbol in symbols]
+    results = {}
+    for label, rank in (('legacy', legacy_top_gaining_sectors), ('sector_scoped', None)):
+        kite = FakeKite(mapped, instrument_count=instrument_count, quote_latency=latency)
+        service = app.StockRecommendationService(
+            kite,
+            quote_fetcher=app.QuoteFetcher(kite, requests_per_second=rps),
+            instrument_store=temp_instrument_store(kite),
+        )
+        rank = rank or (lambda svc: svc.get_top_gaining_sectors())
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            top = rank(service)
+            timings.append(time.perf_counter() - started)
+        results[label] = {
+            'top_sectors': top,
+            'mean_seconds': sum(timings) / len(timings),
+            'quote_calls_per_round': kite.quote_calls / rounds,
+            'instruments_quoted_per_round': kite.quoted_instruments / rounds,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instruments', type=int, default=2500)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per fake quote call')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--rps', type=float, default=QUOTE_REQUESTS_PER_SECOND, help='kite.quote budget for both paths')
+    args = parser.parse_args()
+    print(json.dumps(run(args.instruments, args.latency, args.rounds, args.rps), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Sector universe size vs the cost of loading it and of the per-request lookups.
+
+For each size a classification CSV is written, loaded through
+SectorUniverse and bound to a FakeKite instrument master that lists 95%
+of its symbols. Reported per size: file load, first bind, the per-request
+`validate` + `symbols_for` path once bound, sector aggregation over a
+full set of quotes, and a hot reload that adds 1% new symbols (only those
+are looked up again).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_sector_universe --symbols 40 2000 8000 --sectors 40
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+import timeit
+
+from benchmarks.fakes import FakeKite
+from instrument_store import InstrumentTable
+from sector_universe import SectorUniverse
+
+
+def write_universe(path, symbols, sector_count):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Company Name', 'Industry', 'Symbol'])
+        for i, symbol in enumerate(symbols):
+            writer.writerow([f'{symbol} Ltd', f'Industry {i % sector_count}', symbol])
+
+
+def best_ms(operation, repeat):
+    return round(min(timeit.repeat(operation, number=1, repeat=repeat)) * 1000, 3)
+
+
+def run(symbol_counts, sector_count, repeat):
+    results = {}
+    for symbol_count in symbol_counts:
+        symbols = [f'SYM{i}' for i in range(symbol_count)]
+        listed = symbols[:int(symbol_count * 0.95)]
+        kite = FakeKite(listed, instrument_count=max(len(listed), 2000), quote_latency=0)
+        instruments = InstrumentTable.from_records(kite.instruments('NSE'))
+        market_data = {key: quote for key, quote in kite._quotes.items()}
+        path = os.path.join(tempfile.mkdtemp(prefix='bench-universe-'), 'sectors.csv')
+        write_universe(path, symbols, sector_count)
+
+        started = time.perf_counter()
+        universe = SectorUniverse({}, path, check_interval=0)
+        load_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        index = universe.validate(instruments)
+        bind_ms = (time.perf_counter() - started) * 1000
+        top = index.rank_sectors(market_data)
+
+        # Grow the file by 1% and reload: shared symbols keep their bound tokens
+        write_universe(path, symbols + [f'NEW{i}' for i in range(max(symbol_count // 100, 1))], sector_count)
+        started = time.perf_counter()
+        universe.reload_if_changed(force=True)
+        universe.validate(instruments)
+        reload_ms = (time.perf_counter() - started) * 1000
+        universe.check_interval = 3600
+
+        results[symbol_count] = {
+            'load_ms': round(load_ms, 3),
+            'first_bind_ms': round(bind_ms, 3),
+            'unlisted': universe.stats()['unlisted'],
+            'request_lookup_ms': best_ms(lambda: universe.validate(instruments).symbols_for(top), repeat),
+            'sector_aggregation_ms': best_ms(lambda: universe.index().rank_sectors(market_data), repeat),
+            'hot_reload_ms': round(reload_ms, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--symbols', type=int, nargs='+', default=[40, 2000, 8000])
+    parser.add_argument('--sectors', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.symbols, args.sectors, args.repeat), indent=2))
+
+
+if __name__ == '__main__':
+    main()
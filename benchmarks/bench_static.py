@@ -0,0 +1,81 @@
+"""Per-request cost and bytes of the manifest, SEO files and empty index page.
+
+`legacy` rebuilds each response the way the routes used to: json.dumps of
+the manifest, robots.txt/sitemap.xml read from disk, index.html rendered
+by Jinja. `precomputed` is the current route, fetched plainly, with
+`Accept-Encoding: gzip` and as a revalidation carrying the ETag from a
+previous response (answered with an empty 304). Everything goes through
+the Flask test client, so the numbers include routing and the app's
+before/after request hooks.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_static --iterations 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.fakes import import_app
+from benchmarks.timing import measure
+from token_store import FileTokenStore
+
+
+def register_legacy_routes(app):
+    @app.app.route('/legacy/manifest.json')
+    def legacy_manifest():
+        return json.dumps(app.MANIFEST), 200, {'Content-Type': 'application/json'}
+
+    @app.app.route('/legacy/<name>')
+    def legacy_public(name):
+        with open(os.path.join(app.app.root_path, 'public', name), 'r') as f:
+            return f.read(), 200, {'Content-Type': 'text/plain' if name.endswith('.txt') else 'application/xml'}
+
+    @app.app.route('/legacy/')
+    def legacy_index():
+        return app.render_template('index.html', form=app.RecommendationForm(), stocks=None, request_id=app.g.request_id)
+
+
+def run(iterations):
+    app = import_app()
+    app.kite_session.store = FileTokenStore(os.path.join(tempfile.mkdtemp(prefix='bench-token-'), 'token.json'))
+    app.kite_session.login('bench-access-token')
+    register_legacy_routes(app)
+    app.limiter.enabled = False
+    client = app.app.test_client()
+    targets = {
+        'manifest': ('/legacy/manifest.json', '/static/manifest.json'),
+        'robots': ('/legacy/robots.txt', '/robots.txt'),
+        'sitemap': ('/legacy/sitemap.xml', '/sitemap.xml'),
+        'index': ('/legacy/', '/'),
+    }
+    results = {}
+    for name, (legacy_url, url) in targets.items():
+        etag = client.get(url).headers.get('ETag')
+        cases = {
+            'legacy': (legacy_url, {}),
+            'precomputed': (url, {}),
+            'precomputed_gzip': (url, {'Accept-Encoding': 'gzip'}),
+        }
+        if etag:
+            cases['revalidated_304'] = (url, {'If-None-Match': etag})
+        results[name] = {}
+        for case, (target, headers) in cases.items():
+            response = client.get(target, headers=headers)
+            summary = measure(lambda: client.get(target, headers=headers), iterations)
+            summary['status'] = response.status_code
+            summary['bytes'] = len(response.data)
+            results[name][case] = summary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
+
+
+if __name__ == '__main__':
+    main()
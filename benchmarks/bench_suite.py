@@ -0,0 +1,184 @@
+"""Offline end-to-end benchmark suite for the recommendation hot paths.
+
+Kite is a FakeKite (instrument count, quote latency and error rate are
+configurable) and Grok is a local chat-completions stub with configurable
+latency, SSE streaming and truncation. Every scenario reports throughput
+and p50/p95/p99 latency; results are printed as JSON and optionally
+written to --output. With --baseline, scenarios whose p95 regressed by
+more than --tolerance exit non-zero, so the suite can gate a deploy.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_suite --output bench.json
+    python -m benchmarks.bench_suite --baseline bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.fakes import FakeKite, import_app, temp_instrument_store
+from benchmarks.stub_servers import GrokStubHandler, StubServer
+from benchmarks.timing import measure, summarize
+
+STUB_STOCKS = [
+    {'name': f'Stub Company {i}', 'symbol': f'STUB{i}.NS', 'reason': 'Strong order book and improving margins'}
+    for i in range(5)
+]
+FORM = {'price_range': 'None', 'time_horizon': 'medium-term', 'risk_level': 'medium'}
+
+
+def synthetic_stock_data(count):
+    return [
+        {'name': f'SYM{i} LTD', 'symbol': f'SYM{i}.NS', 'price': 100.0 + i, 'volume': 1000 * (count - i), 'change': 1.0}
+        for i in range(count)
+    ]
+
+
+def stream_once(client, url):
+    """Consume one SSE response; returns (seconds to first stock, total seconds, done payload)"""
+    started = time.perf_counter()
+    first_stock = None
+    done = None
+    response = client.get(url, buffered=False)
+    try:
+        for chunk in response.response:
+            text = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if first_stock is None and text.startswith('event: stock'):
+                first_stock = time.perf_counter() - started
+            if text.startswith('event: done'):
+                done = json.loads(text.split('data: ', 1)[1])
+    finally:
+        response.close()
+    return first_stock, time.perf_counter() - started, done
+
+
+def measure_stream(app, client, iterations):
+    url = '/recommendations/stream?' + '&'.join(f'{key}={value}' for key, value in FORM.items())
+    first, total, truncated = [], [], []
+    for _ in range(iterations + 1):
+        app.cache.clear()
+        first_stock, seconds, done = stream_once(client, url)
+        first.append(first_stock if first_stock is not None else seconds)
+        total.append(seconds)
+        truncated.append(bool(done and done.get('truncated')))
+    # The first run warms imports and connections
+    first, total, truncated = first[1:], total[1:], truncated[1:]
+    result = summarize(total, sum(total))
+    result['first_stock'] = summarize(first, sum(first))
+    result['truncated_runs'] = sum(truncated)
+    return result
+
+
+def run(args):
+    with StubServer(GrokStubHandler, latency=args.grok_latency, stocks=STUB_STOCKS,
+                    chunk_size=args.chunk_size, chunk_delay=args.chunk_delay) as grok:
+        os.environ['GROK_API_URL'] = f'{grok.url}/v1/chat/completions'
+        app = import_app()
+        from token_store import FileTokenStore
+
+        mapped = [symbol for symbols in app.service.sector_mapping.values() for symbol in symbols]
+        kite = FakeKite(mapped, instrument_count=args.instruments, quote_latency=args.kite_latency, error_rate=args.kite_error_rate)
+        app.kite_session.store = FileTokenStore(os.path.join(tempfile.mkdtemp(prefix='bench-token-'), 'token.json'))
+        app.kite_session.login('bench-access-token')
+        service = app.service = app.StockRecommendationService(
+            kite,
+            quote_fetcher=app.QuoteFetcher(kite, requests_per_second=args.kite_rps),
+            instrument_store=temp_instrument_store(kite),
+        )
+        # Same universe ranked from a daily-candle store instead of live quotes
+        momentum_service = app.StockRecommendationService(
+            kite, quote_fetcher=service.quote_fetcher, instrument_store=service.instrument_store,
+            momentum_store=app.OHLCStore(tempfile.mkdtemp(prefix='bench-ohlc-')),
+        )
+        momentum_service.sync_momentum(
+            lambda token, start, end: kite.historical_data(token, start, end, 'day'), date.today() - timedelta(days=1)
+        )
+        app.app.config['WTF_CSRF_ENABLED'] = False
+        app.limiter.enabled = False
+        client = app.app.test_client()
+        n = args.iterations
+
+        stock_data = synthetic_stock_data(args.prompt_stocks)
+        completion = json.dumps({'stocks': STUB_STOCKS})
+        truncated_completion = completion[:int(len(completion) * 0.8)]
+
+        def parse_truncated():
+            try:
+                return app.parse_api_response(truncated_completion)
+            except ValueError:
+                return None
+
+        def home():
+            response = client.post('/', json=FORM, headers={'X-Requested-With': 'XMLHttpRequest'})
+            assert response.status_code == 200, response.status_code
+
+        results = {
+            'service_stock_data': measure(lambda: service.get_stock_data('None'), n),
+            'sector_ranking_quotes': measure(service.get_top_gaining_sectors, n),
+            'sector_ranking_momentum': measure(momentum_service.get_top_gaining_sectors, n * 20),
+            'momentum_refresh': measure(momentum_service.momentum.refresh, n),
+            'build_prompt': measure(
+                lambda: app.build_prompt('any price', 'medium-term', 'medium risk level', stock_data, record=False), n * 20
+            ),
+            'parse_api_response': measure(lambda: app.parse_api_response(completion), n * 20),
+            'parse_api_response_truncated': dict(
+                measure(parse_truncated, n * 20),
+                # Whether the bracket-patching heuristics salvage the cut-off answer
+                recovered_stocks=len(parse_truncated() or []),
+            ),
+            'home_cold': measure(home, n, setup=app.cache.clear),
+            'home_cached': measure(home, n * 5),
+            'stream': measure_stream(app, client, n),
+        }
+        grok.httpd.truncate_at = len(truncated_completion)
+        results['stream_truncated'] = measure_stream(app, client, n)
+        return {
+            'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'tolerance')},
+            'scenarios': results,
+        }
+
+
+def regressions(current, baseline, tolerance):
+    """Scenarios whose p95 grew by more than `tolerance` relative to `baseline`"""
+    found = {}
+    for name, result in current['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous and previous['p95_ms'] and result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            found[name] = {'baseline_p95_ms': previous['p95_ms'], 'p95_ms': result['p95_ms']}
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--instruments', type=int, default=2500, help='size of the fake NSE instrument master')
+    parser.add_argument('--kite-latency', type=float, default=0.02, help='seconds per kite.quote call')
+    parser.add_argument('--kite-error-rate', type=float, default=0.0, help='probability a quote call fails')
+    parser.add_argument('--kite-rps', type=float, default=1000.0, help='quote request budget')
+    parser.add_argument('--grok-latency', type=float, default=0.05, help='seconds before the stub answers')
+    parser.add_argument('--chunk-size', type=int, default=16, help='characters per streamed chunk')
+    parser.add_argument('--chunk-delay', type=float, default=0.005, help='seconds between streamed chunks')
+    parser.add_argument('--prompt-stocks', type=int, default=200, help='stock rows offered to build_prompt')
+    parser.add_argument('--output', help='write the results JSON to this file')
+    parser.add_argument('--baseline', help='results JSON from a previous run to compare p95 against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95 growth over the baseline')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['regressions'] = regressions(results, json.load(f), args.tolerance)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if results.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Offline stand-ins for the upstream services used by the benchmarks"""
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+
+def import_app():
+    """Import app.py with placeholder credentials so no real keys are needed"""
+    os.environ.setdefault('KITE_API_KEY', 'bench-kite-key')
+    os.environ.setdefault('KITE_API_SECRET', 'bench-kite-secret')
+    os.environ.setdefault('GROK_API_KEY', 'bench-grok-key')
+    import app
+    return app
+
+
+def temp_instrument_store(kite):
+    """InstrumentStore backed by a fresh temp directory so runs never share snapshots"""
+    from instrument_store import InstrumentStore
+    return InstrumentStore(tempfile.mkdtemp(prefix='bench-instruments-'), kite.instruments)
+
+
+class FakeKite:
+    """Minimal KiteConnect double with a synthetic NSE instrument master.
+
+    `instrument_count` filler symbols are generated next to `symbols`, and
+    every quote call sleeps `quote_latency` seconds and fails with
+    probability `error_rate`. Daily candles are a deterministic function
+    of (token, day): a per-instrument drift plus a per-instrument beta on a
+    shared market cycle, so incremental fetches line up with earlier ones.
+    """
+
+    def __init__(self, symbols=(), instrument_count=2000, quote_latency=0.05, error_rate=0.0, seed=7):
+        self.access_token = 'bench-access-token'
+        self.quote_latency = quote_latency
+        self.error_rate = error_rate
+        self.quote_calls = 0
+        self.quoted_instruments = 0
+        self.history_calls = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        tradingsymbols = list(dict.fromkeys(symbols))
+        tradingsymbols += [f'FILLER{i}' for i in range(max(instrument_count - len(tradingsymbols), 0))]
+        self._instruments = [
+            {
+                'instrument_token': 100000 + i,
+                'exchange_token': 1000 + i,
+                'tradingsymbol': symbol,
+                'name': f'{symbol} LTD',
+                'last_price': 0.0,
+                'expiry': '',
+                'strike': 0.0,
+                'tick_size': 0.05,
+                'lot_size': 1,
+                'instrument_type': 'EQ',
+                'segment': 'NSE',
+                'exchange': 'NSE',
+            }
+            for i, symbol in enumerate(tradingsymbols)
+        ]
+        self._quotes = {}
+        for inst in self._instruments:
+            last_price = round(self._random.uniform(20, 3000), 2)
+            self._quotes[f"NSE:{inst['tradingsymbol']}"] = {
+                'instrument_token': inst['instrument_token'],
+                'name': inst['name'],
+                'last_price': last_price,
+                'price_change': round(last_price * self._random.uniform(-0.05, 0.05), 2),
+                'volume': self._random.randint(1000, 5000000),
+            }
+
+    def instruments(self, exchange=None):
+        return [dict(inst) for inst in self._instruments]
+
+    def quote(self, *instruments):
+        ins = instruments[0] if instruments and isinstance(instruments[0], list) else list(instruments)
+        with self._lock:
+            self.quote_calls += 1
+            self.quoted_instruments += len(ins)
+            failed = self._random.random() < self.error_rate
+        time.sleep(self.quote_latency)
+        if failed:
+            raise RuntimeError('Simulated Kite quote failure')
+        return {key: dict(self._quotes[key]) for key in ins if key in self._quotes}
+
+    def historical_data(self, instrument_token, from_date, to_date, interval, continuous=False, oi=False):
+        with self._lock:
+            self.history_calls += 1
+        time.sleep(self.quote_latency)
+        profile = random.Random(instrument_token)
+        base, drift, beta = profile.uniform(20, 3000), profile.uniform(-0.001, 0.002), profile.uniform(0.4, 1.8)
+        candles = []
+        day = from_date
+        while day <= to_date:
+            if day.weekday() < 5:
+                ordinal = day.toordinal()
+                market = 0.08 * math.sin(ordinal / 9) + 0.04 * math.sin(ordinal / 3.7)
+                noise = random.Random(instrument_token * 1000003 + ordinal).gauss(0, 0.004)
+                close = round(base * math.exp(drift * (ordinal % 1000) + beta * market + noise), 2)
+                candles.append({
+                    'date': day, 'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+                    'volume': profile.randint(1000, 5000000),
+                })
+            day += timedelta(days=1)
+        return candles
+
+
+class FakeTicker:
+    """Local tick source with the KiteTicker callback surface.
+
+    `emit(ticks)` delivers ticks synchronously to `on_ticks`, so a
+    MarketFeed can be driven without a WebSocket connection.
+    """
+
+    MODE_QUOTE = 'quote'
+
+    def __init__(self, api_key=None, access_token=None):
+        self.on_connect = None
+        self.on_ticks = None
+        self.on_close = None
+        self.on_error = None
+        self.subscribed = []
+        self.connected = False
+
+    def connect(self, threaded=False):
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, {})
+
+    def subscribe(self, tokens):
+        self.subscribed.extend(tokens)
+
+    def set_mode(self, mode, tokens):
+        pass
+
+    def emit(self, ticks):
+        if self.on_ticks:
+            self.on_ticks(self, ticks)
+
+    def close(self, code=None, reason=None):
+        self.connected = False
+        if self.on_close:
+            self.on_close(self, code, reason)
+
+
+def ticks_from_kite(kite, tokens):
+    """Build quote-mode ticks for `tokens` from a FakeKite's quote table"""
+    by_token = {quote['instrument_token']: quote for quote in kite._quotes.values()}
+    return [
+        {
+            'instrument_token': token,
+            'last_price': by_token[token]['last_price'],
+            'volume_traded': by_token[token]['volume'],
+            'ohlc': {'close': by_token[token]['last_price'] - by_token[token]['price_change']},
+        }
+        for token in tokens
+    ]
@@ -0,0 +1,123 @@
+"""Local HTTP stubs that mimic the upstream REST APIs"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class KiteStubHandler(_StubHandler):
+    """Serves /quote in the Kite Connect envelope after `server.latency` seconds"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/quote':
+            self._send_json(404, {'status': 'error', 'error_type': 'GeneralException', 'message': 'Not found'})
+            return
+        time.sleep(self.server.latency)
+        instruments = parse_qs(url.query).get('i', [])
+        data = {
+            key: {'instrument_token': i, 'last_price': 100.0 + i, 'price_change': 1.0, 'volume': 1000}
+            for i, key in enumerate(instruments)
+        }
+        self._send_json(200, {'status': 'success', 'data': data})
+
+
+class GrokStubHandler(_StubHandler):
+    """Chat completions stub answering with `{"stocks": server.stocks}`.
+
+    Server attributes: `latency` (seconds before the first byte),
+    `truncate_at` (cut the answer to this many characters, as a
+    max_tokens cut-off would), and for `"stream": true` requests
+    `chunk_size` characters per SSE chunk sent every `chunk_delay` seconds.
+    Setting `status` (e.g. 429 or 503) answers every request with that
+    error instead, with `retry_after` as the Retry-After header if set.
+    """
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.server.latency)
+        status = getattr(self.server, 'status', 200)
+        if status != 200:
+            self._send_error(status, getattr(self.server, 'retry_after', None))
+            return
+        content = json.dumps({'stocks': self.server.stocks})
+        truncate_at = getattr(self.server, 'truncate_at', None)
+        finish_reason = 'stop'
+        if truncate_at is not None and truncate_at < len(content):
+            content, finish_reason = content[:truncate_at], 'length'
+        usage = {
+            'prompt_tokens': len(request.get('messages', [{}])[0].get('content', '')) // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': 0,
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if request.get('stream'):
+            self._stream(content, finish_reason, usage)
+            return
+        self._send_json(200, {
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': finish_reason}],
+            'usage': usage,
+        })
+
+    def _send_error(self, status, retry_after):
+        payload = json.dumps({'error': f'Stub error {status}'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, content, finish_reason, usage):
+        chunk_size = getattr(self.server, 'chunk_size', 16)
+        chunk_delay = getattr(self.server, 'chunk_delay', 0.0)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for start in range(0, len(content), chunk_size):
+            delta = {'index': 0, 'delta': {'content': content[start:start + chunk_size]}, 'finish_reason': None}
+            self.wfile.write(f"data: {json.dumps({'choices': [delta]})}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(chunk_delay)
+        final = {'choices': [{'index': 0, 'delta': {}, 'finish_reason': finish_reason}], 'usage': usage}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode())
+        self.wfile.flush()
+
+
+class StubServer:
+    """Run a handler on an ephemeral localhost port in a daemon thread"""
+
+    def __init__(self, handler, **attributes):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        for name, value in attributes.items():
+            setattr(self.httpd, name, value)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
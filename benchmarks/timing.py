@@ -0,0 +1,44 @@
+"""Latency summaries shared by the benchmarks"""
+import statistics
+import time
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of `values`; None when empty"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def summarize(latencies, wall_seconds):
+    """Throughput and latency percentiles (in milliseconds) for one scenario"""
+    return {
+        'iterations': len(latencies),
+        'throughput_per_second': round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+    }
+
+
+def measure(operation, iterations, warmup=1, setup=None):
+    """Run `operation` `iterations` times after `warmup` untimed runs.
+
+    `setup`, if given, runs untimed before every call (e.g. to clear a cache).
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        operation()
+    latencies = []
+    wall = 0.0
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - started
+        latencies.append(elapsed)
+        wall += elapsed
+    return summarize(latencies, wall)
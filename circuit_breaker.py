@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+# Numeric state for metrics
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} is temporarily unavailable; retrying in {int(retry_in) + 1}s.")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Per-upstream circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    `before_call` fails fast with CircuitOpenError for `reset_timeout`
+    seconds. The first call after that is let through as a probe
+    (half-open): its success closes the circuit, its failure re-opens it.
+    Only outage-type failures should be recorded; client errors such as
+    a bad token say nothing about upstream health.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.counters = {'opened': 0, 'rejected': 0, 'failures': 0, 'successes': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, state=STATE_CODES[self.state], consecutive_failures=self._failures)
+
+    def before_call(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            retry_in = self._opened_at + self.reset_timeout - self._clock()
+            if self.state == OPEN and retry_in <= 0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.counters['rejected'] += 1
+        raise CircuitOpenError(self.name, max(retry_in, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.counters['successes'] += 1
+            self._failures = 0
+            if self.state != CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.counters['failures'] += 1
+            self._failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+                self.counters['opened'] += 1
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failure(s)")
+
+    def release(self):
+        """End a call that was neither a success nor an upstream failure"""
+        with self._lock:
+            self._probing = False
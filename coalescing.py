@@ -0,0 +1,261 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lock only if it still holds our token, so an expired lock
+# re-acquired by another worker is never released by us
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent computations that share a key.
+
+    Within a process the first caller for a key becomes the leader and
+    runs `compute`; callers arriving while it runs wait for and share its
+    result (or exception). With a Redis client, leaders across workers
+    also take a `singleflight:<key>` lock; a worker that finds the lock
+    held waits for it to be released and then reads the leader's result
+    through `lookup()`, computing only if no result was published.
+    """
+
+    def __init__(self, redis_client=None, lock_timeout=60, poll_interval=0.2):
+        self.redis = redis_client
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._release = redis_client.register_script(_RELEASE_SCRIPT) if redis_client is not None else None
+        self.counters = {'leaders': 0, 'coalesced': 0, 'remote_coalesced': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls))
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def do(self, key, compute, lookup=lambda: None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self.counters['leaders' if leader else 'coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._run(key, compute, lookup)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def do_many(self, keys, compute, lookup=lambda key: None):
+        """Coalesce a computation that answers several keys at once; returns {key: result}.
+
+        `compute(keys)` is called once with the keys no one else is
+        computing and must return a result for each of them. Keys already
+        in flight in this process are waited for and share that result;
+        with Redis, keys locked by another worker are resolved one by one
+        as in `do` (the leader's published result via `lookup(key)`, else
+        `compute([key])`).
+        """
+        led, waiting = [], {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                call = self._calls.get(key)
+                if call is None:
+                    self._calls[key] = _Call()
+                    led.append(key)
+                    self.counters['leaders'] += 1
+                else:
+                    waiting[key] = call
+                    self.counters['coalesced'] += 1
+        results = {}
+        tokens = {}
+        error = None
+        try:
+            remote = []
+            if self.redis is not None:
+                for key in led:
+                    token = uuid4().hex
+                    try:
+                        if self.redis.set(f'singleflight:{key}', token, nx=True, px=int(self.lock_timeout * 1000)):
+                            tokens[key] = token
+                        else:
+                            remote.append(key)
+                    except Exception as e:
+                        logger.warning(f"Redis coalescing unavailable for {key}: {str(e)}")
+            local = [key for key in led if key not in remote]
+            if local:
+                results.update(compute(local))
+            for key in remote:
+                results[key] = self._run(key, lambda key=key: compute([key])[key], lambda key=key: lookup(key))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            for key, token in tokens.items():
+                try:
+                    self._release(keys=[f'singleflight:{key}'], args=[token])
+                except Exception as e:
+                    logger.warning(f"Error releasing singleflight:{key}: {str(e)}")
+            with self._lock:
+                calls = [(key, self._calls.pop(key)) for key in led]
+            for key, call in calls:
+                if key in results:
+                    call.result = results[key]
+                else:
+                    call.error = error or RuntimeError(f"No result computed for {key}")
+                call.done.set()
+        for key, call in waiting.items():
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            results[key] = call.result
+        return results
+
+    def _run(self, key, compute, lookup):
+        if self.redis is None:
+            return compute()
+        lock_key = f'singleflight:{key}'
+        token = uuid4().hex
+        try:
+            acquired = self._acquire(lock_key, token)
+        except Exception as e:
+            logger.warning(f"Redis coalescing unavailable for {key}: {str(e)}")
+            return compute()
+        try:
+            # Another worker may have finished while we waited for the lock
+            result = lookup()
+            if result is not None:
+                self._count('remote_coalesced')
+                return result
+            if not acquired:
+                logger.warning(f"Timed out waiting for {lock_key}; computing locally")
+            return compute()
+        finally:
+            if acquired:
+                try:
+                    self._release(keys=[lock_key], args=[token])
+                except Exception as e:
+                    logger.warning(f"Error releasing {lock_key}: {str(e)}")
+
+    def _acquire(self, lock_key, token):
+        """Take the cross-worker lock, or wait for the holder to release it.
+
+        Returns False if the lock was still held after lock_timeout.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.redis.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+
+class _Broadcast:
+    """Items a running computation has emitted so far, replayed to every subscriber.
+
+    Iterating yields every item emitted before and after the call, and
+    stops once the computation has finished; `result` and `error` are set
+    by then.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self._condition = threading.Condition()
+
+    def emit(self, item):
+        with self._condition:
+            self.items.append(item)
+            self._condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self._condition:
+            self.result, self.error, self.done = result, error, True
+            self._condition.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._condition:
+                while index == len(self.items) and not self.done:
+                    self._condition.wait()
+                items = self.items[index:]
+                finished = self.done
+            index += len(items)
+            yield from items
+            if finished:
+                return
+
+
+class StreamFanOut:
+    """Share one incremental computation per key among concurrent subscribers.
+
+    `subscribe(key, produce)` starts `produce(emit)` on a background thread
+    unless one is already running for `key`, and returns its broadcast:
+    each subscriber sees every item emitted so far and then follows new
+    ones. Running in the background lets the computation (and any cache
+    fill it does) complete even when the client that started it leaves.
+    """
+
+    def __init__(self, max_workers=16):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stream')
+        self._running = {}
+        self._lock = threading.Lock()
+        self.counters = {'leaders': 0, 'coalesced': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._running))
+
+    def subscribe(self, key, produce):
+        with self._lock:
+            broadcast = self._running.get(key)
+            if broadcast is not None:
+                self.counters['coalesced'] += 1
+                return broadcast
+            broadcast = self._running[key] = _Broadcast()
+            self.counters['leaders'] += 1
+        self._executor.submit(self._run, key, broadcast, produce)
+        return broadcast
+
+    def _run(self, key, broadcast, produce):
+        result, error = None, None
+        try:
+            result = produce(broadcast.emit)
+        except Exception as e:
+            logger.error(f"Streaming computation for {key} failed: {str(e)}")
+            error = e
+        finally:
+            broadcast.finish(result, error)
+            with self._lock:
+                del self._running[key]
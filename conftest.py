@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def app_module():
+    """app.py imported with placeholder credentials"""
+    os.environ.setdefault('KITE_API_KEY', 'test-kite-key')
+    os.environ.setdefault('KITE_API_SECRET', 'test-kite-secret')
+    os.environ.setdefault('GROK_API_KEY', 'test-grok-key')
+    import app
+    return app
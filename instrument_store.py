@@ -0,0 +1,172 @@
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from market_hours import trading_date
+
+logger = logging.getLogger(__name__)
+
+INT_COLUMNS = ('instrument_token', 'exchange_token', 'lot_size')
+FLOAT_COLUMNS = ('last_price', 'strike', 'tick_size')
+TEXT_COLUMNS = ('tradingsymbol', 'name', 'expiry', 'instrument_type', 'segment', 'exchange')
+# Seconds to wait before retrying a failed instrument download
+RETRY_AFTER = 60
+
+
+class InstrumentTable:
+    """Read-only columnar view of an instrument dump.
+
+    Columns are NumPy arrays (memory-mapped when loaded from a snapshot,
+    so every worker on the host shares the same pages). Text columns are
+    stored as UTF-8 fixed-width bytes.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, instruments):
+        columns = {}
+        for name in INT_COLUMNS:
+            columns[name] = np.array([inst.get(name) or 0 for inst in instruments], dtype=np.int64)
+        for name in FLOAT_COLUMNS:
+            columns[name] = np.array([inst.get(name) or 0.0 for inst in instruments], dtype=np.float64)
+        for name in TEXT_COLUMNS:
+            values = [str(inst.get(name) or '').encode('utf-8') for inst in instruments]
+            columns[name] = np.array(values, dtype=f'S{max(map(len, values), default=1) or 1}')
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns['instrument_token'])
+
+    def text(self, name):
+        return np.char.decode(self.columns[name], 'utf-8')
+
+    def segment_mask(self, segment='NSE'):
+        return self.columns['segment'] == segment.encode()
+
+    def segment_size(self, segment='NSE'):
+        return int(np.count_nonzero(self.segment_mask(segment)))
+
+    def lookup(self, symbols, segment='NSE'):
+        """Map each of `symbols` listed in `segment` to its instrument_token.
+
+        Matching runs on the encoded column, so only the matched rows are
+        ever decoded into Python objects.
+        """
+        column = self.columns['tradingsymbol']
+        # A symbol wider than the column cannot be listed; casting it would truncate it into a false match
+        encoded = [symbol.encode('utf-8') for symbol in symbols]
+        encoded = np.array([value for value in encoded if len(value) <= column.dtype.itemsize], dtype=column.dtype)
+        rows = np.flatnonzero(self.segment_mask(segment) & np.isin(column, encoded))
+        return dict(zip(
+            np.char.decode(column[rows], 'utf-8').tolist(),
+            self.columns['instrument_token'][rows].tolist(),
+        ))
+
+    def save(self, directory):
+        for name, values in self.columns.items():
+            np.save(os.path.join(directory, f'{name}.npy'), values)
+
+    @classmethod
+    def load(cls, directory):
+        return cls({
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+            for name in INT_COLUMNS + FLOAT_COLUMNS + TEXT_COLUMNS
+        })
+
+
+class InstrumentStore:
+    """Daily on-disk snapshot of an exchange's instrument master.
+
+    Snapshots live in `<root>/<exchange>-<YYYY-MM-DD>/` with one .npy file
+    per column. The first process to miss today's snapshot downloads it
+    under a file lock and publishes it with an atomic rename; every other
+    worker just memory-maps the files. Older snapshots are pruned.
+    """
+
+    def __init__(self, root, fetch, exchange='NSE', keep=2):
+        self.root = root
+        self.fetch = fetch
+        self.exchange = exchange
+        self.keep = keep
+        self._table = None
+        self._date = None
+        self._failed_at = 0
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'snapshot_loads': 0, 'downloads': 0, 'download_failures': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _snapshot_dir(self, date):
+        return os.path.join(self.root, f'{self.exchange}-{date.isoformat()}')
+
+    def get(self):
+        date = trading_date()
+        with self._lock:
+            if self._table is not None and self._date == date:
+                self.counters['memory_hits'] += 1
+                return self._table
+            table = self._load_or_download(date)
+            if table is not None:
+                self._table, self._date = table, date
+            elif self._table is None:
+                # Serve the most recent snapshot until today's download succeeds
+                self._table = self._load_latest()
+            return self._table if self._table is not None else InstrumentTable.from_records([])
+
+    def _load_or_download(self, date):
+        directory = self._snapshot_dir(date)
+        if os.path.isdir(directory):
+            self.counters['snapshot_loads'] += 1
+            return InstrumentTable.load(directory)
+        if time.monotonic() - self._failed_at < RETRY_AFTER:
+            return None
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, f'.{self.exchange}.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Another worker may have published the snapshot while we waited
+            if os.path.isdir(directory):
+                self.counters['snapshot_loads'] += 1
+                return InstrumentTable.load(directory)
+            try:
+                instruments = self.fetch(self.exchange)
+                if not instruments:
+                    raise ValueError("empty instrument dump")
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                self.counters['download_failures'] += 1
+                logger.error(f"Error fetching {self.exchange} instruments: {str(e)}")
+                return None
+            staging = tempfile.mkdtemp(dir=self.root, prefix='.staging-')
+            InstrumentTable.from_records(instruments).save(staging)
+            os.replace(staging, directory)
+            self.counters['downloads'] += 1
+            logger.info(f"Saved {len(instruments)} {self.exchange} instruments to {directory}")
+            self._prune()
+        return InstrumentTable.load(directory)
+
+    def _snapshots(self):
+        if not os.path.isdir(self.root):
+            return []
+        prefix = f'{self.exchange}-'
+        return sorted(name for name in os.listdir(self.root) if name.startswith(prefix))
+
+    def _load_latest(self):
+        snapshots = self._snapshots()
+        if not snapshots:
+            return None
+        logger.warning(f"Using stale instrument snapshot {snapshots[-1]}")
+        return InstrumentTable.load(os.path.join(self.root, snapshots[-1]))
+
+    def _prune(self):
+        for name in self._snapshots()[:-self.keep]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
@@ -0,0 +1,66 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """Run slow work off the request thread and let clients poll for the result.
+
+    `submit` hands `compute` to a bounded pool and returns a job id at once,
+    so the request that started it never waits on upstream I/O. A job still
+    pending in this process for the same key is reused. Job state is kept
+    in `cache` under `job:<id>` for `ttl` seconds, so any worker sharing the
+    cache can answer a poll.
+    """
+
+    def __init__(self, cache, max_workers=16, ttl=600):
+        self.cache = cache
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.counters = {'submitted': 0, 'reused': 0, 'completed': 0, 'failed': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending))
+
+    def _store(self, job_id, state):
+        self.cache.set(f'job:{job_id}', state, timeout=self.ttl)
+
+    def get(self, job_id):
+        """Return {'status': ..., 'result' | 'error': ...}, or None for unknown or expired jobs"""
+        return self.cache.get(f'job:{job_id}')
+
+    def submit(self, key, compute):
+        with self._lock:
+            job_id = self._pending.get(key)
+            if job_id is not None:
+                self.counters['reused'] += 1
+                return job_id
+            job_id = self._pending[key] = uuid4().hex
+            self.counters['submitted'] += 1
+        self._store(job_id, {'status': PENDING})
+        self._executor.submit(self._run, key, job_id, compute)
+        return job_id
+
+    def _run(self, key, job_id, compute):
+        try:
+            state = {'status': DONE, 'result': compute()}
+        except Exception as e:
+            logger.error(f"Job {job_id} for {key} failed: {str(e)}")
+            state = {'status': FAILED, 'error': str(e)}
+        try:
+            self._store(job_id, state)
+        except Exception as e:
+            logger.error(f"Error storing job {job_id}: {str(e)}")
+        with self._lock:
+            del self._pending[key]
+            self.counters['completed' if state['status'] == DONE else 'failed'] += 1
@@ -0,0 +1,166 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def truncate(text, max_chars):
+    if max_chars and len(text) > max_chars:
+        return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+    return text
+
+
+class PayloadFilter(logging.Filter):
+    """Tag records with the request id and shrink what they carry.
+
+    Runs on the calling thread before the record is queued. Messages are
+    cut to `max_chars`. A record's `payload` (passed with
+    `extra={'payload': ...}`) is serialised only for a `sample_rate`
+    fraction of INFO and DEBUG records, and always for warnings and
+    errors; unsampled payloads are never rendered at all.
+    """
+
+    def __init__(self, max_chars=2000, sample_rate=1.0, request_id=None):
+        super().__init__()
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        self.request_id = request_id
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self.counters = {'payloads_logged': 0, 'payloads_sampled_out': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def filter(self, record):
+        record.request_id = self.request_id() if self.request_id else None
+        record.msg = truncate(record.getMessage(), self.max_chars)
+        record.args = None
+        payload = getattr(record, 'payload', None)
+        record.payload_text = None
+        if payload is not None:
+            sampled = record.levelno >= logging.WARNING or self._random.random() < self.sample_rate
+            if sampled:
+                text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+                record.payload_text = truncate(text, self.max_chars)
+            with self._lock:
+                self.counters['payloads_logged' if sampled else 'payloads_sampled_out'] += 1
+            record.payload = None
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """The classic line format with the request id and any sampled payload appended"""
+
+    def format(self, record):
+        line = super().format(record)
+        if getattr(record, 'request_id', None):
+            line = f"{line} [request_id={record.request_id}]"
+        if getattr(record, 'payload_text', None):
+            line = f"{line} | payload: {record.payload_text}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        if getattr(record, 'payload_text', None):
+            entry['payload'] = record.payload_text
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Keep the traceback out of the message so formatters can place it themselves
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class LogPipeline:
+    """Root logging set up as filter -> bounded queue -> background writer thread"""
+
+    def __init__(self, payload_filter, handler, listener=None):
+        self.payload_filter = payload_filter
+        self.handler = handler
+        self.listener = listener
+
+    def stats(self):
+        stats = self.payload_filter.stats()
+        if isinstance(self.handler, DroppingQueueHandler):
+            stats['dropped'] = self.handler.dropped
+            stats['queued'] = self.handler.queue.qsize()
+        return stats
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+
+def configure_logging(level=logging.INFO, fmt='text', asynchronous=True, queue_size=10000,
+                      max_chars=2000, sample_rate=1.0, request_id=None, stream=None, logger=None):
+    """Install the pipeline on `logger` (the root logger by default); returns the LogPipeline.
+
+    `fmt` is 'text' or 'json'. With `asynchronous`, callers only pay for
+    filtering and a queue put; a QueueListener thread formats and writes.
+    `request_id` is a callable returning the current request's id or None.
+    """
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter(TEXT_FORMAT))
+    payload_filter = PayloadFilter(max_chars=max_chars, sample_rate=sample_rate, request_id=request_id)
+    listener = None
+    if asynchronous:
+        handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        listener.start()
+    else:
+        handler = output
+    handler.addFilter(payload_filter)
+    logger = logger or logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    pipeline = LogPipeline(payload_filter, handler, listener)
+    # Flush whatever is still queued when the process exits
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+
+from kiteconnect import KiteTicker
+
+from quotes import QUOTE_BATCH_SIZE, QuoteFetchResult
+
+logger = logging.getLogger(__name__)
+
+# Ticks older than this are treated as stale and the REST quote is used instead
+LIVE_QUOTE_MAX_AGE = 30
+
+
+class LiveQuoteTable:
+    """Last price/change per instrument, kept current from ticker callbacks.
+
+    Entries are stored in the shape kite.quote returns (`last_price`,
+    `price_change`, `volume`) under `EXCHANGE:SYMBOL` keys so callers can use
+    them interchangeably with REST quotes.
+    """
+
+    def __init__(self, max_age=LIVE_QUOTE_MAX_AGE, clock=time.monotonic):
+        self.max_age = max_age
+        self._clock = clock
+        self._keys_by_token = {}
+        self._quotes = {}
+        self._lock = threading.Lock()
+
+    def register(self, keys_by_token):
+        with self._lock:
+            self._keys_by_token = dict(keys_by_token)
+
+    @property
+    def tokens(self):
+        return list(self._keys_by_token)
+
+    def update(self, ticks):
+        now = self._clock()
+        with self._lock:
+            for tick in ticks:
+                key = self._keys_by_token.get(tick.get('instrument_token'))
+                if key is None or 'last_price' not in tick:
+                    continue
+                last_price = tick['last_price']
+                close = tick.get('ohlc', {}).get('close') or 0
+                previous = self._quotes.get(key, {})
+                self._quotes[key] = {
+                    'instrument_token': tick['instrument_token'],
+                    'last_price': last_price,
+                    'price_change': last_price - close if close else previous.get('price_change', 0),
+                    'volume': tick.get('volume_traded', previous.get('volume', 0)),
+                    'updated_at': now,
+                }
+
+    def get_fresh(self, keys):
+        """Return the quotes for `keys` that were ticked within max_age seconds"""
+        cutoff = self._clock() - self.max_age
+        with self._lock:
+            return {
+                key: dict(self._quotes[key])
+                for key in keys
+                if key in self._quotes and self._quotes[key]['updated_at'] >= cutoff
+            }
+
+
+class LiveQuoteFetcher:
+    """QuoteFetcher front that serves fresh ticker quotes before going to REST"""
+
+    def __init__(self, table, fallback):
+        self.table = table
+        self.fallback = fallback
+        self.live_hits = 0
+        self.rest_fallbacks = 0
+
+    def stats(self):
+        return {'live_hits': self.live_hits, 'rest_fallbacks': self.rest_fallbacks}
+
+    def fetch(self, batches):
+        keys = [key for batch in batches for key in batch]
+        live = self.table.get_fresh(keys)
+        missing = [key for key in keys if key not in live]
+        self.live_hits += len(live)
+        if missing:
+            self.rest_fallbacks += 1
+            result = self.fallback.fetch([missing[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(missing), QUOTE_BATCH_SIZE)])
+        else:
+            result = QuoteFetchResult()
+        result.data.update(live)
+        return result
+
+
+class MarketFeed:
+    """Background KiteTicker subscription that feeds a LiveQuoteTable.
+
+    `ticker_factory(api_key, access_token)` builds the ticker; it defaults
+    to KiteTicker and can be replaced by any object exposing the same
+    callbacks, `subscribe`, `set_mode`, `connect` and `close`.
+    """
+
+    def __init__(self, api_key, table, ticker_factory=KiteTicker):
+        self.api_key = api_key
+        self.table = table
+        self.ticker_factory = ticker_factory
+        self.ticker = None
+        self._access_token = None
+        self._lock = threading.Lock()
+
+    def start(self, access_token, keys_by_token):
+        with self._lock:
+            self._start(access_token, keys_by_token)
+
+    def resubscribe(self, keys_by_token):
+        """Restart the feed on a new instrument set; returns False if it was never started or the set is unchanged"""
+        with self._lock:
+            if self._access_token is None or set(keys_by_token) == set(self.table.tokens):
+                return False
+            logger.info(f"Instrument set changed; re-subscribing the market feed to {len(keys_by_token)} instruments")
+            self._start(self._access_token, keys_by_token)
+            return True
+
+    def _start(self, access_token, keys_by_token):
+        self._close()
+        self._access_token = access_token
+        self.table.register(keys_by_token)
+        tokens = self.table.tokens
+        if not tokens:
+            logger.warning("Market feed not started: no instrument tokens to subscribe")
+            return
+        ticker = self.ticker_factory(self.api_key, access_token)
+
+        def on_connect(ws, response):
+            ws.subscribe(tokens)
+            ws.set_mode(ws.MODE_QUOTE, tokens)
+            logger.info(f"Market feed subscribed to {len(tokens)} instruments")
+
+        def on_ticks(ws, ticks):
+            self.table.update(ticks)
+
+        def on_close(ws, code, reason):
+            logger.warning(f"Market feed closed ({code}): {reason}")
+
+        def on_error(ws, code, reason):
+            logger.error(f"Market feed error ({code}): {reason}")
+
+        ticker.on_connect = on_connect
+        ticker.on_ticks = on_ticks
+        ticker.on_close = on_close
+        ticker.on_error = on_error
+        ticker.connect(threaded=True)
+        self.ticker = ticker
+
+    def stop(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self.ticker is not None:
+            try:
+                self.ticker.close()
+            except Exception as e:
+                logger.warning(f"Error closing market feed: {str(e)}")
+            self.ticker = None
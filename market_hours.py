@@ -0,0 +1,55 @@
+from datetime import datetime, time, timedelta, timezone
+
+# NSE trades on Indian Standard Time, which has no daylight saving
+IST = timezone(timedelta(hours=5, minutes=30), 'IST')
+# Regular NSE equity session; exchange holidays are not modelled
+MARKET_OPEN = time(9, 15)
+MARKET_CLOSE = time(15, 30)
+# Kite Connect access tokens are invalidated daily at this IST time
+KITE_TOKEN_EXPIRY = time(6, 0)
+
+
+def now_ist():
+    return datetime.now(IST)
+
+
+def trading_date(moment=None):
+    """Calendar date in IST that instrument dumps and snapshots are keyed by"""
+    return (moment or now_ist()).astimezone(IST).date()
+
+
+def trading_days_between(start, end):
+    """Weekdays after `start` up to and including `end` (exchange holidays are not modelled)"""
+    days = 0
+    day = start + timedelta(days=1)
+    while day <= end:
+        days += day.weekday() < 5
+        day += timedelta(days=1)
+    return days
+
+
+def is_market_open(moment=None):
+    moment = (moment or now_ist()).astimezone(IST)
+    return moment.weekday() < 5 and MARKET_OPEN <= moment.time() < MARKET_CLOSE
+
+
+def seconds_until_open(moment=None):
+    """Seconds until the next session opens; 0 while the market is open"""
+    moment = (moment or now_ist()).astimezone(IST)
+    if is_market_open(moment):
+        return 0
+    opening = moment.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute, second=0, microsecond=0)
+    if moment.time() >= MARKET_OPEN:
+        opening += timedelta(days=1)
+    while opening.weekday() >= 5:
+        opening += timedelta(days=1)
+    return (opening - moment).total_seconds()
+
+
+def next_token_expiry(moment=None):
+    """When a Kite access token issued at `moment` stops working"""
+    moment = (moment or now_ist()).astimezone(IST)
+    expiry = moment.replace(hour=KITE_TOKEN_EXPIRY.hour, minute=KITE_TOKEN_EXPIRY.minute, second=0, microsecond=0)
+    if moment >= expiry:
+        expiry += timedelta(days=1)
+    return expiry
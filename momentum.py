@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+from datetime import date
+
+import numpy as np
+
+from market_hours import trading_date, trading_days_between
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+# Beta bands behind the form's risk levels, matching the thresholds the prompt states
+RISK_BETA_BANDS = {'low': (-np.inf, 0.8), 'medium': (0.8, 1.2), 'high': (1.2, np.inf)}
+
+
+def within_risk(beta, risk_level):
+    low, high = RISK_BETA_BANDS.get(risk_level, (-np.inf, np.inf))
+    return low <= beta < high
+
+
+class MomentumEngine:
+    """Multi-window momentum, volatility and beta over an OHLCStore.
+
+    `refresh` loads a date-aligned close matrix for the SectorIndex
+    positions and computes every metric for every instrument in a handful
+    of array operations; the results (and the sector ranking on
+    `rank_window` returns) are kept until the next refresh, so request
+    paths only index into precomputed arrays. Beta is measured against an
+    equal-weighted average of the indexed universe. The engine stops being
+    `ready` once its latest candle is more than `max_age_days` trading
+    days old (e.g. the daily sync keeps failing), so callers fall back to
+    live quotes.
+    """
+
+    def __init__(self, store, sector_index, windows=(5, 20, 60), rank_window=20, risk_window=60,
+                 max_age_days=3, today=trading_date):
+        self.store = store
+        self.sector_index = sector_index
+        self.windows = tuple(sorted(set(windows) | {rank_window}))
+        self.rank_window = rank_window
+        self.risk_window = risk_window
+        self.max_age_days = max_age_days
+        self._today = today
+        self._stale_logged = False
+        self.metrics = {}
+        self.ranking = []
+        self.as_of = None
+        self._tokens = None
+        self._lock = threading.Lock()
+        self.counters = {'refreshes': 0, 'candles_appended': 0, 'sync_failures': 0}
+        self.refresh_seconds = 0.0
+
+    @property
+    def ready(self):
+        if not self.ranking or self.as_of is None:
+            return False
+        age = trading_days_between(self.as_of, self._today())
+        if age > self.max_age_days:
+            if not self._stale_logged:
+                self._stale_logged = True
+                logger.warning(f"Momentum data is {age} trading day(s) old (as of {self.as_of}); ranking sectors from live quotes")
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            beta = self.metrics.get('beta')
+            return dict(
+                self.counters,
+                instruments=int(np.count_nonzero(~np.isnan(beta))) if beta is not None else 0,
+                age_days=trading_days_between(self.as_of, self._today()) if self.as_of else -1,
+                refresh_seconds=round(self.refresh_seconds, 4),
+            )
+
+    def follow(self, sector_index):
+        """Refresh when `sector_index` or its bound tokens changed since the last refresh"""
+        if sector_index is not self.sector_index or self._tokens is None or not np.array_equal(sector_index.tokens, self._tokens):
+            self.refresh(sector_index)
+
+    def sync(self, fetch, until, sector_index=None):
+        """Append missing daily candles up to `until` for the bound tokens, then refresh"""
+        sector_index = sector_index or self.sector_index
+        tokens = [int(token) for token in sector_index.tokens if token >= 0]
+        if not tokens:
+            logger.warning("Momentum sync skipped: instrument tokens are not bound yet")
+            return
+        appended, failed = self.store.sync(tokens, fetch, until)
+        with self._lock:
+            self.counters['candles_appended'] += appended
+            self.counters['sync_failures'] += len(failed)
+        logger.info(f"Momentum sync appended {appended} candle(s) for {len(tokens)} instruments ({len(failed)} failed)")
+        self.refresh(sector_index)
+
+    def refresh(self, sector_index=None):
+        """Recompute every metric, switching to `sector_index` if given (e.g. after a universe reload)"""
+        started = time.perf_counter()
+        sector_index = sector_index or self.sector_index
+        tokens = sector_index.tokens.copy()
+        days, closes = self.store.closes(tokens, max(self.windows + (self.risk_window,)) + 1)
+        metrics = self.compute(closes, self.windows, self.risk_window)
+        ranking = sector_index.rank_by(metrics[f'return_{self.rank_window}'], top=len(sector_index.sectors))
+        with self._lock:
+            self.sector_index = sector_index
+            self._tokens = tokens
+            self.metrics = metrics
+            self.ranking = ranking
+            self.as_of = date.fromordinal(int(days[-1])) if len(days) else None
+            self._stale_logged = False
+            self.counters['refreshes'] += 1
+            self.refresh_seconds = time.perf_counter() - started
+
+    @staticmethod
+    def compute(closes, windows, risk_window):
+        """Per-row percent returns per window, annualised volatility and beta.
+
+        `closes` is (instruments, days) with NaN gaps; a metric is NaN when
+        its inputs are missing or too short.
+        """
+        n_days = closes.shape[1]
+        metrics = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for window in windows:
+                if n_days > window:
+                    metrics[f'return_{window}'] = (closes[:, -1] / closes[:, -1 - window] - 1) * 100
+                else:
+                    metrics[f'return_{window}'] = np.full(closes.shape[0], np.nan)
+
+            daily = (closes[:, 1:] / closes[:, :-1] - 1)[:, -risk_window:]
+            traded = (~np.isnan(daily)).sum(axis=0)
+            market = np.where(traded > 0, np.nansum(daily, axis=0) / traded, np.nan)
+            valid = ~np.isnan(daily) & ~np.isnan(market)
+            counts = valid.sum(axis=1)
+
+            returns = np.where(valid, daily, 0.0)
+            proxy = np.where(valid, market[None, :], 0.0)
+            mean_returns = returns.sum(axis=1) / counts
+            mean_proxy = proxy.sum(axis=1) / counts
+            centred_returns = np.where(valid, returns - mean_returns[:, None], 0.0)
+            centred_proxy = np.where(valid, proxy - mean_proxy[:, None], 0.0)
+            dof = np.where(counts > 1, counts - 1, np.nan)
+            variance = (centred_returns ** 2).sum(axis=1) / dof
+            covariance = (centred_returns * centred_proxy).sum(axis=1) / dof
+            proxy_variance = (centred_proxy ** 2).sum(axis=1) / dof
+
+            metrics['volatility'] = np.sqrt(variance * TRADING_DAYS) * 100
+            metrics['beta'] = np.where(proxy_variance > 0, covariance / proxy_variance, np.nan)
+        return metrics
+
+    def rank_sectors(self, top=2):
+        with self._lock:
+            return self.ranking[:top]
+
+    def beta_of(self, symbol):
+        """Precomputed beta for `symbol`; None when it is not indexed or lacks history"""
+        with self._lock:
+            position = self.sector_index.position.get(symbol)
+            beta = self.metrics.get('beta')
+            if position is None or beta is None or np.isnan(beta[position]):
+                return None
+            return float(beta[position])
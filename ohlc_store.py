@@ -0,0 +1,109 @@
+import fcntl
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One fixed-size record per daily candle; `day` is the proleptic Gregorian ordinal
+CANDLE_DTYPE = np.dtype([
+    ('day', '<i4'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<i8'),
+])
+_EMPTY = np.zeros(0, dtype=CANDLE_DTYPE)
+
+
+def _day(value):
+    return (value.date() if hasattr(value, 'date') else value).toordinal()
+
+
+class OHLCStore:
+    """Append-only daily candles, one memory-mapped file per instrument token.
+
+    Each `<root>/<token>.ohlc` file is a packed array of CANDLE_DTYPE
+    records in date order. `sync` only asks for days after the last stored
+    candle, under a file lock, so the workers on a host download each
+    candle once; readers memory-map the files and never copy them.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _path(self, token):
+        return os.path.join(self.root, f'{int(token)}.ohlc')
+
+    def candles(self, token):
+        """All stored candles for `token` as a read-only memory-mapped record array"""
+        path = self._path(token)
+        try:
+            if os.path.getsize(path) < CANDLE_DTYPE.itemsize:
+                return _EMPTY
+        except FileNotFoundError:
+            return _EMPTY
+        return np.memmap(path, dtype=CANDLE_DTYPE, mode='r')
+
+    def last_day(self, token):
+        candles = self.candles(token)
+        return date.fromordinal(int(candles['day'][-1])) if len(candles) else None
+
+    def append(self, token, candles):
+        """Append kite.historical_data day candles newer than the last stored one; returns the count"""
+        last = self.last_day(token)
+        records = np.array(
+            [
+                (_day(c['date']), c['open'], c['high'], c['low'], c['close'], c.get('volume', 0))
+                for c in candles
+                if last is None or _day(c['date']) > last.toordinal()
+            ],
+            dtype=CANDLE_DTYPE,
+        )
+        if len(records):
+            records.sort(order='day')
+            with open(self._path(token), 'ab') as f:
+                f.write(records.tobytes())
+        return len(records)
+
+    def sync(self, tokens, fetch, until, lookback_days=400):
+        """Bring every token up to `until` (inclusive) with `fetch(token, from_date, to_date)`.
+
+        Returns (candles appended, tokens that failed). A failing token is
+        logged and skipped so one bad instrument does not stall the rest.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        appended, failed = 0, []
+        with self._lock, open(os.path.join(self.root, '.sync.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            for token in tokens:
+                last = self.last_day(token)
+                start = last + timedelta(days=1) if last else until - timedelta(days=lookback_days)
+                if start > until:
+                    continue
+                try:
+                    appended += self.append(token, fetch(token, start, until))
+                except Exception as e:
+                    failed.append(token)
+                    logger.warning(f"Error fetching daily candles for {token}: {str(e)}")
+        return appended, failed
+
+    def closes(self, tokens, days):
+        """Date-aligned close matrix for the last `days` trading days across `tokens`.
+
+        Returns (day ordinals, closes) where closes has one row per token and
+        NaN where an instrument has no candle for a day (unknown tokens,
+        suspensions, listings inside the window).
+        """
+        series = [self.candles(token)[-days:] if token >= 0 else _EMPTY for token in tokens]
+        days_axis = np.unique(np.concatenate([s['day'] for s in series]))[-days:] if series else np.zeros(0, dtype='<i4')
+        closes = np.full((len(series), len(days_axis)), np.nan)
+        for row, candles in enumerate(series):
+            candles = candles[np.isin(candles['day'], days_axis)]
+            closes[row, np.searchsorted(days_axis, candles['day'])] = candles['close']
+        return days_axis, closes
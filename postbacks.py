@@ -0,0 +1,201 @@
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+DUPLICATE = 'duplicate'
+FULL = 'full'
+
+
+def postback_checksum(order_id, order_timestamp, api_secret):
+    """Kite's postback checksum: SHA-256 of order_id + order_timestamp + api_secret"""
+    return hashlib.sha256(f'{order_id}{order_timestamp}{api_secret}'.encode('utf-8')).hexdigest()
+
+
+def verify_postback(payload, api_secret):
+    if not api_secret or not isinstance(payload, dict):
+        return False
+    if not all(isinstance(payload.get(field), str) for field in ('order_id', 'order_timestamp', 'checksum')):
+        return False
+    expected = postback_checksum(payload['order_id'], payload['order_timestamp'], api_secret)
+    return hmac.compare_digest(expected, payload['checksum'])
+
+
+def idempotency_key(payload):
+    """One key per order state; a redelivered update maps to the key it was first seen under"""
+    return f"{payload['order_id']}:{payload.get('status')}:{payload.get('filled_quantity')}"
+
+
+class MemoryEventQueue:
+    """Bounded in-process queue used when Redis is not configured"""
+
+    def __init__(self, maxsize=10000):
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            return False
+
+    def get_batch(self, max_items, timeout):
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+
+class RedisEventQueue:
+    """Bounded Redis list shared by every worker and instance"""
+
+    # Length check and push in one step so concurrent producers cannot overshoot maxsize
+    _PUSH = """
+    if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+    return 1
+    """
+
+    def __init__(self, redis, key='profitpoke:postbacks', maxsize=10000):
+        self.redis = redis
+        self.key = key
+        self.maxsize = maxsize
+        self._push = redis.register_script(self._PUSH)
+
+    def __len__(self):
+        return self.redis.llen(self.key)
+
+    def put(self, event):
+        return bool(self._push(keys=[self.key], args=[json.dumps(event), self.maxsize]))
+
+    def get_batch(self, max_items, timeout):
+        item = self.redis.blpop([self.key], timeout=timeout)
+        if item is None:
+            return []
+        batch = [item[1]]
+        if max_items > 1:
+            batch.extend(self.redis.lpop(self.key, max_items - 1) or [])
+        return [json.loads(raw) for raw in batch]
+
+
+class PostbackIngestor:
+    """Accept webhook events fast and process them in batches on background threads.
+
+    `submit` only checks the idempotency key and enqueues; it returns
+    DUPLICATE for an event already accepted within the dedup window (via
+    `cache.add`, so every worker sharing the cache agrees) and FULL when
+    the queue is at capacity, so the endpoint can push back. Consumer
+    threads drain up to `batch_size` events at a time into
+    `process_batch(events)`. When a batch fails its events are retried one
+    by one; those that still fail are dropped with their idempotency keys
+    released, so a redelivery of the same update is processed.
+    """
+
+    def __init__(self, event_queue, process_batch, cache, batch_size=100, consumers=1,
+                 dedup_ttl=86400, poll_timeout=1):
+        self.queue = event_queue
+        self.process_batch = process_batch
+        self.cache = cache
+        self.batch_size = batch_size
+        self.consumers = consumers
+        self.dedup_ttl = dedup_ttl
+        self.poll_timeout = poll_timeout
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.counters = {'queued': 0, 'duplicates': 0, 'rejected_full': 0, 'processed': 0, 'batches': 0, 'batch_failures': 0, 'failed': 0}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        try:
+            stats['depth'] = len(self.queue)
+        except Exception:
+            stats['depth'] = -1
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    @staticmethod
+    def _dedup_key(event):
+        return f'postback:{idempotency_key(event)}'
+
+    def submit(self, event):
+        key = self._dedup_key(event)
+        if not self.cache.add(key, 1, timeout=self.dedup_ttl):
+            self._count('duplicates')
+            return DUPLICATE
+        # Not accepted (queue full or unreachable): let the redelivery through the dedup check
+        try:
+            accepted = self.queue.put(event)
+        except Exception:
+            self.cache.delete(key)
+            raise
+        if not accepted:
+            self.cache.delete(key)
+            self._count('rejected_full')
+            return FULL
+        self._count('queued')
+        return QUEUED
+
+    def start(self):
+        if self._threads:
+            return
+        for number in range(self.consumers):
+            thread = threading.Thread(target=self._consume, name=f'postback-consumer-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def _consume(self):
+        while not self._stop.is_set():
+            try:
+                batch = self.queue.get_batch(self.batch_size, self.poll_timeout)
+            except Exception as e:
+                logger.error(f"Error reading postback queue: {str(e)}")
+                self._stop.wait(self.poll_timeout)
+                continue
+            if not batch:
+                continue
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                self._count('batch_failures')
+                logger.error(f"Error processing {len(batch)} postback(s), retrying one by one: {str(e)}")
+                self._process_individually(batch)
+                continue
+            self._count('processed', len(batch))
+            self._count('batches')
+
+    def _process_individually(self, batch):
+        for event in batch:
+            try:
+                self.process_batch([event])
+                self._count('processed')
+            except Exception as e:
+                self._count('failed')
+                logger.error(f"Dropping postback for order {event.get('order_id')}: {str(e)}", extra={'payload': event})
+                try:
+                    self.cache.delete(self._dedup_key(event))
+                except Exception as cache_err:
+                    logger.error(f"Could not release postback idempotency key: {str(cache_err)}")
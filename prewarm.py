@@ -0,0 +1,157 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from coalescing import _RELEASE_SCRIPT
+from market_hours import IST, now_ist
+
+logger = logging.getLogger(__name__)
+
+# Extends the lock only if it still holds our token
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def parse_times(value):
+    """Parse a comma-separated list of HH:MM IST wall-clock times"""
+    return sorted(
+        datetime.strptime(part.strip(), '%H:%M').time()
+        for part in value.split(',')
+        if part.strip()
+    )
+
+
+class DailyScheduler:
+    """Run `job` on a daemon thread at fixed IST times every day"""
+
+    def __init__(self, times, job, name='scheduler'):
+        self.times = times
+        self.job = job
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_run(self, moment=None):
+        moment = (moment or now_ist()).astimezone(IST)
+        for day in range(2):
+            date = (moment + timedelta(days=day)).date()
+            for at in self.times:
+                candidate = datetime.combine(date, at, tzinfo=IST)
+                if candidate > moment:
+                    return candidate
+        return None
+
+    def start(self):
+        if not self.times or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"{self.name} scheduled at {', '.join(at.strftime('%H:%M') for at in self.times)} IST")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while True:
+            delay = (self.next_run() - now_ist()).total_seconds()
+            if self._stop.wait(max(delay, 0)):
+                return
+            try:
+                self.job()
+            except Exception as e:
+                logger.error(f"{self.name} run failed: {str(e)}")
+
+
+class RunLock:
+    """Lets one worker run a job at a time; the others skip instead of waiting.
+
+    With a Redis client the lock (`runlock:<name>`, expiring after
+    `timeout` seconds in case the holder dies) is shared by every
+    instance; otherwise it is an flock on `path`, shared by the workers
+    on one host.
+    """
+
+    def __init__(self, name, redis_client=None, path=None, timeout=3600):
+        self.name = name
+        self.redis = redis_client
+        self.path = path
+        self.timeout = timeout
+        self._release = redis_client.register_script(_RELEASE_SCRIPT) if redis_client is not None else None
+        self._renew = redis_client.register_script(_RENEW_SCRIPT) if redis_client is not None else None
+        self._lock = threading.Lock()
+        self._owned = None
+
+    @contextmanager
+    def hold(self):
+        """Yield True if this worker holds the lock for the block, False if another one does"""
+        if self.redis is not None:
+            key, token = f'runlock:{self.name}', uuid4().hex
+            acquired = self.redis.set(key, token, nx=True, ex=self.timeout)
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    try:
+                        self._release(keys=[key], args=[token])
+                    except Exception as e:
+                        logger.warning(f"Error releasing {key}: {str(e)}")
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """Take the lock for the rest of this worker's life if it is free; returns True if held.
+
+        For jobs that never finish, such as the market feed. The flock is
+        released when the process exits; the Redis key is renewed every
+        timeout/3 seconds by a daemon thread and expires if the worker dies.
+        """
+        with self._lock:
+            if self._owned is not None:
+                return True
+            if self.redis is not None:
+                key, token = f'runlock:{self.name}', uuid4().hex
+                if not self.redis.set(key, token, nx=True, ex=self.timeout):
+                    return False
+                self._owned = token
+                threading.Thread(target=self._keep, args=(key, token), name=f'runlock-{self.name}', daemon=True).start()
+                return True
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            lock_file = open(self.path, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._owned = lock_file
+            return True
+
+    def _keep(self, key, token):
+        while True:
+            time.sleep(self.timeout / 3)
+            try:
+                if not self._renew(keys=[key], args=[token, self.timeout]):
+                    logger.error(f"Lost {key}; another worker may now hold it too")
+                    with self._lock:
+                        self._owned = None
+                    return
+            except Exception as e:
+                logger.warning(f"Error renewing {key}: {str(e)}")
@@ -0,0 +1,86 @@
+import threading
+
+# Rough average for English and CSV text in Grok's tokenizer
+CHARS_PER_TOKEN = 4
+# Answer size for one recommended stock: name, symbol, <=100 character reason and JSON punctuation
+ANSWER_TOKENS_PER_STOCK = 60
+ANSWER_TOKENS_OVERHEAD = 20
+
+
+def estimate_tokens(text):
+    """Rough token count for a prompt or completion"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def answer_tokens(stock_count=5, profiles=1):
+    """Completion tokens needed for `profiles` answers of `stock_count` stocks each"""
+    return profiles * (stock_count * ANSWER_TOKENS_PER_STOCK + ANSWER_TOKENS_OVERHEAD)
+
+
+class CompiledPrompt:
+    def __init__(self, text, tokens, included, candidates):
+        self.text = text
+        self.tokens = tokens
+        self.included = included
+        self.candidates = candidates
+
+    @property
+    def trimmed(self):
+        return self.candidates - self.included
+
+
+class PromptCompiler:
+    """Render stock data as a compact CSV table inside a token budget.
+
+    Stocks are ranked by traded volume (most liquid first) and rows are
+    added until the whole prompt would exceed `token_budget` estimated
+    tokens. Symbols are written without the `.NS` suffix, which the
+    instructions ask the model to add back. When any stock carries a
+    measured `beta`, a beta column is added (blank where it is unknown).
+    """
+
+    header = 'symbol,price'
+    beta_header = 'symbol,price,beta'
+
+    def __init__(self, token_budget):
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self.counters = {'prompts': 0, 'tokens_total': 0, 'tokens_max': 0, 'stocks_trimmed': 0}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['tokens_mean'] = round(stats['tokens_total'] / stats['prompts'], 1) if stats['prompts'] else 0
+        return stats
+
+    @staticmethod
+    def _row(stock, with_beta=False):
+        symbol = stock['symbol'][:-3] if stock['symbol'].endswith('.NS') else stock['symbol']
+        if with_beta:
+            beta = f"{stock['beta']:.2f}" if stock.get('beta') is not None else ''
+            return f"{symbol},{stock['price']:.2f},{beta}\n"
+        return f"{symbol},{stock['price']:.2f}\n"
+
+    def compile(self, before, after, stock_data, record=True):
+        """Build `before + table + after`, trimming table rows to fit the budget"""
+        ranked = sorted(stock_data, key=lambda stock: (-(stock.get('volume') or 0), stock['symbol']))
+        with_beta = any(stock.get('beta') is not None for stock in stock_data)
+        header = self.beta_header if with_beta else self.header
+        used = len(before) + len(header) + 1 + len(after)
+        budget = self.token_budget * CHARS_PER_TOKEN
+        rows = []
+        for stock in ranked:
+            row = self._row(stock, with_beta)
+            if rows and used + len(row) > budget:
+                break
+            rows.append(row)
+            used += len(row)
+        text = f"{before}{header}\n{''.join(rows)}{after}"
+        compiled = CompiledPrompt(text, estimate_tokens(text), len(rows), len(stock_data))
+        if record:
+            with self._lock:
+                self.counters['prompts'] += 1
+                self.counters['tokens_total'] += compiled.tokens
+                self.counters['tokens_max'] = max(self.counters['tokens_max'], compiled.tokens)
+                self.counters['stocks_trimmed'] += compiled.trimmed
+        return compiled
@@ -0,0 +1,179 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from circuit_breaker import CircuitOpenError
+
+# Kite rejects very long instrument lists with 414 Request-URI Too Large
+QUOTE_BATCH_SIZE = 500
+# Kite Connect allows one quote request per second per API key
+QUOTE_REQUESTS_PER_SECOND = 1.0
+
+
+def batch_instruments(symbols, batch_size=QUOTE_BATCH_SIZE, exchange='NSE'):
+    """Split trading symbols into `EXCHANGE:SYMBOL` batches for kite.quote"""
+    return [
+        [f'{exchange}:{symbol}' for symbol in symbols[i:i + batch_size]]
+        for i in range(0, len(symbols), batch_size)
+    ]
+
+
+class SectorQuotePlan:
+    """Quote request set scoped to the symbols of a sector mapping.
+
+    Symbols listed under several sectors are quoted once, in first-seen
+    order. When `tradable` is given, symbols missing from the instrument
+    master are dropped and the plan reports how many symbols and quote
+    calls it saved compared with quoting the whole tradable universe of
+    `universe_size` symbols (by default, the size of `tradable`).
+    """
+
+    def __init__(self, sector_mapping, tradable=None, batch_size=QUOTE_BATCH_SIZE, universe_size=None):
+        seen = dict.fromkeys(symbol for symbols in sector_mapping.values() for symbol in symbols)
+        if tradable is not None:
+            seen = {symbol: None for symbol in seen if symbol in tradable}
+        self.symbols = list(seen)
+        self.batch_size = batch_size
+        self.batches = batch_instruments(self.symbols, batch_size)
+        if universe_size is None:
+            universe_size = len(tradable) if tradable is not None else len(self.symbols)
+        self.universe_size = universe_size
+
+    @property
+    def saved_symbols(self):
+        return self.universe_size - len(self.symbols)
+
+    @property
+    def saved_calls(self):
+        return math.ceil(self.universe_size / self.batch_size) - len(self.batches)
+
+
+class RateLimiter:
+    """Thread-safe token bucket that spaces calls to `rate` per second.
+
+    The bucket adapts to upstream rate limiting: `throttle` (on a 429)
+    halves the rate, down to `min_rate`, and holds every caller back for
+    the server's Retry-After; each `recover` (on success) adds `recovery`
+    requests per second back until the configured rate is reached again.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None, recovery=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 8
+        self.recovery = recovery if recovery is not None else rate / 20
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {'throttled': 0}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, rate=self.rate, max_rate=self.max_rate)
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+            # Calls queued behind a Retry-After are still spaced at the (reduced) rate
+            wait += max(self._blocked_until - now, 0)
+        if wait:
+            time.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        with self._lock:
+            self.counters['throttled'] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + (retry_after or 1 / self.rate))
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.recovery)
+
+
+class QuoteFetchResult:
+    """Merged quotes from every batch that succeeded plus per-batch errors"""
+
+    def __init__(self):
+        self.data = {}
+        self.errors = []  # (batch_number, exception) pairs
+        self.batch_seconds = []  # kite.quote latency per batch, excluding rate-limit waits
+
+    @property
+    def complete(self):
+        return not self.errors
+
+
+class QuoteFetcher:
+    """Fetch kite.quote batches in parallel within a requests-per-second budget.
+
+    A failing batch does not fail the fetch: its exception is recorded in
+    the result and the quotes from the other batches are still returned.
+    A 429 from Kite slows the limiter down; with a `breaker`, 5xx and
+    network errors count towards opening it, and batches fail fast with
+    CircuitOpenError while it is open.
+    """
+
+    def __init__(self, kite, max_workers=4, requests_per_second=QUOTE_REQUESTS_PER_SECOND, breaker=None):
+        self.kite = kite
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(requests_per_second, burst=max(int(requests_per_second), 1))
+        self.breaker = breaker
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='kite-quote')
+            return self._executor
+
+    def _quote(self, batch):
+        if self.breaker is not None:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError as e:
+                return None, e, 0.0
+        self.limiter.acquire()
+        started = time.perf_counter()
+        try:
+            data = self.kite.quote(batch)
+        except Exception as e:
+            self._record_error(e)
+            return None, e, time.perf_counter() - started
+        self.limiter.recover()
+        if self.breaker is not None:
+            self.breaker.record_success()
+        return data, None, time.perf_counter() - started
+
+    def _record_error(self, error):
+        # KiteExceptions carry the HTTP status; transport errors have none
+        code = getattr(error, 'code', None)
+        if code == 429:
+            self.limiter.throttle()
+        if self.breaker is None:
+            return
+        if code is not None and code < 500:
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
+
+    def fetch(self, batches):
+        if len(batches) <= 1 or self.max_workers <= 1:
+            outcomes = [self._quote(batch) for batch in batches]
+        else:
+            outcomes = list(self._get_executor().map(self._quote, batches))
+        result = QuoteFetchResult()
+        for batch_number, (data, error, seconds) in enumerate(outcomes, start=1):
+            result.batch_seconds.append(seconds)
+            if error is not None:
+                result.errors.append((batch_number, error))
+            else:
+                result.data.update(data)
+        return result
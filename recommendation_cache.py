@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from market_hours import is_market_open, seconds_until_open
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+
+def market_soft_ttl(open_ttl, closed_ttl):
+    """Soft TTL policy: `open_ttl` during NSE hours, otherwise up to `closed_ttl`.
+
+    Outside trading hours entries stay fresh until the next session opens
+    (capped at `closed_ttl`), since quotes do not move overnight or on
+    weekends.
+    """
+    def soft_ttl():
+        if is_market_open():
+            return open_ttl
+        return max(open_ttl, min(closed_ttl, seconds_until_open()))
+    return soft_ttl
+
+
+class StaleWhileRevalidateCache:
+    """Recommendation cache with soft and hard expiry.
+
+    Entries are served as fresh until their soft TTL, then as stale while
+    one background refresh per key recomputes them, and are dropped by the
+    backing cache `stale_ttl` seconds after soft expiry (the hard TTL).
+    """
+
+    def __init__(self, cache, soft_ttl, stale_ttl=3600, max_workers=2):
+        self.cache = cache
+        self.soft_ttl = soft_ttl
+        self.stale_ttl = stale_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='swr-refresh')
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'refreshes': 0,
+            'refresh_failures': 0,
+            'refresh_seconds_total': 0.0,
+            'refresh_seconds_max': 0.0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, refreshing=len(self._refreshing))
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def lookup(self, key):
+        """Return (value, FRESH | STALE), or (None, None) if absent, without touching stats"""
+        entry = self.cache.get(key)
+        # Entries written before soft expiry existed are plain lists; treat them as misses
+        if not isinstance(entry, dict) or 'soft_expires_at' not in entry:
+            return None, None
+        return entry['value'], FRESH if time.time() < entry['soft_expires_at'] else STALE
+
+    def get(self, key):
+        value, state = self.lookup(key)
+        self._count({FRESH: 'hits', STALE: 'stale_hits'}.get(state, 'misses'))
+        return value, state
+
+    def set(self, key, value, soft_ttl=None, stale_ttl=None):
+        """Store `value`; `soft_ttl` and `stale_ttl` override the policy for this entry (e.g. a partial result)"""
+        soft_ttl = self.soft_ttl() if soft_ttl is None else soft_ttl
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        self.cache.set(
+            key,
+            {'value': value, 'soft_expires_at': time.time() + soft_ttl},
+            timeout=int(soft_ttl + stale_ttl),
+        )
+
+    def refresh(self, key, compute):
+        """Run `compute` in the background unless a refresh for `key` is already running.
+
+        `compute` is expected to store the new value with `set`; an
+        exception counts as a failed refresh and the stale value is kept.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+        self._executor.submit(self._run_refresh, key, compute)
+        return True
+
+    def _run_refresh(self, key, compute):
+        started = time.perf_counter()
+        try:
+            compute()
+            self._count('refreshes')
+        except Exception as e:
+            self._count('refresh_failures')
+            logger.warning(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._refreshing.discard(key)
+                self.counters['refresh_seconds_total'] += elapsed
+                self.counters['refresh_seconds_max'] = max(self.counters['refresh_seconds_max'], elapsed)
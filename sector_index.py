@@ -0,0 +1,124 @@
+import numpy as np
+
+
+class SectorIndex:
+    """Sector mapping compiled into an inverted symbol -> sector index.
+
+    Each unique symbol gets a position; `codes[position]` is the sector it
+    counts towards (the first sector that lists it) and `tokens[position]`
+    its instrument_token once `bind_instruments` has run (-1 until then,
+    or if the instrument master does not list it). Sector averages are
+    computed with one bincount over those arrays instead of per-sector
+    Python lists.
+    """
+
+    def __init__(self, sector_mapping, exchange='NSE'):
+        self.sectors = list(sector_mapping)
+        self._members = {sector: tuple(symbols) for sector, symbols in sector_mapping.items()}
+        self.position = {}
+        codes = []
+        for code, symbols in enumerate(sector_mapping.values()):
+            for symbol in symbols:
+                if symbol not in self.position:
+                    self.position[symbol] = len(codes)
+                    codes.append(code)
+        self.symbols = list(self.position)
+        self.keys = [f'{exchange}:{symbol}' for symbol in self.symbols]
+        self.codes = np.array(codes, dtype=np.int32)
+        self.tokens = np.full(len(self.symbols), -1, dtype=np.int64)
+        # Positions already looked up in the instrument table bound last
+        self._bound = np.zeros(len(self.symbols), dtype=bool)
+        self._bound_to = None
+        self._listed_members = self._members
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def sector_of(self, symbol):
+        position = self.position.get(symbol)
+        return None if position is None else self.sectors[self.codes[position]]
+
+    def bind_instruments(self, instruments, segment='NSE'):
+        """Record instrument tokens for the indexed symbols from an InstrumentTable.
+
+        Binding is remembered per table, so repeated calls with the same
+        table only look up symbols that have not been looked up yet.
+        """
+        if instruments is not self._bound_to:
+            self.tokens[:] = -1
+            self._bound[:] = False
+            self._bound_to = instruments
+        pending = np.flatnonzero(~self._bound)
+        if not len(pending):
+            return
+        for symbol, token in instruments.lookup([self.symbols[i] for i in pending], segment).items():
+            self.tokens[self.position[symbol]] = token
+        self._bound[pending] = True
+        self._update_listed_members()
+
+    def inherit_tokens(self, previous):
+        """Reuse the tokens `previous` bound for symbols both indexes share"""
+        if previous._bound_to is None:
+            return
+        self._bound_to = previous._bound_to
+        for symbol, i in self.position.items():
+            j = previous.position.get(symbol)
+            if j is not None and previous._bound[j]:
+                self.tokens[i] = previous.tokens[j]
+                self._bound[i] = True
+        self._update_listed_members()
+
+    def _update_listed_members(self):
+        listed = self.tokens >= 0
+        self._listed_members = {
+            sector: tuple(symbol for symbol in symbols if listed[self.position[symbol]] or not self._bound[self.position[symbol]])
+            for sector, symbols in self._members.items()
+        }
+
+    def listed(self):
+        """{symbol: instrument_token} for the indexed symbols the bound instrument master lists"""
+        return {self.symbols[i]: int(self.tokens[i]) for i in np.flatnonzero(self.tokens >= 0)}
+
+    def unlisted(self):
+        """Symbols looked up in the bound instrument master but not found there"""
+        return [self.symbols[i] for i in np.flatnonzero(self._bound & (self.tokens < 0))]
+
+    def keys_by_token(self):
+        return {int(token): self.keys[i] for i, token in enumerate(self.tokens) if token >= 0}
+
+    def percent_changes(self, market_data):
+        """Percent change per indexed symbol; NaN where the quote is missing"""
+        quotes = [market_data.get(key) or {} for key in self.keys]
+        count = len(quotes)
+        last = np.fromiter((quote.get('last_price', np.nan) for quote in quotes), dtype=np.float64, count=count)
+        change = np.fromiter((quote.get('price_change', np.nan) for quote in quotes), dtype=np.float64, count=count)
+        previous = last - change
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent = np.where(previous != 0, change / previous * 100, 0.0)
+        percent[np.isnan(last) | np.isnan(change)] = np.nan
+        return percent
+
+    def sector_means(self, percent):
+        """Mean of `percent` per sector code; NaN for sectors without data"""
+        valid = ~np.isnan(percent)
+        sums = np.bincount(self.codes[valid], weights=percent[valid], minlength=len(self.sectors))
+        counts = np.bincount(self.codes[valid], minlength=len(self.sectors))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def rank_sectors(self, market_data, top=2):
+        return self.rank_by(self.percent_changes(market_data), top)
+
+    def rank_by(self, values, top=2):
+        """Sectors ordered by the mean of a per-position metric, highest first"""
+        means = self.sector_means(values)
+        available = np.flatnonzero(~np.isnan(means))
+        ranked = available[np.argsort(-means[available], kind='stable')]
+        return [self.sectors[code] for code in ranked[:top]]
+
+    def symbols_for(self, sectors):
+        """Members of `sectors`, without symbols the bound instrument master does not list"""
+        symbols = []
+        for sector in sectors:
+            symbols.extend(self._listed_members.get(sector, ()))
+        return symbols
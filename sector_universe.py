@@ -0,0 +1,133 @@
+import csv
+import logging
+import os
+import threading
+import time
+
+from sector_index import SectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Header names accepted for each column, matched case-insensitively. NSE's index
+# constituent downloads (e.g. ind_nifty500list.csv) use Symbol and Industry.
+SYMBOL_COLUMNS = ('symbol', 'tradingsymbol')
+SECTOR_COLUMNS = ('sector', 'industry')
+
+
+def read_sector_file(path):
+    """Parse a sector classification CSV into {sector: [symbols]}.
+
+    Rows without a symbol or sector are skipped, symbols are upper-cased
+    and a symbol repeated under one sector is kept once. Raises ValueError
+    when the header lacks a symbol or sector column or no row is usable.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        symbol_field = next((fields[name] for name in SYMBOL_COLUMNS if name in fields), None)
+        sector_field = next((fields[name] for name in SECTOR_COLUMNS if name in fields), None)
+        if symbol_field is None or sector_field is None:
+            raise ValueError(f"{path} needs a symbol column {SYMBOL_COLUMNS} and a sector column {SECTOR_COLUMNS}")
+        mapping = {}
+        skipped = 0
+        for row in reader:
+            symbol = (row.get(symbol_field) or '').strip().upper()
+            sector = (row.get(sector_field) or '').strip()
+            if not symbol or not sector:
+                skipped += 1
+                continue
+            mapping.setdefault(sector, {})[symbol] = None
+    if not mapping:
+        raise ValueError(f"{path} has no usable symbol/sector rows")
+    if skipped:
+        logger.warning(f"Skipped {skipped} incomplete row(s) in {path}")
+    return {sector: list(symbols) for sector, symbols in mapping.items()}
+
+
+class SectorUniverse:
+    """Sector mapping and its compiled SectorIndex, hot-reloaded from a file.
+
+    Without a `path` the `default_mapping` is used as is. With one, the file
+    is re-checked at most every `check_interval` seconds; when its mtime or
+    size changes it is parsed and compiled into a new SectorIndex that
+    reuses the instrument tokens already bound for unchanged symbols. A
+    file that fails to parse is logged and the previous universe is kept.
+    `on_change(index)` is called after every reload that replaced the index
+    (not the initial load), outside the lock.
+    """
+
+    def __init__(self, default_mapping, path=None, check_interval=5, clock=time.monotonic, on_change=None):
+        self.path = path
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_once = False
+        self._checked_at = None
+        self.counters = {'reloads': 0, 'reload_failures': 0, 'unlisted': 0}
+        self.mapping = default_mapping
+        self._index = SectorIndex(default_mapping)
+        self.on_change = None
+        if path:
+            self.reload_if_changed(force=True)
+        self.on_change = on_change
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, sectors=len(self._index.sectors), symbols=len(self._index))
+
+    def index(self):
+        if self.path:
+            self.reload_if_changed()
+        return self._index
+
+    def reload_if_changed(self, force=False):
+        """Reload the file if it changed since the last check; returns True when the index was replaced"""
+        now = self._clock()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+                signature = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                signature = None
+            if signature == self._signature and self._checked_once:
+                return False
+            # A broken file is reported once, not on every check until it changes
+            self._signature, self._checked_once = signature, True
+            try:
+                mapping = read_sector_file(self.path)
+            except (OSError, ValueError) as e:
+                self.counters['reload_failures'] += 1
+                logger.error(f"Keeping the current sector universe; could not load {self.path}: {str(e)}")
+                return False
+            index = SectorIndex(mapping)
+            index.inherit_tokens(self._index)
+            self.mapping, self._index = mapping, index
+            self.counters['reloads'] += 1
+        logger.info(f"Loaded {len(index)} symbols in {len(index.sectors)} sectors from {self.path}")
+        if self.on_change:
+            try:
+                self.on_change(index)
+            except Exception as e:
+                logger.error(f"Error applying the reloaded sector universe: {str(e)}")
+        return True
+
+    def validate(self, instruments, segment='NSE'):
+        """Bind the current index to the instrument master and return it, logging symbols it does not list"""
+        index = self.index()
+        index.bind_instruments(instruments, segment)
+        unlisted = index.unlisted()
+        with self._lock:
+            changed = self.counters['unlisted'] != len(unlisted)
+            self.counters['unlisted'] = len(unlisted)
+        if unlisted and changed:
+            logger.warning(
+                f"{len(unlisted)} sector universe symbol(s) are not listed on {segment} and will be ignored: "
+                f"{', '.join(unlisted[:10])}{' ...' if len(unlisted) > 10 else ''}"
+            )
+        return index
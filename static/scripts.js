@@ -18,83 +18,165 @@ document.addEventListener('DOMContentLoaded', () => {
         tipIndex = (tipIndex + 1) % tips.length;
     };
 
-    form.addEventListener('submit', async (e) => {
+    const stopLoading = (tipInterval) => {
+        clearInterval(tipInterval);
+        loadingSpinner.classList.add('d-none');
+    };
+
+    const formatPrice = (stock) => typeof stock.price === 'number' ? `₹${stock.price.toFixed(2)}` : 'N/A';
+
+    const stockCard = (stock) => `
+        <div class="card mb-3">
+            <div class="card-body">
+                <h5 class="card-title">${stock.name} (${stock.symbol})</h5>
+                <p class="card-text">Price: ${formatPrice(stock)}</p>
+                <p class="card-text">Reason: ${stock.reason}</p>
+                <button class="btn btn-sm btn-outline-primary copy-btn" data-text="${stock.symbol}">Copy Symbol</button>
+                <button class="btn btn-sm btn-outline-secondary save-btn" data-stock='${JSON.stringify(stock)}'>Save</button>
+            </div>
+        </div>
+    `;
+
+    const errorAlert = (message) => `
+        <div class="alert alert-danger alert-dismissible fade show">
+            ${message}
+            <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
+        </div>
+    `;
+
+    const noResultsAlert = '<div class="alert alert-warning">No recommendations were generated. Please try different criteria or select "None" for broader results.</div>';
+
+    const resultActions = `
+        <div class="mt-3">
+            <button class="btn btn-secondary copy-all-btn">Copy All Results</button>
+            <button class="btn btn-secondary save-btn" data-bs-toggle="modal" data-bs-target="#savedModal">Save All Results</button>
+        </div>
+    `;
+
+    form.addEventListener('submit', (e) => {
         e.preventDefault();
         loadingSpinner.classList.remove('d-none');
         const tipInterval = setInterval(rotateTips, 3000);
         resultsDiv.innerHTML = '';
 
         const formData = new FormData(form);
-        const csrfToken = document.querySelector('input[name="csrf_token"]').value;
         const data = {
-            csrf_token: csrfToken,
+            csrf_token: document.querySelector('input[name="csrf_token"]').value,
             price_range: formData.get('price_range'),
             time_horizon: formData.get('time_horizon'),
             risk_level: formData.get('risk_level')
         };
 
+        if (window.EventSource) {
+            streamRecommendations(data, tipInterval);
+        } else {
+            fetchRecommendations(data, tipInterval);
+        }
+    });
+
+    // Render each stock as the server streams it instead of waiting for the full answer
+    function streamRecommendations(data, tipInterval) {
+        const params = new URLSearchParams({
+            price_range: data.price_range,
+            time_horizon: data.time_horizon,
+            risk_level: data.risk_level
+        });
+        const source = new EventSource(`/recommendations/stream?${params}`);
+        let count = 0;
+        let finished = false;
+
+        const finish = (html) => {
+            finished = true;
+            source.close();
+            stopLoading(tipInterval);
+            if (count) {
+                resultsDiv.insertAdjacentHTML('beforeend', resultActions);
+                addCopyAndSaveListeners();
+            }
+            if (html) {
+                resultsDiv.insertAdjacentHTML(count ? 'beforeend' : 'afterbegin', html);
+            }
+        };
+
+        source.addEventListener('stock', (event) => {
+            if (!count) {
+                stopLoading(tipInterval);
+                resultsDiv.innerHTML = '<h3>Recommended Stocks</h3><div class="stock-recommendations"></div>';
+            }
+            count += 1;
+            resultsDiv.querySelector('.stock-recommendations').insertAdjacentHTML('beforeend', stockCard(JSON.parse(event.data)));
+        });
+
+        source.addEventListener('done', (event) => {
+            const result = JSON.parse(event.data);
+            if (!count) {
+                finish(noResultsAlert);
+            } else if (result.truncated) {
+                finish('<div class="alert alert-warning">The response was cut short; showing the recommendations received so far.</div>');
+            } else {
+                finish('');
+            }
+        });
+
+        source.addEventListener('failure', (event) => finish(errorAlert(JSON.parse(event.data).message)));
+
+        // Connection errors (including rate limiting); EventSource would otherwise reconnect
+        source.onerror = () => {
+            if (!finished) {
+                finish(errorAlert('Error fetching recommendations: connection lost. Please try again.'));
+            }
+        };
+    }
+
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+    // Submit a background job and poll it, so no server thread waits on Kite or Grok for us
+    async function fetchRecommendations(data, tipInterval) {
         try {
-            const response = await fetch('/', {
+            const response = await fetch('/api/recommendations/jobs', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-Requested-With': 'XMLHttpRequest'
-                },
+                headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(data)
             });
-            const result = await response.json();
-            clearInterval(tipInterval);
-            loadingSpinner.classList.add('d-none');
+            let job = await response.json();
+            if (!response.ok && !job.job_id) {
+                throw new Error(job.error || `HTTP ${response.status}`);
+            }
+            while (job.status === 'pending') {
+                await sleep(1000);
+                job = await (await fetch(`/api/recommendations/jobs/${job.job_id}`)).json();
+            }
+            stopLoading(tipInterval);
+
+            if (job.status !== 'done') {
+                resultsDiv.innerHTML = errorAlert(`Error fetching recommendations: ${job.error || 'job expired'}. Please try again.`);
+                return;
+            }
+            const result = job.result;
 
             if (result.messages && result.messages.length) {
-                resultsDiv.innerHTML = result.messages.map(message => `
-                    <div class="alert alert-danger alert-dismissible fade show">
-                        ${message}
-                        <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
-                    </div>
-                `).join('');
+                resultsDiv.innerHTML = result.messages.map(errorAlert).join('');
                 return;
             }
 
             if (!result.stocks || !result.stocks.length) {
-                resultsDiv.innerHTML = '<div class="alert alert-warning">No recommendations were generated. Please try different criteria or select "None" for broader results.</div>';
+                resultsDiv.innerHTML = noResultsAlert;
                 return;
             }
 
-            const stockHtml = result.stocks.map(stock => `
-                <div class="card mb-3">
-                    <div class="card-body">
-                        <h5 class="card-title">${stock.name} (${stock.symbol})</h5>
-                        <p class="card-text">Price: ₹${stock.price.toFixed(2)}</p>
-                        <p class="card-text">Reason: ${stock.reason}</p>
-                        <button class="btn btn-sm btn-outline-primary copy-btn" data-text="${stock.symbol}">Copy Symbol</button>
-                        <button class="btn btn-sm btn-outline-secondary save-btn" data-stock='${JSON.stringify(stock)}'>Save</button>
-                    </div>
-                </div>
-            `).join('');
-
             resultsDiv.innerHTML = `
                 <h3>Recommended Stocks</h3>
                 <div class="stock-recommendations">
-                    ${stockHtml}
-                </div>
-                <div class="mt-3">
-                    <button class="btn btn-secondary copy-all-btn">Copy All Results</button>
-                    <button class="btn btn-secondary save-btn" data-bs-toggle="modal" data-bs-target="#savedModal">Save All Results</button>
+                    ${result.stocks.map(stockCard).join('')}
                 </div>
+                ${resultActions}
             `;
             addCopyAndSaveListeners();
         } catch (error) {
-            clearInterval(tipInterval);
-            loadingSpinner.classList.add('d-none');
-            resultsDiv.innerHTML = `
-                <div class="alert alert-danger alert-dismissible fade show">
-                    Error fetching recommendations: ${error.message}. Please try again.
-                    <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
-                </div>
-            `;
+            stopLoading(tipInterval);
+            resultsDiv.innerHTML = errorAlert(`Error fetching recommendations: ${error.message}. Please try again.`);
         }
-    });
+    }
 
     function addCopyAndSaveListeners() {
         // Copy individual symbol
@@ -150,7 +232,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     date: new Date().toLocaleString(),
                     stocks: [{
                         title: `${stock.name} (${stock.symbol})`,
-                        price: `Price: ₹${stock.price.toFixed(2)}`,
+                        price: `Price: ${formatPrice(stock)}`,
                         reason: `Reason: ${stock.reason}`
                     }]
                 });
@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+# Bodies smaller than this are not worth a compressed variant
+MIN_COMPRESS_BYTES = 256
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Preferred first when a client accepts several encodings equally
+ENCODINGS = ('br', 'gzip')
+
+
+def compressible(content_type):
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def choose_encoding(request, available):
+    """Best of `available` encodings the client accepts, or None for the identity body"""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = request.accept_encodings[encoding]
+        if encoding in available and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class StaticResponse:
+    """A response body precomputed once with its compressed variants and strong ETags.
+
+    Every variant gets its own ETag (the body's SHA-256 prefix, suffixed
+    with the encoding) since each is a different representation; an
+    If-None-Match naming any of them is answered with 304.
+    """
+
+    def __init__(self, body, content_type, cache_control='public, max-age=3600'):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.content_type = content_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()
+        self.version = digest[:12]
+        self.variants = {None: (body, f'"{digest[:32]}"')}
+        if compressible(content_type) and len(body) >= MIN_COMPRESS_BYTES:
+            compressed = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(body, quality=11)
+            for encoding, data in compressed.items():
+                if len(data) < len(body):
+                    self.variants[encoding] = (data, f'"{digest[:32]}-{encoding}"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    @classmethod
+    def from_file(cls, path, content_type=None, cache_control='public, max-age=3600'):
+        with open(path, 'rb') as f:
+            body = f.read()
+        if content_type is None:
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+                content_type += '; charset=utf-8'
+        return cls(body, content_type, cache_control)
+
+    def response(self, request, cache_control=None):
+        encoding = choose_encoding(request, self.variants)
+        body, etag = self.variants[encoding]
+        headers = {
+            'ETag': etag,
+            'Cache-Control': cache_control or self.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if request.if_none_match and any(request.if_none_match.contains_weak(tag.strip('"')) for tag in self.etags):
+            return Response(status=304, headers=headers)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, status=200, headers=headers, content_type=self.content_type)
+
+
+class StaticFiles:
+    """StaticResponses for every file under `directory`, loaded once, plus in-memory entries"""
+
+    def __init__(self, directory, cache_control='public, max-age=3600'):
+        self.cache_control = cache_control
+        self.responses = {}
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, directory).replace(os.sep, '/')
+                self.responses[filename] = StaticResponse.from_file(path, cache_control=cache_control)
+
+    def add(self, filename, body, content_type):
+        self.responses[filename] = StaticResponse(body, content_type, self.cache_control)
+
+    def get(self, filename):
+        return self.responses.get(filename)
+
+    def version(self, filename):
+        static = self.responses.get(filename)
+        return static.version if static is not None else None
+
+    def stats(self):
+        identity = sum(len(static.variants[None][0]) for static in self.responses.values())
+        gzip_bytes = sum(len(static.variants.get('gzip', static.variants[None])[0]) for static in self.responses.values())
+        return {'files': len(self.responses), 'identity_bytes': identity, 'gzip_bytes': gzip_bytes}
+
+
+class PageShell:
+    """An HTML page rendered once with marker strings standing in for per-request values.
+
+    `markers` are given in the order they appear in the page, each once.
+
+    `response` splices the values in and gzips the result when the client
+    accepts it; the page is never cached by intermediaries.
+    """
+
+    def __init__(self, html, markers):
+        self.markers = markers
+        self.parts = [html]
+        for marker in markers:
+            head = self.parts.pop()
+            if head.count(marker) != 1:
+                raise ValueError(f"Page shell marker {marker!r} must appear exactly once")
+            self.parts.extend(head.split(marker))
+
+    def render(self, *values):
+        pieces = [self.parts[0]]
+        for value, part in zip(values, self.parts[1:]):
+            pieces.append(value)
+            pieces.append(part)
+        return ''.join(pieces)
+
+    def response(self, request, *values):
+        body = self.render(*values).encode('utf-8')
+        headers = {'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding'}
+        if request.accept_encodings['gzip'] and len(body) >= MIN_COMPRESS_BYTES:
+            body = gzip.compress(body, compresslevel=6, mtime=0)
+            headers['Content-Encoding'] = 'gzip'
+        return Response(body, status=200, headers=headers, content_type='text/html; charset=utf-8')
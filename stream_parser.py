@@ -0,0 +1,91 @@
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_STOCKS_ARRAY = re.compile(r'"stocks"\s*:\s*\[')
+
+
+class StreamingStocksParser:
+    """Incrementally extract the objects of a streamed `{"stocks": [...]}` document.
+
+    `feed` accepts completion text as it arrives and returns every object
+    of the `stocks` array that has closed since the last call. Objects are
+    delimited by tracking brace depth outside JSON strings, so each one is
+    decoded exactly once and never re-parsed. After the stream ends,
+    `truncated` is true if the array never closed, and `partial` holds the
+    unfinished tail of the last object, if any.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._scan = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._in_array = False
+        self.complete = False
+
+    @property
+    def truncated(self):
+        return not self.complete
+
+    @property
+    def partial(self):
+        return self._buffer[self._start:] if self._start is not None else ''
+
+    def feed(self, chunk):
+        if self.complete:
+            return []
+        self._buffer += chunk
+        if not self._in_array:
+            match = _STOCKS_ARRAY.search(self._buffer)
+            if not match:
+                return []
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+            self._scan = 0
+        return self._consume()
+
+    def _consume(self):
+        objects = []
+        buffer = self._buffer
+        i = self._scan
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if self._depth == 0 and char == '{':
+                    self._start = i
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # End of the stocks array
+                    self.complete = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._start is not None:
+                    text = buffer[self._start:i + 1]
+                    self._start = None
+                    try:
+                        objects.append(json.loads(text))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Skipping malformed streamed stock {text!r}: {str(e)}")
+            i += 1
+        # Drop everything before the object still being read
+        keep = self._start if self._start is not None else i
+        self._buffer = buffer[keep:]
+        self._scan = i - keep
+        if self._start is not None:
+            self._start = 0
+        return objects
@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+
+import pytest
+from flask_caching import Cache
+
+from coalescing import SingleFlight, StreamFanOut
+from recommendation_cache import StaleWhileRevalidateCache
+
+STOCK_DATA = [{'symbol': 'TCS', 'price': 3500.0}, {'symbol': 'INFY', 'price': 1500.0}]
+ANSWER = json.dumps({'stocks': [
+    {'name': 'Tata Consultancy', 'symbol': 'TCS', 'reason': 'Steady margins'},
+    {'name': 'Infosys', 'symbol': 'INFY', 'reason': 'Deal wins'},
+]})
+ANSWER_STOCK = {'name': 'Tata Consultancy', 'symbol': 'TCS', 'reason': 'Steady margins'}
+
+
+@pytest.fixture
+def streaming_app(app_module, monkeypatch):
+    """app.py with an empty recommendation cache and a fake Kite snapshot; Grok is left to each test"""
+    backing = Cache()
+    backing.init_app(app_module.app, config={'CACHE_TYPE': 'SimpleCache'})
+    monkeypatch.setattr(app_module, 'recommendation_cache', StaleWhileRevalidateCache(backing, lambda: 300, stale_ttl=3600))
+    monkeypatch.setattr(app_module, 'coalescer', SingleFlight())
+    monkeypatch.setattr(app_module, 'stream_fanout', StreamFanOut(max_workers=4))
+    monkeypatch.setattr(app_module.service, 'get_stock_data', lambda price_range, risk_level='None', snapshot=None: STOCK_DATA)
+    monkeypatch.setattr(app_module, 'build_prompt', lambda *args, **kwargs: 'prompt')
+    return app_module
+
+
+def events(app_module, profile=('None', 'None', 'None')):
+    with app_module.app.test_request_context():
+        return [
+            (message.split('\n')[0][len('event: '):], json.loads(message.split('\n')[1][len('data: '):]))
+            for message in app_module.recommendation_events(*profile)
+        ]
+
+
+def test_concurrent_stream_misses_share_one_grok_call(streaming_app, monkeypatch):
+    calls = []
+
+    def stream_completion(prompt):
+        calls.append(prompt)
+        for i in range(0, len(ANSWER), 16):
+            time.sleep(0.01)
+            yield ANSWER[i:i + 16]
+
+    monkeypatch.setattr(streaming_app, 'stream_completion', stream_completion)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(events(streaming_app))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(calls) == 1
+    assert len(results) == 4
+    for result in results:
+        assert [name for name, _ in result] == ['stock', 'stock', 'done']
+        assert result[0][1]['price'] == 3500.0
+        assert result[-1][1]['truncated'] is False
+
+
+def test_truncated_stream_is_cached_briefly(streaming_app, monkeypatch):
+    cut = ANSWER.index('"INFY"')
+    monkeypatch.setattr(streaming_app, 'stream_completion', lambda prompt: iter([ANSWER[:cut]]))
+    result = events(streaming_app)
+    assert [name for name, _ in result] == ['stock', 'done']
+    assert result[-1][1]['truncated'] is True
+    with streaming_app.app.app_context():
+        entry = streaming_app.recommendation_cache.cache.get(streaming_app.recommendation_cache_key('None', 'None', 'None'))
+    assert entry['soft_expires_at'] - time.time() <= streaming_app.RECOMMENDATION_TRUNCATED_TTL
+
+
+def test_batched_profiles_get_their_risk_level_filter(streaming_app, monkeypatch):
+    requested = []
+
+    def get_stock_data(price_range, risk_level='None', snapshot=None):
+        requested.append((price_range, risk_level))
+        return STOCK_DATA
+
+    def batch_answer(prompt, ids):
+        return {profile_id: [dict(ANSWER_STOCK)] for profile_id in ids}, {}, {}
+
+    monkeypatch.setattr(streaming_app.service, 'get_stock_data', get_stock_data)
+    monkeypatch.setattr(streaming_app, 'build_batch_prompt', lambda texts, stock_data: 'prompt')
+    monkeypatch.setattr(streaming_app, 'get_batch_recommendations_from_api', batch_answer)
+    profiles = [('None', horizon, risk) for horizon in ('short-term', 'long-term') for risk in ('low', 'high')]
+    with streaming_app.app.app_context():
+        results, report = streaming_app.recommend_profiles(profiles, snapshot={'symbols': [], 'market_data': {}})
+    assert sorted(requested) == [('None', 'high'), ('None', 'low')]
+    assert report['batch_calls'] == 2
+    assert all(result['source'] == 'api' for result in results.values())
@@ -0,0 +1,174 @@
+import time
+
+import pytest
+import requests
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from quotes import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('Upstream', failure_threshold=3, reset_timeout=30, clock=clock)
+
+
+def open_circuit(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_single_probe_after_reset_timeout(breaker, clock):
+    open_circuit(breaker)
+    clock.now = 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now = 31
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_probe_success_closes(breaker, clock):
+    open_circuit(breaker)
+    clock.now = 31
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_probe_failure_reopens(breaker, clock):
+    open_circuit(breaker)
+    clock.now = 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()['opened'] == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now = 62
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_released_probe_lets_the_next_call_probe(breaker, clock):
+    open_circuit(breaker)
+    clock.now = 31
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(50, burst=1)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.035
+
+
+def test_rate_limiter_throttle_and_recover():
+    limiter = RateLimiter(8, min_rate=1, recovery=1)
+    limiter.throttle(retry_after=0)
+    assert limiter.rate == 4
+    for _ in range(5):
+        limiter.throttle(retry_after=0)
+    assert limiter.rate == 1
+    assert limiter.stats()['throttled'] == 6
+    for _ in range(20):
+        limiter.recover()
+    assert limiter.rate == 8
+
+
+def test_rate_limiter_holds_callers_for_retry_after():
+    limiter = RateLimiter(1000, burst=10)
+    limiter.throttle(retry_after=0.05)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.04
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError, KeyboardInterrupt])
+def test_failed_grok_probe_does_not_wedge_the_circuit(app_module, monkeypatch, clock, error):
+    breaker = CircuitBreaker('Grok API', failure_threshold=1, reset_timeout=30, clock=clock)
+    monkeypatch.setattr(app_module, 'grok_breaker', breaker)
+    monkeypatch.setattr(app_module, 'grok_limiter', RateLimiter(1000, burst=1000))
+
+    def post(*args, **kwargs):
+        raise error('boom')
+
+    monkeypatch.setattr(app_module.session, 'post', post)
+    breaker.record_failure()
+    clock.now = 31
+    expected = KeyboardInterrupt if error is KeyboardInterrupt else RuntimeError
+    with pytest.raises(expected):
+        app_module.post_completion('prompt', 10)
+    if error is KeyboardInterrupt:
+        # Not an upstream failure: the circuit stays half-open and lets the next probe through
+        breaker.before_call()
+    else:
+        assert breaker.state == OPEN
+        clock.now = 62
+        breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_grok_read_timeout_is_reported_once_as_a_timeout(app_module, monkeypatch, clock):
+    from benchmarks.stub_servers import GrokStubHandler, StubServer
+
+    attempts = []
+
+    class SlowHandler(GrokStubHandler):
+        def do_POST(self):
+            attempts.append(1)
+            super().do_POST()
+
+    breaker = CircuitBreaker('Grok API', failure_threshold=5, reset_timeout=30, clock=clock)
+    monkeypatch.setattr(app_module, 'grok_breaker', breaker)
+    monkeypatch.setattr(app_module, 'grok_limiter', RateLimiter(1000, burst=1000))
+    monkeypatch.setattr(app_module, 'GROK_TIMEOUT', 0.2)
+    timeouts = []
+    monkeypatch.setattr(app_module.upstream_errors, 'inc', lambda amount=1, **labels: timeouts.append(labels['type']))
+    with StubServer(SlowHandler, latency=1.0, stocks=[]) as grok:
+        monkeypatch.setattr(app_module, 'GROK_API_URL', f'{grok.url}/v1/chat/completions')
+        with pytest.raises(RuntimeError, match='timed out'):
+            app_module.post_completion('prompt', 10)
+    assert len(attempts) == 1
+    assert timeouts == ['timeout']
+    assert breaker.stats()['failures'] == 1
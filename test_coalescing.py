@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+from coalescing import SingleFlight, StreamFanOut
+
+
+def test_do_many_computes_each_key_once():
+    flight = SingleFlight()
+    calls = []
+
+    def compute(keys):
+        calls.append(list(keys))
+        return {key: key.upper() for key in keys}
+
+    assert flight.do_many(['a', 'b', 'a'], compute) == {'a': 'A', 'b': 'B'}
+    assert calls == [['a', 'b']]
+
+
+def test_do_many_shares_a_key_already_in_flight():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    single_calls, batch_calls = [], []
+
+    def slow_single():
+        single_calls.append('a')
+        started.set()
+        release.wait(5)
+        return 'single-a'
+
+    thread = threading.Thread(target=lambda: flight.do('a', slow_single))
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.05, release.set).start()
+    results = flight.do_many(['a', 'b'], lambda keys: batch_calls.append(list(keys)) or {key: f'batch-{key}' for key in keys})
+    thread.join(5)
+    assert results == {'a': 'single-a', 'b': 'batch-b'}
+    assert batch_calls == [['b']]
+    assert single_calls == ['a']
+
+
+def test_single_call_joins_a_batch_in_flight():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_batch(keys):
+        started.set()
+        release.wait(5)
+        return {key: f'batch-{key}' for key in keys}
+
+    thread = threading.Thread(target=lambda: flight.do_many(['a', 'b'], slow_batch))
+    thread.start()
+    started.wait(5)
+    threading.Timer(0.05, release.set).start()
+    assert flight.do('b', lambda: 'single-b') == 'batch-b'
+    thread.join(5)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_do_many_failure_reaches_waiters():
+    flight = SingleFlight()
+
+    def failing(keys):
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        flight.do_many(['a'], failing)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_stream_fan_out_shares_one_computation():
+    fanout = StreamFanOut(max_workers=2)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def produce(emit):
+        calls.append(1)
+        emit('a')
+        started.set()
+        release.wait(5)
+        emit('b')
+        return 'done'
+
+    first = fanout.subscribe('key', produce)
+    started.wait(5)
+    second = fanout.subscribe('key', produce)
+    threading.Timer(0.05, release.set).start()
+    assert list(first) == ['a', 'b']
+    # A late subscriber replays what was emitted before it joined
+    assert list(second) == ['a', 'b']
+    assert second.result == 'done' and second.error is None
+    assert calls == [1]
+    assert fanout.stats()['coalesced'] == 1
+
+
+def test_stream_fan_out_reports_failure_to_subscribers():
+    fanout = StreamFanOut(max_workers=1)
+
+    def produce(emit):
+        emit('a')
+        raise RuntimeError('upstream down')
+
+    broadcast = fanout.subscribe('key', produce)
+    assert list(broadcast) == ['a']
+    assert isinstance(broadcast.error, RuntimeError)
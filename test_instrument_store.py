@@ -0,0 +1,27 @@
+from instrument_store import InstrumentTable
+from sector_index import SectorIndex
+
+
+def table():
+    return InstrumentTable.from_records([
+        {'instrument_token': 1, 'tradingsymbol': 'ABC', 'segment': 'NSE'},
+        {'instrument_token': 2, 'tradingsymbol': 'XYZ', 'segment': 'NSE'},
+        {'instrument_token': 3, 'tradingsymbol': 'XYZ', 'segment': 'BSE'},
+    ])
+
+
+def test_lookup_matches_listed_symbols_in_segment():
+    assert table().lookup(['ABC', 'XYZ', 'MISSING']) == {'ABC': 1, 'XYZ': 2}
+    assert table().lookup(['XYZ'], segment='BSE') == {'XYZ': 3}
+
+
+def test_lookup_ignores_symbols_wider_than_the_column():
+    assert table().lookup(['ABCD', 'XYZ']) == {'XYZ': 2}
+    assert table().lookup(['ABCD']) == {}
+
+
+def test_overlong_universe_symbol_is_unlisted():
+    index = SectorIndex({'Tech': ['ABCD', 'XYZ']})
+    index.bind_instruments(table())
+    assert index.listed() == {'XYZ': 2}
+    assert index.unlisted() == ['ABCD']
@@ -0,0 +1,48 @@
+from market_feed import LiveQuoteTable, MarketFeed
+from sector_universe import SectorUniverse
+
+
+class FakeTicker:
+    MODE_QUOTE = 'quote'
+
+    def __init__(self, api_key, access_token):
+        self.access_token = access_token
+        self.subscribed = []
+        self.closed = False
+
+    def connect(self, threaded=False):
+        self.on_connect(self, {})
+
+    def subscribe(self, tokens):
+        self.subscribed = list(tokens)
+
+    def set_mode(self, mode, tokens):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_resubscribe_restarts_only_on_a_new_instrument_set():
+    feed = MarketFeed('key', LiveQuoteTable(), ticker_factory=FakeTicker)
+    assert not feed.resubscribe({1: 'NSE:TCS'})
+    feed.start('token', {1: 'NSE:TCS'})
+    first = feed.ticker
+    assert not feed.resubscribe({1: 'NSE:TCS'})
+    assert feed.resubscribe({1: 'NSE:TCS', 2: 'NSE:INFY'})
+    assert first.closed
+    assert sorted(feed.ticker.subscribed) == [1, 2]
+    assert feed.ticker.access_token == 'token'
+
+
+def test_universe_reload_calls_on_change(tmp_path):
+    path = tmp_path / 'sectors.csv'
+    path.write_text('Symbol,Industry\nTCS,IT\n')
+    clock = [0.0]
+    changes = []
+    universe = SectorUniverse({}, str(path), check_interval=5, clock=lambda: clock[0], on_change=changes.append)
+    assert changes == []
+    path.write_text('Symbol,Industry\nTCS,IT\nINFY,IT\n')
+    clock[0] = 10
+    universe.index()
+    assert len(changes) == 1 and len(changes[0]) == 2
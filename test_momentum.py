@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+from benchmarks.fakes import FakeKite
+from instrument_store import InstrumentTable
+from market_hours import trading_days_between
+from momentum import MomentumEngine
+from ohlc_store import OHLCStore
+from sector_index import SectorIndex
+
+MAPPING = {'Tech': ['AAA', 'BBB'], 'Banks': ['CCC', 'DDD']}
+
+
+def synced_engine(tmp_path, until, today):
+    kite = FakeKite([symbol for symbols in MAPPING.values() for symbol in symbols], instrument_count=10, quote_latency=0)
+    index = SectorIndex(MAPPING)
+    index.bind_instruments(InstrumentTable.from_records(kite.instruments()))
+    engine = MomentumEngine(OHLCStore(str(tmp_path)), index, today=lambda: today)
+    engine.sync(lambda token, start, end: kite.historical_data(token, start, end, 'day'), until)
+    return engine
+
+
+def test_trading_days_between_skips_weekends():
+    friday = date(2026, 10, 16)
+    assert trading_days_between(friday, friday) == 0
+    assert trading_days_between(friday, friday + timedelta(days=3)) == 1
+    assert trading_days_between(friday, friday + timedelta(days=7)) == 5
+
+
+def test_ready_with_recent_candles(tmp_path):
+    engine = synced_engine(tmp_path, date(2026, 10, 16), today=date(2026, 10, 19))
+    assert engine.ready
+    assert len(engine.rank_sectors(top=2)) == 2
+    assert not np.isnan(engine.metrics['beta']).all()
+
+
+def test_not_ready_once_candles_are_stale(tmp_path):
+    engine = synced_engine(tmp_path, date(2026, 10, 16), today=date(2026, 10, 23))
+    assert engine.as_of <= date(2026, 10, 16)
+    assert not engine.ready
+    assert engine.stats()['age_days'] >= 4
@@ -0,0 +1,61 @@
+import pytest
+from flask import Flask
+from flask_caching import Cache
+
+from postbacks import DUPLICATE, FULL, QUEUED, MemoryEventQueue, PostbackIngestor
+
+
+@pytest.fixture
+def cache():
+    return Cache(Flask(__name__), config={'CACHE_TYPE': 'SimpleCache'})
+
+
+def order(order_id, status='COMPLETE'):
+    return {'order_id': order_id, 'status': status, 'filled_quantity': 1}
+
+
+class UnreachableQueue(MemoryEventQueue):
+    def put(self, event):
+        raise ConnectionError('queue unreachable')
+
+
+def test_redelivery_is_a_duplicate(cache):
+    ingestor = PostbackIngestor(MemoryEventQueue(), lambda batch: None, cache)
+    assert ingestor.submit(order('1')) == QUEUED
+    assert ingestor.submit(order('1')) == DUPLICATE
+    assert ingestor.submit(order('1', status='CANCELLED')) == QUEUED
+
+
+def test_full_queue_releases_the_key(cache):
+    ingestor = PostbackIngestor(MemoryEventQueue(maxsize=1), lambda batch: None, cache)
+    ingestor.submit(order('1'))
+    assert ingestor.submit(order('2')) == FULL
+    ingestor.queue = MemoryEventQueue()
+    assert ingestor.submit(order('2')) == QUEUED
+
+
+def test_failed_enqueue_releases_the_key(cache):
+    ingestor = PostbackIngestor(UnreachableQueue(), lambda batch: None, cache)
+    with pytest.raises(ConnectionError):
+        ingestor.submit(order('1'))
+    ingestor.queue = MemoryEventQueue()
+    assert ingestor.submit(order('1')) == QUEUED
+
+
+def test_failing_event_is_isolated_and_can_be_redelivered(cache):
+    processed = []
+
+    def process(batch):
+        if any(event['order_id'] == 'bad' for event in batch):
+            raise ValueError('cannot apply')
+        processed.extend(event['order_id'] for event in batch)
+
+    ingestor = PostbackIngestor(MemoryEventQueue(), process, cache)
+    batch = [order('1'), order('bad'), order('2')]
+    for event in batch:
+        ingestor.submit(event)
+    ingestor._process_individually(batch)
+    assert processed == ['1', '2']
+    assert ingestor.stats()['failed'] == 1
+    assert ingestor.submit(order('bad')) == QUEUED
+    assert ingestor.submit(order('1')) == DUPLICATE
@@ -0,0 +1,44 @@
+import threading
+
+from prewarm import RunLock
+
+
+def test_run_lock_skips_while_held(tmp_path):
+    path = str(tmp_path / 'job.lock')
+    first, second = RunLock('job', path=path), RunLock('job', path=path)
+    with first.hold() as acquired:
+        assert acquired
+        with second.hold() as other:
+            assert not other
+    with second.hold() as acquired:
+        assert acquired
+
+
+def test_run_lock_lets_one_concurrent_worker_run(tmp_path):
+    path = str(tmp_path / 'job.lock')
+    ran, start, release = [], threading.Barrier(4), threading.Event()
+
+    def worker():
+        start.wait()
+        with RunLock('job', path=path).hold() as acquired:
+            if acquired:
+                ran.append(1)
+                release.wait(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    threading.Timer(0.2, release.set).start()
+    for thread in threads:
+        thread.join(5)
+    assert ran == [1]
+
+
+def test_run_lock_acquire_is_held_until_the_process_exits(tmp_path):
+    path = str(tmp_path / 'ticker.lock')
+    owner, other = RunLock('ticker', path=path), RunLock('ticker', path=path)
+    assert owner.acquire()
+    assert owner.acquire()
+    assert not other.acquire()
+    with other.hold() as acquired:
+        assert not acquired
@@ -0,0 +1,32 @@
+import time
+
+from benchmarks.fakes import FakeKite, temp_instrument_store
+
+
+def make_service(app_module, requests_per_second=1000):
+    mapped = [symbol for symbols in app_module.DEFAULT_SECTOR_MAPPING.values() for symbol in symbols]
+    kite = FakeKite(mapped, instrument_count=500, quote_latency=0)
+    service = app_module.StockRecommendationService(
+        kite,
+        quote_fetcher=app_module.QuoteFetcher(kite, requests_per_second=requests_per_second),
+        instrument_store=temp_instrument_store(kite),
+        sector_universe=app_module.SectorUniverse(app_module.DEFAULT_SECTOR_MAPPING),
+    )
+    return kite, service
+
+
+def test_snapshot_reuses_the_ranking_quotes(app_module):
+    kite, service = make_service(app_module)
+    snapshot = service.get_quote_snapshot()
+    assert kite.quote_calls == 1
+    assert snapshot['symbols']
+    assert all(f'NSE:{symbol}' in snapshot['market_data'] for symbol in snapshot['symbols'])
+
+
+def test_stock_data_takes_one_quote_call_at_the_default_budget(app_module):
+    kite, service = make_service(app_module, requests_per_second=1)
+    started = time.monotonic()
+    stocks = service.get_stock_data('None')
+    assert isinstance(stocks, list) and stocks
+    assert kite.quote_calls == 1
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from stream_parser import StreamingStocksParser
+
+STOCKS = [
+    {'symbol': 'TCS', 'reason': 'Strong "order book", steady margins'},
+    {'symbol': 'INFY', 'reason': 'Braces } and { in text \\ and a backslash'},
+]
+DOCUMENT = json.dumps({'stocks': STOCKS})
+
+
+def feed_all(parser, chunks):
+    objects = []
+    for chunk in chunks:
+        objects.extend(parser.feed(chunk))
+    return objects
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, len(DOCUMENT)])
+def test_chunk_boundaries_inside_strings_and_escapes(size):
+    parser = StreamingStocksParser()
+    chunks = [DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size)]
+    assert feed_all(parser, chunks) == STOCKS
+    assert not parser.truncated
+    assert parser.partial == ''
+
+
+def test_split_between_backslash_and_escaped_quote():
+    parser = StreamingStocksParser()
+    text = '{"stocks": [{"symbol": "A", "reason": "say \\"hi\\" }"}]}'
+    cut = text.index('\\"') + 1
+    assert parser.feed(text[:cut]) == []
+    assert parser.feed(text[cut:]) == [{'symbol': 'A', 'reason': 'say "hi" }'}]
+    assert not parser.truncated
+
+
+def test_truncation_mid_object_keeps_closed_objects():
+    parser = StreamingStocksParser()
+    cut = DOCUMENT.index('"INFY"') + 3
+    assert feed_all(parser, [DOCUMENT[:20], DOCUMENT[20:cut]]) == STOCKS[:1]
+    assert parser.truncated
+    assert parser.partial == DOCUMENT[DOCUMENT.index('{"symbol": "INFY"'):cut]
+
+
+def test_missing_stocks_key_yields_nothing_and_is_truncated():
+    parser = StreamingStocksParser()
+    assert feed_all(parser, ['{"picks": [', '{"symbol": "TCS"}', ']}']) == []
+    assert parser.truncated
+    assert parser.partial == ''
+
+
+def test_stocks_key_split_across_chunks():
+    parser = StreamingStocksParser()
+    assert feed_all(parser, ['{"sto', 'cks"', ' : ', '[{"symbol": "TCS"}]}']) == [{'symbol': 'TCS'}]
+
+
+def test_malformed_object_is_skipped():
+    parser = StreamingStocksParser()
+    assert parser.feed('{"stocks": [{"symbol": TCS}, {"symbol": "INFY"}]}') == [{'symbol': 'INFY'}]
+    assert not parser.truncated
+
+
+def test_text_after_the_array_is_ignored():
+    parser = StreamingStocksParser()
+    assert parser.feed('{"stocks": [{"symbol": "TCS"}]}') == [{'symbol': 'TCS'}]
+    assert parser.feed(', "extra": [{"symbol": "INFY"}]}') == []
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from market_hours import next_token_expiry
+
+logger = logging.getLogger(__name__)
+
+
+class RedisTokenStore:
+    """Kite access token shared through Redis by every worker and instance"""
+
+    def __init__(self, redis_client, key='kite:access_token'):
+        self.redis = redis_client
+        self.key = key
+
+    def get(self):
+        token = self.redis.get(self.key)
+        return token.decode() if isinstance(token, bytes) else token
+
+    def set(self, token, expires_at):
+        self.redis.set(self.key, token, exat=int(expires_at))
+
+    def clear(self):
+        self.redis.delete(self.key)
+
+
+class FileTokenStore:
+    """Kite access token shared by the workers on one host through a JSON file.
+
+    Writes go to a private temp file that is atomically renamed over `path`;
+    reads are skipped while the file's mtime is unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entry = None
+
+    def _read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.path) as f:
+                        self._entry = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Unreadable Kite token file {self.path}: {str(e)}")
+                    self._entry = None
+                self._mtime = mtime
+            return self._entry
+
+    def get(self):
+        entry = self._read()
+        if not entry or entry.get('expires_at', 0) <= time.time():
+            return None
+        return entry.get('access_token')
+
+    def set(self, token, expires_at):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # mkstemp creates the file readable by this user only
+        fd, staging = tempfile.mkstemp(dir=directory, prefix='.kite-token-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'access_token': token, 'expires_at': expires_at}, f)
+            os.replace(staging, self.path)
+        except BaseException:
+            os.unlink(staging)
+            raise
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SharedKiteSession:
+    """Keep a process-local KiteConnect in step with a shared token store.
+
+    `login` publishes a new access token to the store; `sync` (called before
+    each request and background job) re-reads the store at most every
+    `check_interval` seconds and applies a changed token to `kite`, calling
+    `on_change(token)` so per-process consumers such as the ticker feed can
+    follow along. Workers that never saw the login callback pick the token
+    up lazily, and a re-login reaches every worker without a restart.
+    """
+
+    def __init__(self, kite, store, check_interval=5, on_change=None):
+        self.kite = kite
+        self.store = store
+        self.check_interval = check_interval
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._checked_at = None
+
+    def login(self, access_token):
+        self.store.set(access_token, next_token_expiry().timestamp())
+        self._apply(access_token)
+
+    def sync(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self.kite.access_token
+            self._checked_at = now
+        try:
+            token = self.store.get()
+        except Exception as e:
+            logger.warning(f"Kite token store unavailable: {str(e)}")
+            return self.kite.access_token
+        if token != self.kite.access_token:
+            self._apply(token)
+        return token
+
+    def _apply(self, token):
+        with self._lock:
+            if token == self.kite.access_token:
+                return
+            self.kite.set_access_token(token)
+        logger.info("Applied shared Kite access token" if token else "Shared Kite access token expired or cleared")
+        if token and self.on_change:
+            try:
+                self.on_change(token)
+            except Exception as e:
+                logger.error(f"Error applying Kite access token: {str(e)}")